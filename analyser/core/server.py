@@ -22,6 +22,7 @@ from flask_apscheduler import APScheduler
 from libs.core.environment import envvar
 from libs.kafka.logging import LogMessage
 from libs.kafka.logging import send_health_message
+from libs.kafka.topichandler import provision_topics
 from libs.misp.event import handle_misp_event
 
 SERVICENAME = envvar("SERVICENAME", "Analyser")
@@ -67,6 +68,7 @@ class Reporter(Server):
         '''
         __call__ override __call__ function from server-class.
         '''
+        provision_topics(KAFKA_SERVER, [HEALTHTOPIC])
         scheduler.start()
         #Thread(target=Reporter.consume_reports, daemon=True).start()
         return Server.__call__(self, app, *args, **kwargs)
\ No newline at end of file
@@ -8,41 +8,43 @@ from logging import debug
 import os
 import sys
 import json
+import time
+import shutil
 import pytz
-import re
-import iocextract as ioce
 sys.path.append('..')
 
-from io import StringIO
-from threading import Thread
-
-from kafka.producer import KafkaProducer
+from datetime import datetime
 
-from pdfminer.converter import TextConverter
-from pdfminer.layout import LAParams
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
-from pdfminer.pdfpage import PDFPage
-from pdfminer.pdfparser import PDFParser
-
-from ioc_finder import find_iocs
+from threading import Thread
 
 from flask import Flask
+from flask import jsonify
 from flask import request
 from flask import render_template
 from flask_script import Server
 from flask_apscheduler import APScheduler
 from flask_dropzone import Dropzone
 
-from libs.core.filter import filter_dict_values
+from libs.core.filter import BlacklistIndex
 from libs.core.filter import filter_by_blacklist
-from libs.core.merge_dicts import merge_dicts
+from libs.core.filter import load_blacklist_index
+from libs.core.filter import store_blacklist_index
 from libs.core.environment import envvar
-from libs.kafka.topichandler import create_topic_if_not_exists
+from libs.kafka.topichandler import provision_topics
 from libs.kafka.logging import LogMessage
 from libs.kafka.logging import send_health_message
-from libs.extensions.loader import load_extensions
+from libs.kafka.envelope import dumps
+from libs.kafka.envelope import publish_envelope
+from libs.kafka.claimcheck import BlobStore
+from libs.kafka.claimcheck import CLAIMCHECK_PATH
+from libs.kafka.claimcheck import check_in
+from libs.gitlabl.files import get_file_revision
 from libs.gitlabl.files import read_file_from_gitlab
+from libs.extraction.cache import ExtractionCache
+from libs.extraction.engine import ExtractionEngine
+from libs.extraction.engine import ExtractionError
+from libs.extraction.watcher import DirectoryWatcher
+from libs.extraction.workqueue import WorkQueue
 
 # ENVIRONMENT-VARS
 SERVICENAME = envvar("SERVICENAME", "Extractor")
@@ -52,8 +54,21 @@ HEALTHTOPIC = envvar("HEALTH_TOPIC", "health_report")
 GITLAB_SERVER = envvar("GITLAB_SERVER", "0.0.0.0:10082")
 GITLAB_TOKEN = envvar("GITLAB_TOKEN", "NOTWORKING")
 GITLAB_REPO_NAME = envvar("GITLAB_REPO_NAME", "IOCFindings")
+EXTRACTION_WORKERS = int(envvar("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+EXTRACTION_RECYCLE_AFTER = int(envvar("EXTRACTION_RECYCLE_AFTER", "50"))
+EXTRACTION_CHUNK_PAGES = int(envvar("EXTRACTION_CHUNK_PAGES", "25"))
+EXTRACTION_CHUNK_OVERLAP = int(envvar("EXTRACTION_CHUNK_OVERLAP", "4096"))
+EXTRACTION_BACKEND = envvar("EXTRACTION_BACKEND", "pdfminer")
+EXTRACTION_CACHE_PATH = envvar("EXTRACTION_CACHE_PATH", "/app/iocextractor/cache")
+EXTRACTION_CACHE_SIZE = int(envvar("EXTRACTION_CACHE_SIZE", "512"))
+BLACKLIST_CACHE_PATH = envvar("BLACKLIST_CACHE_PATH", os.path.join(EXTRACTION_CACHE_PATH, "blacklist.pickle"))
+EXTRACTION_TIMEOUT = int(envvar("EXTRACTION_TIMEOUT", "300"))
+EXTRACTION_MEMORY_LIMIT = int(envvar("EXTRACTION_MEMORY_LIMIT", "2048"))
+EXTRACTION_QUEUE_SIZE = int(envvar("EXTRACTION_QUEUE_SIZE", "1000"))
+EXTRACTION_SETTLE_SECONDS = int(envvar("EXTRACTION_SETTLE_SECONDS", "5"))
 
 DOCKER_REPORTS_PATH = "/app/iocextractor/reports"
+DOCKER_QUARANTINE_PATH = envvar("EXTRACTION_QUARANTINE_PATH", "/app/iocextractor/quarantine")
 
 class Config:
     '''
@@ -86,93 +101,119 @@ class Extractor(Server):
     Extractor will be the class for the extractor-server.
     '''
 
-    EXTENSIONS = load_extensions(SERVICENAME)
-    BLACKLIST = {}
+    ENGINE = ExtractionEngine(SERVICENAME, EXTRACTION_WORKERS, EXTRACTION_RECYCLE_AFTER, EXTRACTION_CHUNK_PAGES, EXTRACTION_CHUNK_OVERLAP,
+        ExtractionCache(EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_SIZE * 1024 * 1024, SERVICENAME) if EXTRACTION_CACHE_SIZE > 0 else None,
+        EXTRACTION_BACKEND, EXTRACTION_TIMEOUT, EXTRACTION_MEMORY_LIMIT * 1024 * 1024)
+    QUEUE = WorkQueue(EXTRACTION_QUEUE_SIZE)
+    WATCHER = DirectoryWatcher(DOCKER_REPORTS_PATH, lambda path: Extractor.enqueue(path), SERVICENAME)
+    BLACKLIST = BlacklistIndex({})
+    BLACKLIST_REVISION = None
+    BLOBS = BlobStore(CLAIMCHECK_PATH, SERVICENAME)
 
     @app.route('/', methods=['GET', 'POST'])
     def file_dropzone():
+        '''
+        file_dropzone will save an uploaded report under a temporary name and rename
+            it into the reports folder after the last write.
+        '''
         if request.method == 'POST':
             files = request.files.get('file')
             file_path = os.path.join(DOCKER_REPORTS_PATH, files.filename)
-            files.save(file_path)
+            temp_path = os.path.join(DOCKER_REPORTS_PATH, ".{}.part".format(os.path.basename(files.filename)))
+            files.save(temp_path)
+            os.replace(temp_path, file_path)
         return render_template('index.html')
 
+    @app.route('/stats')
+    def stats():
+        '''
+        stats will return the counters of the extraction engine and the work queue.
+        '''
+        return jsonify({"engine": Extractor.ENGINE.stats(), "queue": Extractor.QUEUE.stats()})
+
     @scheduler.task("interval", id="refetch", seconds=30, timezone=pytz.UTC)
     def refetch_blacklist():
         '''
-        refetch_blacklist will fetch the blacklist from the master every 30 minutes.
+        refetch_blacklist will check every 30 seconds if the blacklist on the master
+            changed. Only a changed blacklist will be downloaded and compiled into a
+            new BlacklistIndex, which replaces the old one at once and is stored on
+            the disk for the next start.
+        @return the current BlacklistIndex.
         '''
-        content = {}
         try:
-            content = read_file_from_gitlab(gitlabserver=GITLAB_SERVER, token=GITLAB_TOKEN, repository=GITLAB_REPO_NAME, file="blacklist.json", servicename=SERVICENAME, branch_name="master")
-            content = json.loads(content)
-            if content is not None:
-                Extractor.BLACKLIST = content
+            revision = get_file_revision(gitlabserver=GITLAB_SERVER, token=GITLAB_TOKEN, repository=GITLAB_REPO_NAME, file="blacklist.json", servicename=SERVICENAME, branch_name="master")
+            if revision == "" or revision != Extractor.BLACKLIST_REVISION:
+                content = read_file_from_gitlab(gitlabserver=GITLAB_SERVER, token=GITLAB_TOKEN, repository=GITLAB_REPO_NAME, file="blacklist.json", servicename=SERVICENAME, branch_name="master")
+                content = json.loads(content)
+                if content is not None:
+                    Extractor.BLACKLIST = BlacklistIndex(content)
+                    Extractor.BLACKLIST_REVISION = revision or None
+                    if revision != "":
+                        store_blacklist_index(Extractor.BLACKLIST, revision, BLACKLIST_CACHE_PATH, SERVICENAME)
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+        return Extractor.BLACKLIST
 
     @staticmethod
     def pushfindings(findings):
         '''
-        pushfindings will push all findings to KAFKA.
+        pushfindings will push all findings to KAFKA. Findings above the
+            CLAIMCHECK_THRESHOLD are stored in the blob store and KAFKA gets
+            a reference to them.
         @param findings will be the findings.
         '''
         try:
-            producer = KafkaProducer(bootstrap_servers=KAFKA_SERVER, client_id='ioc_extractor', api_version=(2,7,0))
-            message = str(json.dumps(findings)).encode('UTF-8')
-            producer.send(IOC_TOPIC_NAME, message)
+            message = dumps(findings)
+            try:
+                message = check_in(message, Extractor.BLOBS)
+            except Exception as error:
+                LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+            publish_envelope(KAFKA_SERVER, IOC_TOPIC_NAME, message, key=findings.get('input_filename'))
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
 
     @staticmethod
-    def extensions(string):
+    def extract(reportpath):
         '''
-        extensions will execute extensions for this server.
-        @param string will be the string to check against.
-        @return findings in the string machting the extensions-rules.
+        extract will take a PDF-File as path and let the extraction engine extract all
+            IoC's in a worker process. After the Extraction, the file will be removed.
+            The IoC's will be pushed to KAFKA by calling the pushfindings-Function.
+            Reports which have been extracted before are marked as resubmission. The
+            digest of the text is sent as report_id, so the consumers skip duplicates.
+        @param reportpath will be the path to the PDF-File.
         '''
-        findings = {}
         try:
-            for i in Extractor.EXTENSIONS:
-                try:
-                    l_findings = re.findall(i.get_pattern(), string)
-                    if len(l_findings) > 0 and isinstance(l_findings[0], tuple):
-                        findings[str(i.field)] = [element[i.get_group()] if len(element)-1 >= i.get_group() else element.group(0) for element in l_findings]
-                    else:
-                        findings[str(i.field)] = l_findings
-                except Exception as error:
-                    LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+            print("Extracted ioc's from file: {}".format(reportpath))
+            result = Extractor.ENGINE.extract(reportpath)
+            iocs = result['findings']
+            iocs['input_filename'] = (os.path.basename(reportpath)).replace(" ", "_")
+            iocs['report_id'] = result['digest']
+            if result['resubmission']:
+                iocs['resubmission'] = True
+                LogMessage("{} has been extracted before and is a resubmission.".format(iocs['input_filename']), LogMessage.LogTyp.INFO, SERVICENAME).log()
+            iocs = filter_by_blacklist(iocs, Extractor.BLACKLIST, SERVICENAME)
+            Extractor.pushfindings(iocs)
+            os.remove(reportpath)
+        except ExtractionError as error:
+            Extractor.quarantine(reportpath, error.reason)
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
-        return findings
 
     @staticmethod
-    def extract(reportpath):
+    def quarantine(reportpath, reason):
         '''
-        extract will take a PDF-File as path and try to extract all IoC's. After the
-            Extraction, the file will be removed. The IoC's will be pushed to KAFKA
-            by calling the pushfindings-Function.
+        quarantine will move a PDF-File which exceeded the limits of the extraction
+            engine into the quarantine folder. The reason will be written next to it.
         @param reportpath will be the path to the PDF-File.
+        @param reason will be a description why the file has been quarantined.
         '''
         try:
-            pdf_content = StringIO()
-            print("Extracted ioc's from file: {}".format(reportpath))
-            with open(reportpath, 'rb') as file:
-                resource_manager = PDFResourceManager()
-                device = TextConverter(resource_manager, pdf_content, laparams=LAParams())
-                interpreter = PDFPageInterpreter(resource_manager, device)
-                for page in PDFPage.create_pages(PDFDocument(PDFParser(file))):
-                    interpreter.process_page(page)
-            pdftext = pdf_content.getvalue()
-            iocs = find_iocs(pdftext)
-            yara_rules = [rule for rule in ioce.extract_yara_rules(pdftext)]
-            iocs['yara_rules'] = yara_rules
-            ex_ioc = Extractor.extensions(pdftext)
-            iocs['input_filename'] = (os.path.basename(reportpath)).replace(" ", "_")
-            iocs = merge_dicts(iocs, filter_dict_values(ex_ioc, SERVICENAME), SERVICENAME)
-            iocs = filter_by_blacklist(iocs, Extractor.BLACKLIST, SERVICENAME)
-            Extractor.pushfindings(iocs)
-            os.remove(reportpath)
+            os.makedirs(DOCKER_QUARANTINE_PATH, exist_ok=True)
+            target = os.path.join(DOCKER_QUARANTINE_PATH, os.path.basename(reportpath))
+            shutil.move(reportpath, target)
+            with open("{}.reason.json".format(target), 'w') as file:
+                json.dump({"file": os.path.basename(reportpath), "reason": reason, "time": datetime.utcnow().isoformat()}, file)
+            LogMessage("Moved {} into the quarantine. Reason: {}".format(os.path.basename(reportpath), reason), LogMessage.LogTyp.WARNING, SERVICENAME).log()
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
 
@@ -186,23 +227,53 @@ class Extractor(Server):
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
 
+    @staticmethod
+    def enqueue(reportpath):
+        '''
+        enqueue will add a PDF-File to the work queue. Hidden files are temporary
+            uploads and will be ignored.
+        @param reportpath will be the path to the PDF-File.
+        @return a boolean indicating whether or not the file has been added.
+        '''
+        name = os.path.basename(reportpath)
+        if name.endswith(".pdf") and not name.startswith("."):
+            return Extractor.QUEUE.put(reportpath)
+        return False
+
+    @staticmethod
+    def dispatch():
+        '''
+        dispatch will claim reports from the work queue and extract them. Every
+            dispatcher keeps one report in flight, so there is one dispatcher per
+            worker of the extraction engine.
+        '''
+        while True:
+            reportpath = Extractor.QUEUE.claim()
+            try:
+                Extractor.extract(reportpath)
+            except Exception as error:
+                LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+            finally:
+                Extractor.QUEUE.ack(reportpath)
+
     @scheduler.task("interval", id="execute", seconds=10, timezone=pytz.UTC, misfire_grace_time=900)
     def execute():
         '''
-        execute will run the service and search for PDF's and start for every file a
-            thread. The thread will execute the extract-Function and extract all IoC's
-            in a file.
+        execute will search the reports folder for PDF's which have been missed by the
+            watcher, for example files copied onto a mounted drive without a rename or
+            files left over from a restart. A file will only be added to the work queue
+            when it has not been modified for EXTRACTION_SETTLE_SECONDS.
         '''
         try:
             if (reports := os.listdir(DOCKER_REPORTS_PATH)) is not None and len(reports) > 0:
-                threads = []
+                settled = time.time() - EXTRACTION_SETTLE_SECONDS
                 for report in reports:
-                    if report.endswith(".pdf"):
-                        threads.append(Thread(target=Extractor.extract, args=(os.path.join(DOCKER_REPORTS_PATH, report),)))
-                for instance in threads:
-                    instance.start()
-                for instance in threads:
-                    instance.join()
+                    reportpath = os.path.join(DOCKER_REPORTS_PATH, report)
+                    try:
+                        if reportpath not in Extractor.QUEUE and report.endswith(".pdf") and os.path.getmtime(reportpath) <= settled:
+                            Extractor.enqueue(reportpath)
+                    except OSError as error:
+                        LogMessage("{}: {}".format(report, error), LogMessage.LogTyp.WARNING, SERVICENAME).log()
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
 
@@ -216,7 +287,15 @@ class Extractor(Server):
         @param *args and **kwargs will be the vargs passed to the __call__ function
             of the server-class
         '''
-        create_topic_if_not_exists(KAFKA_SERVER, IOC_TOPIC_NAME)
+        provision_topics(KAFKA_SERVER, [HEALTHTOPIC], partitioned=[IOC_TOPIC_NAME])
+        revision, index = load_blacklist_index(BLACKLIST_CACHE_PATH, SERVICENAME)
+        if index is not None:
+            Extractor.BLACKLIST, Extractor.BLACKLIST_REVISION = index, revision
+            Thread(target=Extractor.refetch_blacklist, daemon=True).start()
+        else:
+            Extractor.refetch_blacklist()
+        for _ in range(Extractor.ENGINE.workers):
+            Thread(target=Extractor.dispatch, daemon=True).start()
+        Extractor.WATCHER.start()
         scheduler.start()
-        Extractor.BLACKLIST = Extractor.refetch_blacklist()
         return Server.__call__(self, app, *args, **kwargs)
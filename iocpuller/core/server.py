@@ -12,9 +12,6 @@ sys.path.append('..')
 
 from datetime import datetime
 
-from kafka.consumer import KafkaConsumer
-from kafka.producer import KafkaProducer
-
 from libs.core.environment import envvar
 from libs.gitlabl.files import read_file_from_gitlab
 from libs.gitlabl.commit import get_filename_since_last_timestamp
@@ -22,10 +19,13 @@ from libs.gitlabl.commit import get_latest_commit_hash_by_branch
 from libs.gitlabl.pull_requests import get_list_of_relevant_prs
 from libs.gitlabl.pull_requests import merge_pull_request
 from libs.gitlabl.repository import get_branch_name
-from libs.kafka.topichandler import create_topic_if_not_exists
+from libs.kafka.topichandler import provision_topics
 from libs.kafka.logging import LogMessage
 from libs.kafka.logging import send_health_message
+from libs.kafka.envelope import publish_envelope
+from libs.kafka.checkpoint import CheckpointStore
 from libs.markdown.converter import convert_markdown_to_json
+from libs.extraction.cache import text_digest
 
 from flask import Flask
 from flask_script import Server
@@ -39,6 +39,7 @@ HEALTHTOPIC = envvar("HEALTH_TOPIC", "health_report")
 GITLAB_SERVER = envvar("GITLAB_SERVER", "0.0.0.0:10082")
 GITLAB_TOKEN = envvar("GITLAB_TOKEN", "NOTWORKING")
 GITLAB_REPO_NAME = envvar("GITLAB_REPO_NAME", "IOCFindings")
+CHECKPOINT_PATH = envvar("CHECKPOINT_PATH", "/app/iocpuller/checkpoint/committstamp.json")
 
 class Config:
     '''
@@ -64,6 +65,8 @@ class Puller(Server):
     Class for the Puller-Server.
     '''
 
+    CHECKPOINT = CheckpointStore(KAFKA_SERVER, KAFKA_TIMESTAMP_TOPIC, CHECKPOINT_PATH, SERVICENAME)
+
     @staticmethod
     def commit_timestamp(commit_hash, time, branch_name):
         '''
@@ -77,8 +80,7 @@ class Puller(Server):
         timestamp = None
         try:
             timestamp = json.dumps({"commit_hash": commit_hash, "time": time, "branch_name": branch_name}).encode("UTF-8")
-            producer = KafkaProducer(bootstrap_servers=KAFKA_SERVER, client_id='ioc_puller', api_version=(2,7,0))
-            producer.send(KAFKA_TIMESTAMP_TOPIC, timestamp)
+            Puller.CHECKPOINT.store(timestamp, key=branch_name)
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
         return timestamp
@@ -86,22 +88,15 @@ class Puller(Server):
     @staticmethod
     def latest_timestamp():
         '''
-        latest_timestamp will return the latest timestamp from the KAFKA
-            topic.
+        latest_timestamp will return the latest timestamp from the checkpoint
+            store. Only the first call after a start reads the last offsets of
+            the KAFKA topic or the local checkpoint file.
         @return a timestamp as a dict with the fields: branch_name,
             commit_hash, time.
         '''
         v_last_timestamp = None
         try:
-            consumer = KafkaConsumer(KAFKA_TIMESTAMP_TOPIC,
-                bootstrap_servers=KAFKA_SERVER,
-                client_id='ioc_puller',
-                api_version=(2, 7, 0),
-                auto_offset_reset='earliest',
-                enable_auto_commit=False,
-                consumer_timeout_ms=5000)
-            if (messages := [message for message in consumer]) is not None and len(messages) > 0: #TODO R1721
-                v_last_timestamp = (messages[-1]).value.decode('UTF-8')
+            v_last_timestamp = Puller.CHECKPOINT.load()
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
         return v_last_timestamp
@@ -123,12 +118,11 @@ class Puller(Server):
             prs = get_list_of_relevant_prs(GITLAB_SERVER, GITLAB_TOKEN, GITLAB_REPO_NAME, SERVICENAME)
             merge_pull_request(prs, SERVICENAME)
             if (files := get_filename_since_last_timestamp(gitlabserver=GITLAB_SERVER, token=GITLAB_TOKEN, repository=GITLAB_REPO_NAME, timestamp=latest_timestamp, servicename=SERVICENAME)) is not None and len(files) > 0:
-                producer = KafkaProducer(bootstrap_servers=KAFKA_SERVER, client_id='ioc_puller', api_version=(2,7,0))
                 for file in files:
                     content = read_file_from_gitlab(gitlabserver=GITLAB_SERVER, token=GITLAB_TOKEN, repository=GITLAB_REPO_NAME, file=file, servicename=SERVICENAME)
                     filename = str(file).replace("/report.md", "")
-                    message = convert_markdown_to_json(content, filename, SERVICENAME).encode('UTF-8')
-                    producer.send(KAFKA_REPORT_TOPIC, message)
+                    message = convert_markdown_to_json(content, filename, SERVICENAME, text_digest(content) if content is not None else None)
+                    publish_envelope(KAFKA_SERVER, KAFKA_REPORT_TOPIC, message, key=filename)
             latest_timestamp = Puller.commit_timestamp(
                     get_latest_commit_hash_by_branch(gitlabserver=GITLAB_SERVER, token=GITLAB_TOKEN, repository=GITLAB_REPO_NAME, branch=branch_name, servicename=SERVICENAME),
                     datetime.now().isoformat(), get_branch_name()
@@ -150,7 +144,6 @@ class Puller(Server):
         '''
         __call__
         '''
-        for topic in [KAFKA_REPORT_TOPIC, KAFKA_TIMESTAMP_TOPIC]:
-            create_topic_if_not_exists(KAFKA_SERVER, topic)
+        provision_topics(KAFKA_SERVER, [HEALTHTOPIC], partitioned=[KAFKA_REPORT_TOPIC], compacted=[KAFKA_TIMESTAMP_TOPIC])
         scheduler.start()
         return Server.__call__(self, app, *args, **kwargs)
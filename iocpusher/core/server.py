@@ -4,8 +4,9 @@ This class will represent the iocpusher-server.
 
 # pylint: disable=C0413, C0411
 
+import os
 import sys
-import json
+import time
 import random
 import pytz
 import gitlab
@@ -14,30 +15,46 @@ sys.path.append('..')
 from threading import Thread
 
 from libs.core.environment import envvar
+from libs.core.httpclient import HTTP_CLIENT
 from libs.kafka.logging import LogMessage
 from libs.kafka.logging import send_health_message
+from libs.kafka.claimcheck import BlobStore
+from libs.kafka.claimcheck import CLAIMCHECK_PATH
+from libs.kafka.claimcheck import CLAIMCHECK_RETENTION
+from libs.kafka.claimcheck import check_out
+from libs.kafka.envelope import loads_record
+from libs.kafka.consumer import BoundedConsumer
+from libs.kafka.processed import ProcessedStore
+from libs.kafka.processed import submission_id
+from libs.kafka.topichandler import provision_topics
 from libs.gitlabl.repository import create_repository_if_not_exists
 from libs.gitlabl.repository import create_monthly_if_not_exists
 from libs.gitlabl.repository import get_branch_name
 from libs.gitlabl.repository import get_projectid_by_name
 from libs.gitlabl.issues import create_issues
 from libs.cve.cve_information import get_cve_information
+from libs.cve.cve_information import get_cve_store
 from libs.virustotal.domains import get_vt_information_domains
 from libs.virustotal.ips import get_vt_information_ipv4
+from libs.virustotal.quota import VT_CLIENT
+from libs.virustotal.quota import VT_QUOTA
 from libs.mitre.enterprise import get_mitre_information_tactics_enterpise
 from libs.mitre.enterprise import get_mitre_information_techniques_enterpise
+from libs.mitre.index import load_mitre_index
 from libs.markdown.generator import generate_markdown_file
 from libs.extensions.loader import load_extensions
 from libs.extensions.loader import generate_dict_with_jsonfield_and_reportfield
 from libs.misp.search import get_appearance_in_misp
-
-from pyattck import Attck
+from libs.enrichment.engine import EnrichmentEngine
+from libs.enrichment.engine import Provider
+from libs.enrichment.result import LookupResult
+from libs.enrichment.cache import EnrichmentCache
 
 from pymisp import PyMISP
 
-from kafka.consumer import KafkaConsumer
 
 from flask import Flask
+from flask import jsonify
 from flask_script import Server
 from flask_apscheduler import APScheduler
 
@@ -46,6 +63,8 @@ SERVICENAME = envvar("SERVICENAME", "Pusher")
 IOC_TOPIC_NAME = envvar("IOC_TOPIC", "ioc")
 KAFKA_SERVER = envvar("KAFKA_SERVER", "0.0.0.0:9092")
 HEALTHTOPIC = envvar("HEALTH_TOPIC", "health_report")
+KAFKA_GROUP_ID = envvar("KAFKA_GROUP_ID", "ioc_pusher")
+PROCESSED_DB_PATH = envvar("PROCESSED_DB_PATH", "/app/iocpusher/processed/processed.db")
 GITLAB_SERVER = envvar("GITLAB_SERVER", "http://0.0.0.0:10082")
 GITLAB_TOKEN = envvar("GITLAB_TOKEN", "NOTWORKING")
 GITLAB_REPO_NAME = envvar("GITLAB_REPO_NAME", "IOCFindings")
@@ -53,6 +72,18 @@ VT_API_KEY = envvar("VIRUS_TOTAL", "None")
 MISP_SERVER = envvar("MISP_SERVER", "0.0.0.0")
 MISP_TOKEN = envvar("MISP_TOKEN", None)
 MISP_CERT_VERIFY = True if envvar("MISP_VERIF", True) == "True" else False
+CVE_WORKERS = int(envvar("CVE_WORKERS", "8"))
+VT_WORKERS = int(envvar("VT_WORKERS", "4"))
+MISP_WORKERS = int(envvar("MISP_WORKERS", "8"))
+ENRICHMENT_CACHE_PATH = envvar("ENRICHMENT_CACHE_PATH", "/app/iocpusher/cache/enrichment.db")
+ENRICHMENT_CACHE_ENTRIES = int(envvar("ENRICHMENT_CACHE_ENTRIES", "200000"))
+ENRICHMENT_TTL_CVE = int(envvar("ENRICHMENT_TTL_CVE", str(7 * 24 * 3600)))
+ENRICHMENT_TTL_VT = int(envvar("ENRICHMENT_TTL_VT", str(24 * 3600)))
+ENRICHMENT_TTL_MISP = int(envvar("ENRICHMENT_TTL_MISP", "3600"))
+ENRICHMENT_NEGATIVE_TTL = int(envvar("ENRICHMENT_NEGATIVE_TTL", "3600"))
+CVE_IMPORT_PATH = envvar("CVE_IMPORT_PATH", "/app/cve/import")
+
+MISP_LOOKUP_KEYS = ["urls", "md5s", "sha256s", "sha1s", "sha512s", "email_addresses", "domains", "ipv4s", "cves"]
 
 class Config:
     '''
@@ -80,20 +111,70 @@ class Pusher(Server):
         and push it to gitlab.
     '''
 
+    CONSUMER = None
+    PROCESSED = None
+    BLOBS = BlobStore(CLAIMCHECK_PATH, SERVICENAME)
     EXTENSIONS = list(filter(lambda ext: ext.in_report(), load_extensions(SERVICENAME)))
+    ENRICHMENT = EnrichmentEngine([
+        Provider("circl", CVE_WORKERS),
+        Provider("virustotal", VT_WORKERS),
+        Provider("misp", MISP_WORKERS),
+        Provider("mitre", 1, chunk_size=None),
+    ], SERVICENAME)
+
+    @app.route('/stats')
+    def stats():
+        '''
+        stats will return the counters of the enrichment cache, the quota of
+            VirusTotal, the latency of the providers and the consumer.
+        '''
+        return jsonify({
+            "virustotal": VT_QUOTA.stats(),
+            "http": dict(HTTP_CLIENT.stats(), **VT_CLIENT.stats()),
+            "cache": Pusher.ENRICHMENT.cache.stats() if Pusher.ENRICHMENT.cache is not None else None,
+            "consumer": Pusher.CONSUMER.stats() if Pusher.CONSUMER is not None else None
+        })
+
+    @staticmethod
+    def lookup_misp_appearance(findings):
+        '''
+        lookup_misp_appearance will start the MISP lookups of all IoC's of a report,
+            so they run while the other providers are asked.
+        @param findings will a be an object with all findings.
+        @return a list of futures of the lookups or None incase MISP is not reachable.
+        '''
+        try:
+            misp_handle = PyMISP(MISP_SERVER, MISP_TOKEN, MISP_CERT_VERIFY, 'json')
+            targets = [element for key in MISP_LOOKUP_KEYS if (elements := findings.get(key)) is not None for element in elements]
+            def lookup(chunk):
+                appearance = LookupResult()
+                for element in chunk:
+                    if (found := get_appearance_in_misp(misp_handle, element, SERVICENAME)) is None:
+                        appearance.fail(element, "")
+                    else:
+                        appearance[element] = found
+                return appearance
+            return Pusher.ENRICHMENT.submit("misp", lookup, targets, "misp")
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+        return None
 
     @staticmethod
-    def add_misp_appearance(findings, improved_findings):
+    def add_misp_appearance(findings, improved_findings, lookups=None):
         '''
         enrich the found iocs with misp information, atleast some of them.
         @param findings will a be an object with all findings.
         @param improved_findings will be all allready enriched findings by
             things like virus_total or circl.lu
+        @param lookups will be the futures of lookup_misp_appearance. Without
+            them the lookups are started here.
         @return dict with merged findings.
         '''
         enriched = improved_findings
         try:
-            misp_handle = PyMISP(MISP_SERVER, MISP_TOKEN, MISP_CERT_VERIFY, 'json')
+            if (lookups := lookups if lookups is not None else Pusher.lookup_misp_appearance(findings)) is None:
+                return enriched
+            appearance = Pusher.ENRICHMENT.gather(lookups)
             key_type = {
                 "urls": "url",
                 "md5s": "md5",
@@ -104,13 +185,13 @@ class Pusher(Server):
             }
             for find_key, k_type in key_type.items():
                 if (elements := findings[str(find_key)]) is not None and len(elements) > 0:
-                    enriched[find_key] = [{str(k_type): element, "misp": get_appearance_in_misp(misp_handle, element, SERVICENAME)} for element in elements]
+                    enriched[find_key] = [{str(k_type): element, "misp": appearance.get(element, "")} for element in elements]
             if (domains_details := improved_findings['domains']) is not None and len(domains_details) > 0:
-                for key, value in domains_details.items(): improved_findings['domains'][key] = {**value, "misp": get_appearance_in_misp(misp_handle, key, SERVICENAME)}
+                for key, value in domains_details.items(): improved_findings['domains'][key] = {**value, "misp": appearance.get(key, "")}
             if (ipv4_details := improved_findings['ipv4']) is not None and len(ipv4_details) > 0:
-                for key, value in ipv4_details.items(): improved_findings['ipv4'][key] = {**value, "misp": get_appearance_in_misp(misp_handle, key, SERVICENAME)}
+                for key, value in ipv4_details.items(): improved_findings['ipv4'][key] = {**value, "misp": appearance.get(key, "")}
             if (cve_details := improved_findings['cve']) is not None and len(cve_details) > 0:   
-                for key, value in cve_details.items(): improved_findings['cve'][key] = {**value, "misp": get_appearance_in_misp(misp_handle, key, SERVICENAME)}
+                for key, value in cve_details.items(): improved_findings['cve'][key] = {**value, "misp": appearance.get(key, "")}
             enriched = {
                 **improved_findings,
                 **enriched
@@ -123,31 +204,25 @@ class Pusher(Server):
     def generate_improved_findings(findings):
         '''
         generate_improved_findings will generate more data about cve\'s,
-            ipv4\'s, domain\'s and mitre tactic\'s and technique\'s.
+            ipv4\'s, domain\'s and mitre tactic\'s and technique\'s. All
+            providers and IoC\'s are looked up at the same time by the
+            enrichment engine. The requests to VirusTotal are prioritized by
+            the arrival of the report, so older reports are served first.
         @param findings will be a set of findings in dict format.
         @return a dict with more data about the finding.s
         '''
         improved_findings = {}
         try:
-            cve_details, ipv4_details, domains_details, m_e_tactics, m_e_techniques = {}, {}, {}, {}, {}
-            if (cves := findings['cves']) is not None and len(cves) > 0:
-                cve_details = get_cve_information(cves, SERVICENAME)
-            if (ipv4s := findings['ipv4s']) is not None and len(ipv4s) > 0:
-                ipv4_details = get_vt_information_ipv4(VT_API_KEY, ipv4s, SERVICENAME)
-            if (domains := findings['domains']) is not None and len(domains) > 0:
-                domains_details = get_vt_information_domains(VT_API_KEY, domains, SERVICENAME)
-            if (mitre_attack_tac_ent := findings['attack_tactics']['enterprise']) is not None and len(mitre_attack_tac_ent) > 0:
-                m_e_tactics = get_mitre_information_tactics_enterpise(mitre_attack_tac_ent, SERVICENAME)
-            if (mitre_attack_tech_ent := findings['attack_techniques']['enterprise']) is not None and len(mitre_attack_tech_ent) > 0:
-                m_e_techniques = get_mitre_information_techniques_enterpise(mitre_attack_tech_ent, SERVICENAME)
-            improved_findings = {
-                "cve": cve_details,
-                "ipv4": ipv4_details,
-                "domains": domains_details,
-                "Enterprice_tactics": m_e_tactics,
-                "Enterprice_techniques": m_e_techniques,
-            }
-            improved_findings = Pusher.add_misp_appearance(findings, improved_findings)
+            priority = time.time()
+            lookups = Pusher.lookup_misp_appearance(findings)
+            improved_findings = Pusher.ENRICHMENT.enrich({
+                "cve": ("circl", lambda chunk: get_cve_information(chunk, SERVICENAME), findings['cves'], "cve"),
+                "ipv4": ("virustotal", lambda chunk: get_vt_information_ipv4(VT_API_KEY, chunk, SERVICENAME, priority), findings['ipv4s'], "vt_ipv4"),
+                "domains": ("virustotal", lambda chunk: get_vt_information_domains(VT_API_KEY, chunk, SERVICENAME, priority), findings['domains'], "vt_domain"),
+                "Enterprice_tactics": ("mitre", lambda chunk: get_mitre_information_tactics_enterpise(chunk, SERVICENAME), findings['attack_tactics']['enterprise']),
+                "Enterprice_techniques": ("mitre", lambda chunk: get_mitre_information_techniques_enterpise(chunk, SERVICENAME), findings['attack_techniques']['enterprise']),
+            })
+            improved_findings = Pusher.add_misp_appearance(findings, improved_findings, lookups)
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
         return improved_findings
@@ -162,6 +237,18 @@ class Pusher(Server):
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
 
+    @scheduler.task("interval", id="claimcheck_expire", hours=1, timezone=pytz.UTC)
+    def expire_blobs():
+        '''
+        expire_blobs will remove the stored findings which are older than the
+            CLAIMCHECK_RETENTION.
+        '''
+        try:
+            if os.path.isdir(CLAIMCHECK_PATH):
+                Pusher.BLOBS.expire(CLAIMCHECK_RETENTION)
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+
     @staticmethod
     def generate_markdown(findings):
         '''
@@ -174,7 +261,7 @@ class Pusher(Server):
         '''
         try:
             improved_findings = Pusher.generate_improved_findings(findings)
-            forbidden_keys = ['ipv4s', 'domains', 'attack_techniques', 'attack_tactics', 'cves', 'phone_numbers', 'registry_key_paths', "email_addresses", 'urls', 'sha256s', 'sha512s', 'sha1s', 'md5s']
+            forbidden_keys = ['ipv4s', 'domains', 'attack_techniques', 'attack_tactics', 'cves', 'phone_numbers', 'registry_key_paths', "email_addresses", 'urls', 'sha256s', 'sha512s', 'sha1s', 'md5s', 'resubmission', 'report_id']
             for key, value in findings.items():
                 if key not in forbidden_keys:
                     improved_findings[key] = value
@@ -226,6 +313,19 @@ class Pusher(Server):
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
         return data
 
+    @scheduler.task("interval", id="cve_import", hours=1, timezone=pytz.UTC)
+    def import_cves():
+        '''
+        import_cves will import the new or changed CVE dumps of CVE_IMPORT_PATH into
+            the offline CVE store, like the dumps of modified CVE\'s of the NVD.
+        '''
+        try:
+            if os.path.isdir(CVE_IMPORT_PATH) and len(os.listdir(CVE_IMPORT_PATH)) > 0:
+                if (imported := get_cve_store(SERVICENAME, create=True).import_directory(CVE_IMPORT_PATH)) > 0:
+                    LogMessage("Imported {} CVE\'s into the offline store.".format(imported), LogMessage.LogTyp.INFO, SERVICENAME).log()
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+
     @scheduler.task("cron", id="execute", year='*', month='*', timezone=pytz.UTC)
     def create_monthly_branch():
         '''
@@ -241,11 +341,17 @@ class Pusher(Server):
     def submit_report(findings):
         '''
         submit_report will submit the pull-request into the
-            IoC-[CurrentDate]-Branch.
+            IoC-[CurrentDate]-Branch. Reports which have been submitted before
+            under the same name are skipped before the findings are improved.
         @param findings will be all findings in json/dict formtat.
         '''
+        report_id = None
+        success = False
         try:
-            findings = json.loads(findings.value.decode("utf-8"))
+            findings = check_out(loads_record(findings), Pusher.BLOBS)
+            if Pusher.PROCESSED.skip(submission := submission_id(findings.get('report_id'), findings.get('input_filename'))):
+                return
+            report_id = submission
             report_name = findings['input_filename'] if 'input_filename' in findings.keys() else random.randint(4, 10000)
             gitlab_instance = gitlab.Gitlab(GITLAB_SERVER, GITLAB_TOKEN)
             projectid = get_projectid_by_name(gitlab_instance, GITLAB_REPO_NAME, SERVICENAME)
@@ -253,27 +359,33 @@ class Pusher(Server):
             gprojects.branches.create({'branch': report_name, 'ref': get_branch_name()})
             data = Pusher.create_markdown(findings, report_name)
             commit = gprojects.commits.create(data)
+            description = "A report has been submitted. The name of the branch is: {}.".format(report_name)
+            if findings.get('resubmission', False):
+                description += " The report is a resubmission of an already extracted report."
             create_issues(  gitlabserver=GITLAB_SERVER,
                             token=GITLAB_TOKEN,
                             repository=GITLAB_REPO_NAME,
                             servicename=SERVICENAME,
                             title=report_name,
-                            description="A report has been submitted. The name of the branch is: {}.".format(report_name))
+                            description=description)
+            success = True
         except gitlab.gitlab.GitlabCreateError as gc_error:
             LogMessage(str(gc_error), LogMessage.LogTyp.INFO, SERVICENAME).log()
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+        finally:
+            Pusher.PROCESSED.finish(report_id, success)
 
     @staticmethod
     def consume_findings():
         '''
         consume_findings will consume all findings from KAFKA and
-            push them into the gitlab repository.
+            push them into the gitlab repository. The findings are submitted
+            by a bounded pool of threads and committed after their submission.
         '''
         try:
-            consumer = KafkaConsumer(IOC_TOPIC_NAME, bootstrap_servers=KAFKA_SERVER, client_id='ioc_pusher', api_version=(2, 7, 0),)
-            for report in consumer:
-                Thread(target=Pusher.submit_report, args=(report,), daemon=True).start()
+            Pusher.CONSUMER = BoundedConsumer(IOC_TOPIC_NAME, KAFKA_SERVER, KAFKA_GROUP_ID, 'ioc_pusher', Pusher.submit_report, SERVICENAME)
+            Pusher.CONSUMER.run()
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
 
@@ -281,9 +393,18 @@ class Pusher(Server):
         '''
         __call__ override __call__ function from server-class.
         '''
-        attack = Attck(nested_subtechniques=False)
-        attack.update()
+        provision_topics(KAFKA_SERVER, [HEALTHTOPIC], partitioned=[IOC_TOPIC_NAME])
+        load_mitre_index(SERVICENAME)
         create_repository_if_not_exists(gitlabserver=GITLAB_SERVER, token=GITLAB_TOKEN, repository=GITLAB_REPO_NAME, servicename=SERVICENAME)
+        Pusher.PROCESSED = ProcessedStore(PROCESSED_DB_PATH, SERVICENAME)
+        if ENRICHMENT_CACHE_ENTRIES > 0:
+            Pusher.ENRICHMENT.cache = EnrichmentCache(ENRICHMENT_CACHE_PATH, ENRICHMENT_CACHE_ENTRIES, {
+                "cve": ENRICHMENT_TTL_CVE,
+                "vt_ipv4": ENRICHMENT_TTL_VT,
+                "vt_domain": ENRICHMENT_TTL_VT,
+                "misp": ENRICHMENT_TTL_MISP,
+            }, ENRICHMENT_NEGATIVE_TTL, SERVICENAME)
+        Thread(target=Pusher.import_cves, daemon=True).start()
         Thread(target=Pusher.consume_findings, daemon=True).start()
         Pusher.create_monthly_branch()
         scheduler.start()
@@ -5,7 +5,6 @@ This class will represent the reporter-server.
 # pylint: disable=C0413, C0411
 
 import sys
-import json
 import pytz
 sys.path.append('..')
 
@@ -13,7 +12,6 @@ from threading import Thread
 
 from pymisp import PyMISP
 
-from kafka.consumer import KafkaConsumer
 
 from flask import Flask
 from flask_script import Server
@@ -22,12 +20,19 @@ from flask_apscheduler import APScheduler
 from libs.core.environment import envvar
 from libs.kafka.logging import LogMessage
 from libs.kafka.logging import send_health_message
+from libs.kafka.consumer import BoundedConsumer
+from libs.kafka.envelope import loads_record
+from libs.kafka.processed import ProcessedStore
+from libs.kafka.processed import submission_id
+from libs.kafka.topichandler import provision_topics
 from libs.misp.event import handle_misp_event
 
 SERVICENAME = envvar("SERVICENAME", "Reporter")
 KAFKA_SERVER = envvar("KAFKA_SERVER", "0.0.0.0:9092")
 HEALTHTOPIC = envvar("HEALTH_TOPIC", "health_report")
+KAFKA_GROUP_ID = envvar("KAFKA_GROUP_ID", "ioc_reporter")
 REPORT_TOPIC = envvar("REPORT_TOPIC", "rfreport")
+PROCESSED_DB_PATH = envvar("PROCESSED_DB_PATH", "/app/iocreporter/processed/processed.db")
 MISP_SERVER = envvar("MISP_SERVER", "0.0.0.0")
 MISP_TOKEN = envvar("MISP_TOKEN", None)
 MISP_CERT_VERIFY = True if envvar("MISP_VERIF", True) == "True" else False
@@ -56,6 +61,9 @@ class Reporter(Server):
     Reporter will be a class representing the reporter-service.
     '''
 
+    CONSUMER = None
+    PROCESSED = None
+
     @scheduler.task("interval", id="health_push", seconds=5, timezone=pytz.UTC)
     def healthpush():
         '''
@@ -69,25 +77,35 @@ class Reporter(Server):
     @staticmethod
     def push_misp_report(report):
         '''
-        push_misp_report will send the misp report to the misp-platfrom.
+        push_misp_report will send the misp report to the misp-platfrom. Reports
+            which have been pushed before under the same name are skipped before
+            MISP is called.
         '''
+        report_id = None
+        success = False
         try:
-            report = json.loads(report.value.decode('UTF-8'))
+            report = loads_record(report)
+            if Reporter.PROCESSED.skip(submission := submission_id(report.get('report_id'), report.get('Eventname'))):
+                return
+            report_id = submission
             misp_connection = PyMISP(MISP_SERVER, MISP_TOKEN, MISP_CERT_VERIFY)
             handle_misp_event(misp_connection, report, SERVICENAME)
+            success = True
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
+        finally:
+            Reporter.PROCESSED.finish(report_id, success)
 
     @staticmethod
     def consume_reports():
         '''
         consume_reports will consume all available reports from KAFKA
-            and push the results to the MISP-Plattform.
+            and push the results to the MISP-Plattform. The reports are pushed
+            by a bounded pool of threads and committed after their push.
         '''
         try:
-            consumer = KafkaConsumer(REPORT_TOPIC, bootstrap_servers=KAFKA_SERVER, client_id='ioc_reporter', api_version=(2,7,0),)
-            for report in consumer:
-                Thread(target=Reporter.push_misp_report, args=(report,), daemon=True).start()
+            Reporter.CONSUMER = BoundedConsumer(REPORT_TOPIC, KAFKA_SERVER, KAFKA_GROUP_ID, 'ioc_reporter', Reporter.push_misp_report, SERVICENAME)
+            Reporter.CONSUMER.run()
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
 
@@ -95,6 +113,8 @@ class Reporter(Server):
         '''
         __call__ override __call__ function from server-class.
         '''
+        provision_topics(KAFKA_SERVER, [HEALTHTOPIC], partitioned=[REPORT_TOPIC])
+        Reporter.PROCESSED = ProcessedStore(PROCESSED_DB_PATH, SERVICENAME)
         scheduler.start()
         Thread(target=Reporter.consume_reports, daemon=True).start()
         return Server.__call__(self, app, *args, **kwargs)
@@ -0,0 +1,108 @@
+'''
+Benchmark for the blacklist filter. It compares the former filtering, which walked
+    the findings once for every blocked value, with the compiled BlacklistIndex.
+
+It also measures the matching time per IoC against a large number of CIDR and
+    wildcard rules.
+
+Usage (from the iocextractor folder):
+    PYTHONPATH=.. python -m libs.core.benchmark_filter [entries] [rules]
+'''
+
+import sys
+import copy
+import time
+import random
+
+from libs.core.filter import BlacklistIndex
+
+def legacy_replace_item(finding, findings_key, blocked):
+    '''
+    legacy_replace_item will be the former filtering of one blocked value.
+    '''
+    for f_key, f_values in finding.items():
+        if isinstance(f_values, dict):
+            finding[f_key] = legacy_replace_item(f_values, findings_key, blocked)
+        if findings_key in finding:
+            finding[findings_key] = list(filter(lambda x: x != blocked, finding[findings_key]))
+    return finding
+
+def legacy_filter(findings, blacklist):
+    '''
+    legacy_filter will be the former filter_by_blacklist.
+    '''
+    for name, blocks in blacklist.items():
+        for block in blocks:
+            findings = legacy_replace_item(findings, name, block)
+    return findings
+
+def generate(entries, seed=0):
+    '''
+    generate will generate a blacklist with the given number of entries and findings
+        of a typical report, of which a tenth is blacklisted.
+    @return a tuple in the format (blacklist, findings).
+    '''
+    rand = random.Random(seed)
+    domains = ["{}.example{}.com".format(rand.randint(0, 10**6), index) for index in range(entries // 2)]
+    ipv4s = ["{}.{}.{}.{}".format(*[rand.randint(0, 255) for _ in range(4)]) for _ in range(entries - entries // 2)]
+    blacklist = {"domains": domains, "ipv4s": ipv4s}
+    findings = {
+        "domains": rand.sample(domains, 30) + ["report{}.org".format(index) for index in range(270)],
+        "ipv4s": rand.sample(ipv4s, 20) + ["10.0.{}.{}".format(index // 250, index % 250) for index in range(180)],
+        "urls": ["http://report{}.org/path".format(index) for index in range(200)],
+        "md5s": ["{:032x}".format(rand.getrandbits(128)) for _ in range(100)],
+        "attack_techniques": {"enterprise": ["T{}".format(1000 + index) for index in range(50)]},
+    }
+    return blacklist, findings
+
+def run(entries):
+    '''
+    run will time both filters and print the results.
+    @param entries will be the number of entries of the blacklist.
+    '''
+    blacklist, findings = generate(entries)
+    start = time.perf_counter()
+    expected = legacy_filter(copy.deepcopy(findings), blacklist)
+    legacy = time.perf_counter() - start
+    start = time.perf_counter()
+    index = BlacklistIndex(blacklist)
+    compiled = time.perf_counter() - start
+    rounds = 100
+    start = time.perf_counter()
+    for _ in range(rounds):
+        actual = index.apply(copy.deepcopy(findings))
+    indexed = (time.perf_counter() - start) / rounds
+    assert actual == expected
+    print("blacklist entries:  {}".format(entries))
+    print("legacy filter:      {:.4f} s".format(legacy))
+    print("index compilation:  {:.4f} s (once per blacklist version)".format(compiled))
+    print("index filter:       {:.6f} s (incl. copy of the findings)".format(indexed))
+    print("speed-up:           {:.0f}x".format(legacy / indexed if indexed > 0 else float('inf')))
+
+def run_rules(rules, lookups=100000, seed=0):
+    '''
+    run_rules will time the matching of single IoC's against CIDR and wildcard rules.
+    @param rules will be the number of rules of each type.
+    @param lookups will be the number of matched IoC's.
+    '''
+    rand = random.Random(seed)
+    blacklist = {
+        "ipv4s": ["{}.{}.{}.0/24".format(*[rand.randint(0, 255) for _ in range(3)]) for _ in range(rules)],
+        "domains": ["*.host{}.example{}.com".format(index, rand.randint(0, 99)) for index in range(rules)],
+    }
+    start = time.perf_counter()
+    index = BlacklistIndex(blacklist)
+    compiled = time.perf_counter() - start
+    ipv4s = ["{}.{}.{}.{}".format(*[rand.randint(0, 255) for _ in range(4)]) for _ in range(lookups)]
+    domains = ["www.host{}.example{}.com".format(rand.randint(0, 2 * rules), rand.randint(0, 99)) for _ in range(lookups)]
+    findings = {"ipv4s": ipv4s, "domains": domains}
+    start = time.perf_counter()
+    index.apply(findings)
+    matched = (time.perf_counter() - start) / (2 * lookups)
+    print("rules per type:     {}".format(rules))
+    print("index compilation:  {:.2f} s".format(compiled))
+    print("match per IoC:      {:.3f} us".format(matched * 10**6))
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
+    run_rules(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
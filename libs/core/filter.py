@@ -2,6 +2,14 @@
 This script contains function to eleminate duplicates from datastructures.
 '''
 
+import os
+import pickle
+import socket
+
+from array import array
+from bisect import bisect_right
+from types import MappingProxyType
+
 from libs.kafka.logging import LogMessage
 
 def filter_dict_values(dictionary, servicename):
@@ -21,37 +29,308 @@ def filter_dict_values(dictionary, servicename):
     return dictionary
 
 
-def replace_item(finding, findings_key, blocked, servicename):
+def parse_address(value):
     '''
-    replace_item will traverse over the finding and replace an
-    blacklisted element from the finding object.
-    @param name of the key where to filter.
-    @param blocked will be the value which should be blocked.
+    parse_address will convert an ip address into an integer.
+    @param value will be the ip address as string.
+    @return a tuple in the format (family, number) or None if the value is no
+        ip address.
     '''
+    if ":" in value:
+        family = socket.AF_INET6
+    elif value[:1].isdigit():
+        family = socket.AF_INET
+    else:
+        return None
     try:
+        return family, int.from_bytes(socket.inet_pton(family, value), "big")
+    except (OSError, ValueError):
+        return None
+
+def parse_network(value):
+    '''
+    parse_network will convert a network in the CIDR notation into an interval.
+    @param value will be the network as string e.g. 10.0.0.0/8.
+    @return a tuple in the format (family, first, last) or None if the value is no
+        network.
+    '''
+    address, _, prefix = value.partition("/")
+    parsed = parse_address(address)
+    if parsed is None or not prefix.isdigit():
+        return None
+    family, number = parsed
+    bits = 32 if family == socket.AF_INET else 128
+    prefix = int(prefix)
+    if prefix > bits:
+        return None
+    hostmask = (1 << (bits - prefix)) - 1
+    return family, number & ~hostmask, (number & ~hostmask) | hostmask
+
+
+class NetworkRanges():
+    '''
+    NetworkRanges will contain the CIDR rules of one family as sorted, merged
+        intervals. The intervals are bucketed by the first 16 bits of the address,
+        so a lookup is a short binary search within one bucket. The intervals are
+        stored in arrays (IPv4) or lists of int (IPv6), which keeps millions of rules
+        compact and invisible for the garbage collector.
+    '''
+
+    __slots__ = ('firsts', 'lasts', 'buckets', 'shift')
+
+    BUCKET_BITS = 16
+
+    def __init__(self, intervals, family=socket.AF_INET):
+        '''
+        CTor of the NetworkRanges-class.
+        @param intervals will be a list of tuples in the format (first, last).
+        @param family will be the address family of the intervals.
+        '''
+        firsts, lasts = [], []
+        for first, last in sorted(intervals):
+            if lasts and first <= lasts[-1] + 1:
+                lasts[-1] = max(lasts[-1], last)
+            else:
+                firsts.append(first)
+                lasts.append(last)
+        self.shift = (32 if family == socket.AF_INET else 128) - NetworkRanges.BUCKET_BITS
+        # buckets[n] is the position of the first interval which starts in bucket n or later.
+        self.buckets = array('L', [0] * ((1 << NetworkRanges.BUCKET_BITS) + 1))
+        position = 0
+        for bucket in range(len(self.buckets)):
+            while position < len(firsts) and firsts[position] >> self.shift < bucket:
+                position += 1
+            self.buckets[bucket] = position
+        if family == socket.AF_INET:
+            firsts, lasts = array('Q', firsts), array('Q', lasts)
+        self.firsts = firsts
+        self.lasts = lasts
+
+    def __len__(self):
+        '''
+        __len__ will return the number of merged intervals.
+        '''
+        return len(self.firsts)
+
+    def __contains__(self, number):
+        '''
+        __contains__ will check if the address is part of a network. If no interval
+            of the bucket starts before the address, the last interval of the previous
+            buckets is checked.
+        @param number will be the address as integer.
+        @return True if the address is part of a network.
+        '''
+        bucket = number >> self.shift
+        position = bisect_right(self.firsts, number, self.buckets[bucket], self.buckets[bucket + 1]) - 1
+        return position >= 0 and number <= self.lasts[position]
+
+
+class DomainTrie():
+    '''
+    DomainTrie will contain the wildcard rules (*.domain) as trie of the reversed
+        labels. A rule matches all subdomains of the domain, but not the domain itself.
+        The nodes are stored flat in one dict keyed by the reversed label path
+        (e.g. "gov.fbi"), the value is True if a rule ends at the node.
+    '''
+
+    __slots__ = ('nodes',)
+
+    def __init__(self, domains):
+        '''
+        CTor of the DomainTrie-class.
+        @param domains will be a list of domains without the leading "*.".
+        '''
+        self.nodes = {}
+        for domain in domains:
+            path = None
+            for label in reversed(domain.lower().strip(".").split(".")):
+                path = label if path is None else path + "." + label
+                self.nodes.setdefault(path, False)
+            self.nodes[path] = True
+
+    def __contains__(self, domain):
+        '''
+        __contains__ will check if the domain is a subdomain of a rule.
+        @param domain will be the domain as string.
+        @return True if a rule matches the domain.
+        '''
+        labels = domain.lower().split(".")
+        path = None
+        for position in range(len(labels) - 1, 0, -1):
+            path = labels[position] if path is None else path + "." + labels[position]
+            terminal = self.nodes.get(path)
+            if terminal is None:
+                return False
+            if terminal:
+                return True
+        return False
+
+
+class BlacklistRules():
+    '''
+    BlacklistRules will contain the compiled rules of one findings key. Values are
+        matched exactly, by CIDR ranges (e.g. 10.0.0.0/8) and by wildcard domains
+        (e.g. *.example.com).
+    '''
+
+    __slots__ = ('exact', 'networks', 'domains')
+
+    def __init__(self, blocks):
+        '''
+        CTor of the BlacklistRules-class.
+        @param blocks will be a list with the blocked values of the key.
+        '''
+        exact, intervals, wildcards = set(), {socket.AF_INET: [], socket.AF_INET6: []}, []
+        for block in blocks:
+            if not isinstance(block, (str, int, float)):
+                continue
+            if isinstance(block, str) and block.startswith("*.") and len(block) > 2:
+                wildcards.append(block[2:])
+            elif isinstance(block, str) and "/" in block and (network := parse_network(block)) is not None:
+                intervals[network[0]].append(network[1:])
+            else:
+                exact.add(block)
+        self.exact = frozenset(exact)
+        self.networks = {family: NetworkRanges(ranges, family) for family, ranges in intervals.items() if len(ranges) > 0}
+        self.domains = DomainTrie(wildcards) if len(wildcards) > 0 else None
+
+    def __len__(self):
+        '''
+        __len__ will return the number of exact values and merged ranges.
+        '''
+        return len(self.exact) + sum(len(ranges) for ranges in self.networks.values())
+
+    def __contains__(self, value):
+        '''
+        __contains__ will check if the value is blocked.
+        @param value will be the value of a finding.
+        @return True if the value is blocked.
+        '''
+        if value in self.exact:
+            return True
+        if not isinstance(value, str):
+            return False
+        if self.networks and (address := parse_address(value)) is not None:
+            ranges = self.networks.get(address[0])
+            return ranges is not None and address[1] in ranges
+        return self.domains is not None and value in self.domains
+
+
+class BlacklistIndex():
+    '''
+    BlacklistIndex will be an immutable, compiled version of the blacklist. Every key
+        of the blacklist gets its BlacklistRules, so the findings can be filtered in
+        a single pass.
+    '''
+
+    __slots__ = ('_rules',)
+
+    def __init__(self, blacklist):
+        '''
+        CTor of the BlacklistIndex-class.
+        @param blacklist will be a dict in the format {"findings_key": ["blocked", ]}.
+        '''
+        rules = {}
+        for name, blocks in (blacklist or {}).items():
+            if isinstance(blocks, list):
+                rules[str(name)] = BlacklistRules(blocks)
+        object.__setattr__(self, '_rules', MappingProxyType(rules))
+
+    def __setattr__(self, name, value):
+        '''
+        __setattr__ will prevent changes, a new blacklist needs a new index.
+        '''
+        raise AttributeError("BlacklistIndex is immutable")
+
+    def __len__(self):
+        '''
+        __len__ will return the number of blocked values and ranges.
+        '''
+        return sum(len(blocks) for blocks in self._rules.values())
+
+    def __reduce__(self):
+        '''
+        __reduce__ will pickle the compiled rules, so a stored index is loaded without
+            compiling the blacklist again.
+        '''
+        return (BlacklistIndex.from_rules, (dict(self._rules),))
+
+    @staticmethod
+    def from_rules(rules):
+        '''
+        from_rules will create an index from already compiled rules.
+        @param rules will be a dict in the format {"findings_key": BlacklistRules}.
+        @return the BlacklistIndex.
+        '''
+        index = BlacklistIndex({})
+        object.__setattr__(index, '_rules', MappingProxyType(rules))
+        return index
+
+    def apply(self, finding):
+        '''
+        apply will remove all blocked values from the findings. Like the findings the
+            index is keyed by the name of the findings, so every list with a name of
+            the blacklist will be filtered on every level of the findings.
+        @param finding will be a dict with findings.
+        @return the filtered findings.
+        '''
         for f_key, f_values in finding.items():
             if isinstance(f_values, dict):
-                finding[f_key] = replace_item(f_values, findings_key, blocked, servicename)
-            if findings_key in finding:
-                finding[findings_key] = list(filter(lambda x: x != blocked, finding[findings_key]))
-    except Exception as error:
-        LogMessage(str(error)+"hh2", LogMessage.LogTyp.ERROR, servicename).log()
-    return finding
+                self.apply(f_values)
+            elif isinstance(f_values, list) and (blocks := self._rules.get(f_key)) is not None:
+                finding[f_key] = [value for value in f_values if isinstance(value, (dict, list)) or value not in blocks]
+        return finding
 
 def filter_by_blacklist(findings, blacklist, servicename):
     '''
     filter_by_blacklist will filter the findings by the values in the blacklist.
     @param findings will be a dict with all findings.
-    @param blacklist will be dict with all values to block.
+    @param blacklist will be a BlacklistIndex or a dict with all values to block.
     @servicename will be the name of the calling service.
     @return will return the filter findings as dict.
     '''
 
     try:
         if blacklist is not None:
-            for name, blocks in blacklist.items():
-                for block in blocks:
-                    findings = replace_item(findings, name, block, servicename)
+            if not isinstance(blacklist, BlacklistIndex):
+                blacklist = BlacklistIndex(blacklist)
+            findings = blacklist.apply(findings)
     except Exception as error:
-        LogMessage(str(error)+"hh", LogMessage.LogTyp.ERROR, servicename).log()
+        LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
     return findings
+
+def store_blacklist_index(index, revision, path, servicename):
+    '''
+    store_blacklist_index will store a compiled blacklist on the disk, so a restarted
+        service can use it before the blacklist is fetched again.
+    @param index will be the BlacklistIndex.
+    @param revision will be the revision of the blacklist the index was compiled from.
+    @param path will be the path of the file.
+    @param servicename will be the name of the calling service.
+    '''
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp_path, "wb") as file:
+            pickle.dump((revision, index), file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except Exception as error:
+        LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+
+def load_blacklist_index(path, servicename):
+    '''
+    load_blacklist_index will load a blacklist stored by store_blacklist_index.
+    @param path will be the path of the file.
+    @param servicename will be the name of the calling service.
+    @return a tuple in the format (revision, BlacklistIndex), incase of a missing or
+        broken file (None, None).
+    '''
+    try:
+        if os.path.isfile(path):
+            with open(path, "rb") as file:
+                revision, index = pickle.load(file)
+            if isinstance(index, BlacklistIndex):
+                return revision, index
+    except Exception as error:
+        LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+    return None, None
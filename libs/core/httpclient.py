@@ -0,0 +1,200 @@
+'''
+This script contains the HTTP client of the enrichment providers. Every host gets a
+    pooled session, so the connections are reused, and every request has timeouts,
+    bounded retries and a size limit.
+'''
+
+import time
+import random
+
+from threading import Lock
+from urllib.parse import urlsplit
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from libs.core.environment import envvar
+
+# ENVIRONMENT-VARS
+HTTP_CONNECT_TIMEOUT = float(envvar("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(envvar("HTTP_READ_TIMEOUT", "30"))
+HTTP_RETRIES = int(envvar("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(envvar("HTTP_BACKOFF", "0.5"))
+HTTP_BACKOFF_MAX = float(envvar("HTTP_BACKOFF_MAX", "30"))
+HTTP_MAX_BYTES = int(envvar("HTTP_MAX_BYTES", str(16 * 1024 * 1024)))
+HTTP_POOL_SIZE = int(envvar("HTTP_POOL_SIZE", "16"))
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+class ResponseTooLarge(Exception):
+    '''
+    ResponseTooLarge will be raised if a response is larger than the size limit.
+    '''
+
+
+def redact(url):
+    '''
+    redact will strip the query and the credentials of a url, like the apikey of
+        VirusTotal, before the url is logged.
+    @param url will be the url.
+    @return the url in the format scheme://host/path.
+    '''
+    parts = urlsplit(url or "")
+    host = parts.hostname or ""
+    if parts.port is not None:
+        host = "{}:{}".format(host, parts.port)
+    return "{}://{}{}".format(parts.scheme, host, parts.path)
+
+def sanitize(error, url):
+    '''
+    sanitize will return an error of the same type without the url and the headers of
+        the request, because requests puts the full url into its messages.
+    @param error will be the error of requests.
+    @param url will be the url of the request.
+    @return the error with a message in the format "url: type".
+    '''
+    return type(error)("{}: {}".format(redact(url), type(error).__name__))
+
+class HttpClient():
+    '''
+    HttpClient will send the requests of a process through one session per host. A
+        request which fails to connect, times out or gets a status of RETRY_STATUS is
+        repeated after a jittered exponential backoff. The latency of the requests is
+        counted per host, so slow providers are visible.
+    '''
+
+    def __init__(self, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT), retries=HTTP_RETRIES, backoff=HTTP_BACKOFF, max_bytes=HTTP_MAX_BYTES, pool_size=HTTP_POOL_SIZE):
+        '''
+        CTor of the HttpClient-class.
+        @param timeout will be a tuple in the format (connect, read) in seconds.
+        @param retries will be the number of retries of a failed request.
+        @param backoff will be the base of the backoff in seconds.
+        @param max_bytes will be the maximum size of a response.
+        @param pool_size will be the number of connections per host.
+        '''
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_bytes = max_bytes
+        self.pool_size = pool_size
+        self.lock = Lock()
+        self.sessions = {}
+        self.latencies = {}
+
+    def session(self, host):
+        '''
+        session will return the session of a host and create it on the first call.
+        @param host will be the scheme and host of the url, like https://cve.circl.lu.
+        @return a requests.Session.
+        '''
+        with self.lock:
+            if (session := self.sessions.get(host)) is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self.sessions[host] = session
+            return session
+
+    def __delay(self, attempt, response=None):
+        '''
+        __delay will return the time to wait before a retry. A Retry-After header of
+            the response is respected.
+        @param attempt will be the number of the failed attempt, starting at 0.
+        @param response will be the failed response or None.
+        @return the delay in seconds.
+        '''
+        if response is not None and (retry_after := response.headers.get("Retry-After", "")).isdigit():
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        return random.uniform(0, min(self.backoff * 2 ** attempt, HTTP_BACKOFF_MAX))
+
+    def __count(self, host, seconds, failed):
+        '''
+        __count will add the latency of a request to the counters of its host.
+        @param host will be the host of the request.
+        @param seconds will be the latency of the request.
+        @param failed will be True if the request failed.
+        '''
+        with self.lock:
+            counters = self.latencies.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            counters["requests"] += 1
+            counters["errors"] += int(failed)
+            counters["total_seconds"] += seconds
+            counters["max_seconds"] = max(counters["max_seconds"], seconds)
+
+    def __read(self, response):
+        '''
+        __read will read the body of a streamed response up to the size limit.
+        @param response will be the streamed response.
+        @return the response with its content.
+        '''
+        try:
+            if int(response.headers.get("Content-Length") or 0) > self.max_bytes:
+                raise ResponseTooLarge("The response of {} has more than {} bytes".format(redact(response.url), self.max_bytes))
+            content = bytearray()
+            for block in response.iter_content(64 * 1024):
+                content.extend(block)
+                if len(content) > self.max_bytes:
+                    raise ResponseTooLarge("The response of {} has more than {} bytes".format(redact(response.url), self.max_bytes))
+            response._content = bytes(content)
+            return response
+        finally:
+            response.close()
+
+    def get(self, url, **kwargs):
+        '''
+        get will send a GET request.
+        @param url will be the url of the request.
+        @param kwargs will be passed to requests, like params or headers.
+        @return the response. The last response or error is returned or raised after
+            all retries failed, an error names the url without its query.
+        '''
+        parts = urlsplit(url)
+        host = "{}://{}".format(parts.scheme, parts.netloc)
+        session = self.session(host)
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(self.retries + 1):
+            start = time.monotonic()
+            response = None
+            try:
+                response = self.__read(session.get(url, stream=True, **kwargs))
+                self.__count(host, time.monotonic() - start, response.status_code >= 500)
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    return response
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as error:
+                self.__count(host, time.monotonic() - start, True)
+                if attempt == self.retries:
+                    raise sanitize(error, url) from None
+            except requests.RequestException as error:
+                raise sanitize(error, url) from None
+            with self.lock:
+                self.latencies[host]["retries"] += 1
+            time.sleep(self.__delay(attempt, response))
+        return response
+
+    def stats(self):
+        '''
+        stats will return the latency of the requests of every host.
+        @return a dict in the format {host: {requests, errors, retries, avg_seconds, max_seconds}}.
+        '''
+        with self.lock:
+            return {host: {
+                "requests": counters["requests"],
+                "errors": counters["errors"],
+                "retries": counters["retries"],
+                "avg_seconds": round(counters["total_seconds"] / counters["requests"], 3) if counters["requests"] > 0 else 0.0,
+                "max_seconds": round(counters["max_seconds"], 3),
+            } for host, counters in self.latencies.items()}
+
+
+HTTP_CLIENT = HttpClient()
+
+def http_get(url, **kwargs):
+    '''
+    http_get will send a GET request with the shared HttpClient of the process.
+    @param url will be the url of the request.
+    @param kwargs will be passed to requests, like params or headers.
+    @return the response.
+    '''
+    return HTTP_CLIENT.get(url, **kwargs)
@@ -0,0 +1,78 @@
+'''
+Tests for filter.py
+'''
+
+import os
+import copy
+import tempfile
+
+from unittest import TestCase
+
+from libs.core.filter import BlacklistIndex, filter_by_blacklist, load_blacklist_index, store_blacklist_index
+from libs.core.benchmark_filter import generate, legacy_filter
+
+class BlacklistIndexTests(TestCase):
+    '''
+    Tests for the compiled blacklist.
+    '''
+
+    def test_index_matches_legacy_filter(self):
+        '''
+        Test to check if the index removes the same values as the former filter.
+        '''
+        blacklist, findings = generate(2000)
+        expected = legacy_filter(copy.deepcopy(findings), blacklist)
+        self.assertEqual(BlacklistIndex(blacklist).apply(copy.deepcopy(findings)), expected)
+
+    def test_nested_findings(self):
+        '''
+        Test to check if lists on every level of the findings are filtered.
+        '''
+        findings = {"domains": ["a.com", "b.com"], "attack": {"domains": ["a.com"], "md5s": ["a.com"]}}
+        result = filter_by_blacklist(findings, {"domains": ["a.com"]}, "testing")
+        self.assertEqual(result, {"domains": ["b.com"], "attack": {"domains": [], "md5s": ["a.com"]}})
+
+    def test_index_is_immutable(self):
+        '''
+        Test to check if the index can not be changed after compilation.
+        '''
+        index = BlacklistIndex({"domains": ["a.com"]})
+        self.assertEqual(len(index), 1)
+        with self.assertRaises(AttributeError):
+            index._rules = {}
+
+    def test_cidr_rules(self):
+        '''
+        Test to check if addresses in a blocked network are removed.
+        '''
+        index = BlacklistIndex({"ipv4s": ["10.0.0.0/8", "192.168.1.0/24", "192.168.2.0/24"], "ipv6s": ["2001:db8::/32"]})
+        findings = {
+            "ipv4s": ["10.1.2.3", "11.0.0.1", "192.168.2.255", "192.168.3.0", "not-an-ip"],
+            "ipv6s": ["2001:db8::1", "2001:db9::1"],
+        }
+        self.assertEqual(index.apply(findings), {"ipv4s": ["11.0.0.1", "192.168.3.0", "not-an-ip"], "ipv6s": ["2001:db9::1"]})
+
+    def test_wildcard_rules(self):
+        '''
+        Test to check if a wildcard rule removes all subdomains, but not the domain itself.
+        '''
+        index = BlacklistIndex({"domains": ["*.fbi.gov", "example.com"]})
+        findings = {"domains": ["fbi.gov", "www.fbi.gov", "a.ic.FBI.gov", "notfbi.gov", "example.com"]}
+        self.assertEqual(index.apply(findings), {"domains": ["fbi.gov", "notfbi.gov"]})
+
+    def test_store_and_load_index(self):
+        '''
+        Test to check if a stored index is loaded with its revision and rules.
+        '''
+        index = BlacklistIndex({"domains": ["*.fbi.gov", "example.com"], "ipv4s": ["10.0.0.0/8"]})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "blacklist.pickle")
+            self.assertEqual(load_blacklist_index(path, "testing"), (None, None))
+            store_blacklist_index(index, "abc123", path, "testing")
+            revision, loaded = load_blacklist_index(path, "testing")
+        findings = {"domains": ["www.fbi.gov", "example.com", "example.org"], "ipv4s": ["10.0.0.1", "8.8.8.8"]}
+        self.assertEqual(revision, "abc123")
+        self.assertEqual(len(loaded), len(index))
+        self.assertEqual(loaded.apply(copy.deepcopy(findings)), index.apply(copy.deepcopy(findings)))
+        with self.assertRaises(AttributeError):
+            loaded._rules = {}
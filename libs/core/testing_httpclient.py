@@ -0,0 +1,110 @@
+'''
+Tests for httpclient.py
+'''
+
+import json
+import socket
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from threading import Thread
+from unittest import TestCase
+
+import requests
+
+from libs.core.httpclient import HttpClient
+from libs.core.httpclient import ResponseTooLarge
+
+class Handler(BaseHTTPRequestHandler):
+    '''
+    Handler will answer the requests of the tests.
+    '''
+    failures = {}
+
+    def do_GET(self):
+        '''
+        do_GET will answer /json with a small document, /flaky with a 503 for the
+            first request and /large with a large body.
+        '''
+        if self.path == "/flaky" and Handler.failures.setdefault(self.path, 0) == 0:
+            Handler.failures[self.path] += 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b"x" * 100000 if self.path.startswith("/large") else json.dumps({"path": self.path}).encode('UTF-8')
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        '''
+        log_message will keep the output of the tests clean.
+        '''
+
+
+class HttpClientTests(TestCase):
+    '''
+    Tests for the pooled HTTP client.
+    '''
+
+    @classmethod
+    def setUpClass(cls):
+        '''
+        setUpClass will start a local HTTP server.
+        '''
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:{}".format(cls.server.server_address[1])
+        Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        '''
+        tearDownClass will stop the local HTTP server.
+        '''
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_session_is_reused(self):
+        '''
+        Test to check if the requests of a host share one session and are counted.
+        '''
+        client = HttpClient(retries=0)
+        self.assertEqual(client.get(self.url + "/json").json(), {"path": "/json"})
+        self.assertEqual(client.get(self.url + "/other").json(), {"path": "/other"})
+        self.assertEqual(len(client.sessions), 1)
+        self.assertEqual(client.stats()[self.url]["requests"], 2)
+
+    def test_retry_after_server_error(self):
+        '''
+        Test to check if a request is repeated after a 503.
+        '''
+        client = HttpClient(retries=2, backoff=0.01)
+        self.assertEqual(client.get(self.url + "/flaky").status_code, 200)
+        self.assertEqual(client.stats()[self.url]["retries"], 1)
+
+    def test_size_limit(self):
+        '''
+        Test to check if a response above the size limit is rejected.
+        '''
+        client = HttpClient(retries=0, max_bytes=1000)
+        with self.assertRaises(ResponseTooLarge) as context:
+            client.get(self.url + "/large?apikey=secret")
+        self.assertIn("/large", str(context.exception))
+        self.assertNotIn("secret", str(context.exception))
+
+    def test_error_hides_query(self):
+        '''
+        Test to check if an error of requests does not show the query of the url, like
+            the apikey of VirusTotal.
+        '''
+        with socket.socket() as closed:
+            closed.bind(("127.0.0.1", 0))
+            port = closed.getsockname()[1]
+        client = HttpClient(retries=0)
+        with self.assertRaises(requests.ConnectionError) as context:
+            client.get("http://127.0.0.1:{}/report?apikey=secret".format(port))
+        self.assertIn("/report", str(context.exception))
+        self.assertNotIn("secret", str(context.exception))
+        self.assertIsNone(context.exception.__cause__)
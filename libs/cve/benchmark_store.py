@@ -0,0 +1,55 @@
+'''
+Benchmark for the offline CVE store. It imports a generated NVD feed and measures the
+    import and the lookup of CVE's.
+
+Usage (from the iocpusher folder):
+    PYTHONPATH=.. python -m libs.cve.benchmark_store
+'''
+
+import os
+import gzip
+import json
+import time
+import random
+import tempfile
+
+from libs.cve.store import CVEStore
+
+def generate(path, cves, seed=0):
+    '''
+    generate will write a gzip compressed feed in the format of the NVD 1.1 feeds.
+    @param path will be the path of the feed.
+    @param cves will be the number of CVE's.
+    '''
+    rand = random.Random(seed)
+    with gzip.open(path, "wt") as file:
+        json.dump({"CVE_data_type": "CVE", "CVE_Items": [{
+            "cve": {
+                "CVE_data_meta": {"ID": "CVE-{}-{:05d}".format(2000 + index % 22, index)},
+                "description": {"description_data": [{"lang": "en", "value": " ".join("word{}".format(rand.randint(0, 999)) for _ in range(40))}]},
+                "references": {"reference_data": [{"url": "https://www.exploit-db.com/exploits/{}/".format(index)}]},
+            },
+            "impact": {"baseMetricV2": {"cvssV2": {"baseScore": rand.randint(0, 100) / 10, "accessComplexity": "LOW", "accessVector": "NETWORK"}}},
+            "lastModifiedDate": "2021-01-01T00:00Z",
+        } for index in range(cves)]}, file)
+
+def run(cves=100000, lookups=100000):
+    '''
+    run will print the time of the import and of a lookup.
+    '''
+    with tempfile.TemporaryDirectory() as directory:
+        feed = os.path.join(directory, "nvdcve.json.gz")
+        generate(feed, cves)
+        store = CVEStore(os.path.join(directory, "cve.db"), "benchmark")
+        start = time.perf_counter()
+        store.import_file(feed)
+        print("import of {} CVE's: {:.2f} s".format(cves, time.perf_counter() - start))
+        ids = ["CVE-{}-{:05d}".format(2000 + index % 22, index) for index in random.Random(1).choices(range(cves), k=lookups)]
+        start = time.perf_counter()
+        for cve_id in ids:
+            store.get(cve_id)
+        print("lookup: {:.1f} us per CVE".format((time.perf_counter() - start) / lookups * 1e6))
+        store.connection.close()
+
+if __name__ == "__main__":
+    run()
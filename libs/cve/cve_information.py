@@ -1,33 +1,69 @@
 '''
 This script contains functions to gather CVE information.
-The informatin will be taken from CIRCL.lu
+The informatin will be taken from the offline CVE store or CIRCL.lu
 '''
 
+import os
 import json
-import requests
 
+from threading import Lock
+
+from libs.core.environment import envvar
+from libs.core.httpclient import http_get
+from libs.cve.store import CVEStore
+from libs.cve.store import EXPLOITDBLINK
+from libs.enrichment.result import LookupResult
 from libs.kafka.logging import LogMessage
 
+# ENVIRONMENT-VARS
+CVE_DB_PATH = envvar("CVE_DB_PATH", "/app/cve/cve.db")
+CVE_OFFLINE = envvar("CVE_OFFLINE", "False") == "True"
+
 CVE_URL = "https://cve.circl.lu/api/cve/{}"
-EXPLOITDBLINK = "https://www.exploit-db.com/exploits/{}"
+
+# The offline store is opened on the first lookup incase the database exists.
+STORE = {"store": None, "opened": False}
+STORE_LOCK = Lock()
+
+def get_cve_store(servicename, create=False):
+    '''
+    get_cve_store will return the offline CVE store.
+    @param servicename will be the name of the calling service.
+    @param create will create the database incase it does not exist.
+    @return a CVEStore or None incase there is no database.
+    '''
+    with STORE_LOCK:
+        if STORE["store"] is None and (not STORE["opened"] or create):
+            STORE["opened"] = True
+            try:
+                if create or os.path.isfile(CVE_DB_PATH):
+                    STORE["store"] = CVEStore(CVE_DB_PATH, servicename)
+            except Exception as error:
+                LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+        return STORE["store"]
 
 def get_cve_information(cves, servicename):
     '''
     get_cve_information will collect information about a CVE by calling ` CVE_URL ` and get
         a json reponse containing information about the CVE. After the request the method
         will extract the CVE-Score, the attack complexity, the attack vector, a summeray
-        and the exploit-db-id.
+        and the exploit-db-id. CVE's in the offline store are not requested, with
+        CVE_OFFLINE no CVE is requested.
     @param cves will be a list of CVE\'s in the format
         ['CVE-0000-0000', ].
-    @return a dict with dicts.
+    @return a LookupResult with dicts. CVE's which could not be requested, because
+        CIRCL was not reachable or refused the request, are listed as failed.
     '''
-    information = {}
-    try:
-        for entry in cves:
-            response = requests.get(CVE_URL.format(entry))
-            cvescore, access_com, access_vec, summary, exploitdb_link = None, None, None, None, None
-            if response.status_code == 200:
-                reponse_as_json = json.loads(response.text)
+    information = LookupResult()
+    store = get_cve_store(servicename)
+    for entry in cves:
+        cvescore, access_com, access_vec, summary, exploitdb_link = None, None, None, None, None
+        try:
+            if store is not None and (stored := store.get(entry)) is not None:
+                information[entry] = stored
+                continue
+            if not CVE_OFFLINE and (response := http_get(CVE_URL.format(entry))).status_code == 200:
+                reponse_as_json = json.loads(response.text) or {}
                 keys = reponse_as_json.keys()
                 if 'cvss' in keys:
                     cvescore = reponse_as_json['cvss']
@@ -40,13 +76,17 @@ def get_cve_information(cves, servicename):
                     summary = reponse_as_json['summary']
                 if 'refmap' in keys and 'exploit-db' in reponse_as_json['refmap'].keys():
                     exploitdb_link = EXPLOITDBLINK.format(reponse_as_json['refmap']['exploit-db'][0])
-            information[entry] = {
-                "CVS-Score": cvescore,
-                "Complexity": access_com,
-                "Vektor": access_vec,
-                "Summary": summary,
-                "Exploit-DB": exploitdb_link
-            }
-    except Exception as error:
-        LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+            elif not CVE_OFFLINE and response.status_code != 404:
+                raise ConnectionError("CIRCL answered {} for {}.".format(response.status_code, entry))
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+            information.fail(entry, {"CVS-Score": None, "Complexity": None, "Vektor": None, "Summary": None, "Exploit-DB": None})
+            continue
+        information[entry] = {
+            "CVS-Score": cvescore,
+            "Complexity": access_com,
+            "Vektor": access_vec,
+            "Summary": summary,
+            "Exploit-DB": exploitdb_link
+        }
     return information
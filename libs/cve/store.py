@@ -0,0 +1,297 @@
+'''
+This script contains the offline CVE store. The dumps of CIRCL and the NVD are imported
+    into a SQLite database indexed by the CVE-ID, so a CVE is looked up without a call
+    to cve.circl.lu.
+
+Usage (from the iocpusher folder):
+    PYTHONPATH=.. python -m libs.cve.store cve.db nvdcve-1.1-2021.json.gz ...
+'''
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import sqlite3
+
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone
+from threading import Lock
+
+from libs.kafka.logging import LogMessage
+
+EXPLOITDBLINK = "https://www.exploit-db.com/exploits/{}"
+EXPLOITDB_PATTERN = re.compile(r'exploit-db\.com/exploits/(\d+)')
+ARRAY_PATTERN = re.compile(r'"(?:CVE_Items|vulnerabilities)"\s*:\s*\[')
+TIMESTAMP_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?\s*(Z|[+-]\d{2}:?\d{2})?$')
+CHUNK_SIZE = 1 << 20
+
+def open_dump(path):
+    '''
+    open_dump will open a dump as text, gzip compressed dumps are decompressed.
+    @param path will be the path of the dump.
+    @return a file object.
+    '''
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="UTF-8")
+    return open(path, "r", encoding="UTF-8")
+
+def iter_json_records(file):
+    '''
+    iter_json_records will stream the records of a JSON dump without loading the whole
+        file. A dump can be an array, an object with the array CVE_Items (NVD 1.1) or
+        vulnerabilities (NVD 2.0), or one object per line (CIRCL).
+    @param file will be a file object opened as text.
+    @return a generator of the records as dicts.
+    '''
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    def fill():
+        nonlocal buffer, position, eof
+        if (data := file.read(CHUNK_SIZE)) == "":
+            eof = True
+        buffer, position = buffer[position:] + data, 0
+    def skip(characters):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+    skip(" \t\r\n")
+    in_array = False
+    if position < len(buffer) and buffer[position] == "[":
+        position, in_array = position + 1, True
+    elif position < len(buffer) and buffer[position] == "{":
+        while not eof and len(buffer) - position < CHUNK_SIZE:
+            fill()
+        if (match := ARRAY_PATTERN.search(buffer, position, position + CHUNK_SIZE)) is not None:
+            position, in_array = match.end(), True
+    while True:
+        skip(" \t\r\n," if in_array else " \t\r\n")
+        if position >= len(buffer) or (in_array and buffer[position] == "]"):
+            return
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+                break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+        position = end
+        yield record
+
+def normalize_modified(value):
+    '''
+    normalize_modified will parse the modification of a CVE into a datetime in UTC. The
+        feeds write it as 2021-12-14T10:15Z (NVD 1.1), 2021-12-14T10:15:09.123 (NVD 2.0)
+        or with an offset (CIRCL), so the strings can not be compared as they are.
+    @param value will be the modification as string or as unix time.
+    @return the modification as ISO string in UTC with microseconds, which sorts like
+        the datetime, or an empty string incase the value can not be parsed.
+    '''
+    try:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            modified = datetime.fromtimestamp(value, timezone.utc)
+        elif (match := TIMESTAMP_PATTERN.match(str(value or "").strip())) is not None:
+            year, month, day, hour, minute, second, fraction, offset = match.groups()
+            modified = datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0), int((fraction or "0")[:6].ljust(6, "0")), timezone.utc)
+            if offset not in (None, "Z"):
+                offset = offset.replace(":", "")
+                modified -= (1 if offset[0] == "+" else -1) * timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5]))
+        else:
+            return ""
+    except (ValueError, OverflowError, OSError):
+        return ""
+    return modified.strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+def exploitdb_link(urls):
+    '''
+    exploitdb_link will return the link to the first exploit in a list of urls.
+    @param urls will be a list of urls.
+    @return the link or None.
+    '''
+    for url in urls:
+        if (match := EXPLOITDB_PATTERN.search(url or "")) is not None:
+            return EXPLOITDBLINK.format(match.group(1))
+    return None
+
+def english(descriptions, key):
+    '''
+    english will return the english text of a list of descriptions of the NVD.
+    @param descriptions will be a list of dicts with lang and the text.
+    @param key will be the key of the text.
+    @return the text or None.
+    '''
+    texts = [entry.get(key) for entry in descriptions if entry.get("lang") == "en"] or [entry.get(key) for entry in descriptions]
+    return texts[0] if len(texts) > 0 else None
+
+def normalize_record(record):
+    '''
+    normalize_record will convert a record of CIRCL, NVD 1.1 or NVD 2.0 into a row of
+        the store.
+    @param record will be the record as dict.
+    @return a tuple in the format (id, cvss, complexity, vector, summary, exploitdb,
+        modified) or None incase the record is no CVE.
+    '''
+    if "CVE_data_meta" in record.get("cve", {}):
+        cve, impact = record["cve"], record.get("impact", {})
+        metric = impact.get("baseMetricV2", {}).get("cvssV2") or impact.get("baseMetricV3", {}).get("cvssV3") or {}
+        return (
+            cve["CVE_data_meta"]["ID"],
+            metric.get("baseScore"),
+            metric.get("accessComplexity") or metric.get("attackComplexity"),
+            metric.get("accessVector") or metric.get("attackVector"),
+            english(cve.get("description", {}).get("description_data", []), "value"),
+            exploitdb_link([reference.get("url") for reference in cve.get("references", {}).get("reference_data", [])]),
+            normalize_modified(record.get("lastModifiedDate")),
+        )
+    if "id" in record.get("cve", {}):
+        cve, metrics = record["cve"], record["cve"].get("metrics", {})
+        metric = {}
+        for key in ["cvssMetricV2", "cvssMetricV31", "cvssMetricV30"]:
+            if len(metrics.get(key) or []) > 0:
+                metric = metrics[key][0].get("cvssData", {})
+                break
+        return (
+            cve["id"],
+            metric.get("baseScore"),
+            metric.get("accessComplexity") or metric.get("attackComplexity"),
+            metric.get("accessVector") or metric.get("attackVector"),
+            english(cve.get("descriptions", []), "value"),
+            exploitdb_link([reference.get("url") for reference in cve.get("references", [])]),
+            normalize_modified(cve.get("lastModified")),
+        )
+    if str(record.get("id", "")).startswith("CVE-"):
+        access, refmap = record.get("access") or {}, record.get("refmap") or {}
+        return (
+            record["id"],
+            record.get("cvss"),
+            access.get("complexity"),
+            access.get("vector"),
+            record.get("summary"),
+            EXPLOITDBLINK.format(refmap["exploit-db"][0]) if len(refmap.get("exploit-db") or []) > 0 else None,
+            normalize_modified(record.get("last-modified") or record.get("Modified")),
+        )
+    return None
+
+class CVEStore():
+    '''
+    CVEStore will keep the CVE's in a SQLite table with the CVE-ID as primary key. An
+        import replaces a CVE only with a newer or equal modification, so the dumps of
+        modified CVE's of the NVD can be imported as delta updates at any time.
+    '''
+
+    def __init__(self, path, servicename):
+        '''
+        CTor of the CVEStore-class.
+        @param path will be the path of the database.
+        @param servicename will be the name of the calling service.
+        '''
+        self.path = path
+        self.servicename = servicename
+        self.lock = Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS cves (id TEXT PRIMARY KEY, cvss REAL, complexity TEXT, vector TEXT, summary TEXT, exploitdb TEXT, modified TEXT NOT NULL) WITHOUT ROWID")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS imports (path TEXT PRIMARY KEY, mtime REAL NOT NULL, records INTEGER NOT NULL, imported REAL NOT NULL)")
+            self.connection.create_function("normalize_modified", 1, normalize_modified)
+            self.connection.execute("UPDATE cves SET modified = normalize_modified(modified) WHERE length(modified) != 26")
+
+    def get(self, cve_id):
+        '''
+        get will return the information of a CVE in the format of get_cve_information.
+        @param cve_id will be the CVE-ID like CVE-2021-44228.
+        @return a dict or None incase the CVE is not in the store.
+        '''
+        with self.lock:
+            row = self.connection.execute("SELECT cvss, complexity, vector, summary, exploitdb FROM cves WHERE id = ?", (cve_id.upper(),)).fetchone()
+        if row is None:
+            return None
+        return {"CVS-Score": row[0], "Complexity": row[1], "Vektor": row[2], "Summary": row[3], "Exploit-DB": row[4]}
+
+    def __len__(self):
+        '''
+        __len__ will return the number of CVE's in the store.
+        '''
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM cves").fetchone()[0]
+
+    def import_records(self, records, batch_size=5000):
+        '''
+        import_records will insert or update CVE's in batches of one transaction.
+        @param records will be an iterable of records of CIRCL or the NVD.
+        @param batch_size will be the number of records per transaction.
+        @return the number of imported records.
+        '''
+        imported, batch = 0, []
+        def flush():
+            with self.lock:
+                self.connection.execute("BEGIN")
+                try:
+                    self.connection.executemany(
+                        "INSERT INTO cves (id, cvss, complexity, vector, summary, exploitdb, modified) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET cvss = excluded.cvss, complexity = excluded.complexity, vector = excluded.vector, "
+                        "summary = excluded.summary, exploitdb = excluded.exploitdb, modified = excluded.modified WHERE excluded.modified >= cves.modified", batch)
+                    self.connection.execute("COMMIT")
+                except BaseException:
+                    self.connection.execute("ROLLBACK")
+                    raise
+        for record in records:
+            if (row := normalize_record(record)) is not None:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    flush()
+                    imported, batch = imported + len(batch), []
+        if len(batch) > 0:
+            flush()
+            imported += len(batch)
+        return imported
+
+    def import_file(self, path):
+        '''
+        import_file will stream a dump into the store.
+        @param path will be the path of the dump.
+        @return the number of imported records.
+        '''
+        with open_dump(path) as file:
+            imported = self.import_records(iter_json_records(file))
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO imports (path, mtime, records, imported) VALUES (?, ?, ?, ?)", (os.path.abspath(path), os.path.getmtime(path), imported, time.time()))
+        return imported
+
+    def import_directory(self, directory):
+        '''
+        import_directory will import all dumps of a directory which are new or changed
+            since their last import.
+        @param directory will be the directory of the dumps.
+        @return the number of imported records.
+        '''
+        imported = 0
+        for name in sorted(os.listdir(directory)):
+            path = os.path.abspath(os.path.join(directory, name))
+            if not name.endswith((".json", ".json.gz", ".jsonl", ".jsonl.gz")):
+                continue
+            try:
+                with self.lock:
+                    row = self.connection.execute("SELECT mtime FROM imports WHERE path = ?", (path,)).fetchone()
+                if row is None or row[0] != os.path.getmtime(path):
+                    imported += self.import_file(path)
+            except Exception as error:
+                LogMessage("{}: {}".format(name, error), LogMessage.LogTyp.ERROR, self.servicename).log()
+        return imported
+
+
+if __name__ == "__main__":
+    STORE = CVEStore(sys.argv[1], "cvestore")
+    for dump in sys.argv[2:]:
+        start = time.perf_counter()
+        print("{}: {} records in {:.1f} s".format(dump, STORE.import_file(dump), time.perf_counter() - start))
+    print("{} CVE's in {}".format(len(STORE), sys.argv[1]))
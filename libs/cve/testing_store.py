@@ -0,0 +1,85 @@
+'''
+Tests for store.py
+'''
+
+import io
+import os
+import gzip
+import json
+import tempfile
+
+from unittest import TestCase
+from unittest import mock
+
+from libs.cve.store import CVEStore
+from libs.cve.store import iter_json_records
+from libs.cve.store import normalize_modified
+
+def nvd_item(cve_id, modified, score=5.0, summary="Summary"):
+    '''
+    nvd_item will return a CVE in the format of the NVD 1.1 feeds.
+    '''
+    return {
+        "cve": {
+            "CVE_data_meta": {"ID": cve_id},
+            "description": {"description_data": [{"lang": "en", "value": summary}]},
+            "references": {"reference_data": [{"url": "https://www.exploit-db.com/exploits/1234/"}]},
+        },
+        "impact": {"baseMetricV2": {"cvssV2": {"baseScore": score, "accessComplexity": "LOW", "accessVector": "NETWORK"}}},
+        "lastModifiedDate": modified,
+    }
+
+class CVEStoreTests(TestCase):
+    '''
+    Tests for the offline CVE store.
+    '''
+
+    def test_stream_formats(self):
+        '''
+        Test to check if arrays, NVD feeds and JSON lines are streamed over the borders
+            of the chunks.
+        '''
+        items = [nvd_item("CVE-2021-{:04d}".format(index), "2021-01-01T00:00Z", summary="x" * 50) for index in range(20)]
+        with mock.patch("libs.cve.store.CHUNK_SIZE", 64):
+            self.assertEqual(list(iter_json_records(io.StringIO(json.dumps({"CVE_data_type": "CVE", "CVE_Items": items})))), items)
+            self.assertEqual(list(iter_json_records(io.StringIO(json.dumps(items, indent=2)))), items)
+            self.assertEqual(list(iter_json_records(io.StringIO("\n".join(json.dumps(item) for item in items)))), items)
+
+    def test_normalize_modified(self):
+        '''
+        Test to check if the modifications of the feeds are compared as datetimes.
+        '''
+        self.assertEqual(normalize_modified("2021-12-14T10:15Z"), "2021-12-14T10:15:00.000000")
+        self.assertEqual(normalize_modified("2021-12-14T10:15:09.123"), "2021-12-14T10:15:09.123000")
+        self.assertEqual(normalize_modified("2021-12-14T12:15:00+02:00"), "2021-12-14T10:15:00.000000")
+        self.assertEqual(normalize_modified(0), "1970-01-01T00:00:00.000000")
+        self.assertEqual(normalize_modified("yesterday"), "")
+        self.assertGreater(normalize_modified("2021-12-14T10:15:00.5"), normalize_modified("2021-12-14T10:15Z"))
+
+    def test_import_and_delta_update(self):
+        '''
+        Test to check if CVE's of CIRCL, NVD 1.1 and NVD 2.0 are imported in the format
+            of get_cve_information and an older record does not replace a newer one.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            with gzip.open(os.path.join(directory, "nvd.json.gz"), "wt") as file:
+                json.dump({"CVE_Items": [nvd_item("CVE-2021-0001", "2021-02-01T00:00Z")]}, file)
+            with open(os.path.join(directory, "circl.jsonl"), "w") as file:
+                file.write(json.dumps({"id": "CVE-2020-0002", "cvss": 7.5, "access": {"complexity": "LOW", "vector": "NETWORK"}, "summary": "Circl", "refmap": {"exploit-db": ["42"]}, "Modified": "2020-01-01T00:00:00"}) + "\n")
+            with open(os.path.join(directory, "nvd2.json"), "w") as file:
+                json.dump({"vulnerabilities": [{"cve": {"id": "CVE-2022-0003", "lastModified": "2022-01-01T00:00:00.000", "descriptions": [{"lang": "en", "value": "New"}], "references": [], "metrics": {"cvssMetricV31": [{"cvssData": {"baseScore": 9.8, "attackComplexity": "LOW", "attackVector": "NETWORK"}}]}}}]}, file)
+            store = CVEStore(os.path.join(directory, "db", "cve.db"), "testing")
+            self.assertEqual(store.import_directory(directory), 3)
+            self.assertEqual(store.import_directory(directory), 0)
+            self.assertEqual(store.get("CVE-2021-0001"), {"CVS-Score": 5.0, "Complexity": "LOW", "Vektor": "NETWORK", "Summary": "Summary", "Exploit-DB": "https://www.exploit-db.com/exploits/1234"})
+            self.assertEqual(store.get("CVE-2020-0002")["Exploit-DB"], "https://www.exploit-db.com/exploits/42")
+            self.assertEqual(store.get("CVE-2022-0003")["CVS-Score"], 9.8)
+            self.assertIsNone(store.get("CVE-1999-0001"))
+            store.import_records([nvd_item("CVE-2021-0001", "2021-01-01T00:00Z", score=1.0), nvd_item("CVE-2021-0001", "2021-03-01T00:00Z", summary="Updated")])
+            self.assertEqual(store.get("CVE-2021-0001")["Summary"], "Updated")
+            self.assertEqual(store.get("CVE-2021-0001")["CVS-Score"], 5.0)
+            store.import_records([nvd_item("CVE-2021-0001", "2021-03-01T08:00:00.000+09:00", summary="Older")])
+            self.assertEqual(store.get("CVE-2021-0001")["Summary"], "Updated")
+            store.import_records([{"cve": {"id": "CVE-2021-0001", "lastModified": "2021-03-01T00:00:00.5", "descriptions": [{"lang": "en", "value": "Newer"}]}}])
+            self.assertEqual(store.get("CVE-2021-0001")["Summary"], "Newer")
+            store.connection.close()
@@ -0,0 +1,156 @@
+'''
+This script contains the persistent cache of the enrichment engine. The information
+    of an IoC is stored by provider, so the same IoC of another report is not looked
+    up again until its time to live has expired.
+'''
+
+import os
+import json
+import time
+import sqlite3
+
+from threading import Lock
+
+from libs.kafka.logging import LogMessage
+
+EMPTY_VALUES = (None, "", 0, [], {}, "Unknown", "-")
+
+def has_information(value):
+    '''
+    has_information will check if a provider returned any information about an IoC.
+        The providers return empty defaults for unknown IoC's.
+    @param value will be the information of an IoC.
+    @return True if the value contains information.
+    '''
+    if isinstance(value, dict):
+        return any(has_information(entry) for entry in value.values())
+    return value not in EMPTY_VALUES
+
+class EnrichmentCache():
+    '''
+    EnrichmentCache will store the information of IoC's in a SQLite database keyed by
+        (provider, IoC). Every provider has its own time to live, "not found" answers
+        are kept for the shorter negative time to live. The least recently used entries
+        are removed when the cache grows over its maximum number of entries.
+    '''
+
+    def __init__(self, path, max_entries, ttls, negative_ttl, servicename):
+        '''
+        CTor of the EnrichmentCache-class.
+        @param path will be the path of the database.
+        @param max_entries will be the maximum number of entries.
+        @param ttls will be a dict in the format {provider: seconds}.
+        @param negative_ttl will be the time to live of "not found" answers in seconds.
+        @param servicename will be the name of the calling service.
+        '''
+        self.path = path
+        self.max_entries = max(1, int(max_entries))
+        self.ttls = dict(ttls)
+        self.negative_ttl = negative_ttl
+        self.servicename = servicename
+        self.lock = Lock()
+        self.counters = {}
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS entries (provider TEXT NOT NULL, ioc TEXT NOT NULL, value TEXT NOT NULL, found INTEGER NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (provider, ioc))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self.connection.execute("DELETE FROM entries WHERE expires < ?", (time.time(),))
+            self.size = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __count(self, provider, counter, number=1):
+        '''
+        __count will raise a counter of a provider. The lock has to be held.
+        @param provider will be the name of the provider.
+        @param counter will be the name of the counter.
+        @param number will be the number to add.
+        '''
+        counters = self.counters.setdefault(provider, {"hits": 0, "negative_hits": 0, "misses": 0, "stores": 0, "failures": 0})
+        counters[counter] += number
+
+    def get(self, provider, ioc):
+        '''
+        get will return the cached information of an IoC.
+        @param provider will be the name of the provider.
+        @param ioc will be the IoC.
+        @return a tuple in the format (cached, value). cached is False on a miss.
+        '''
+        try:
+            now = time.time()
+            with self.lock:
+                row = self.connection.execute("SELECT value, found, expires FROM entries WHERE provider = ? AND ioc = ?", (provider, ioc)).fetchone()
+                if row is None or row[2] < now:
+                    self.__count(provider, "misses")
+                    return False, None
+                self.connection.execute("UPDATE entries SET accessed = ? WHERE provider = ? AND ioc = ?", (now, provider, ioc))
+                self.__count(provider, "hits" if row[1] else "negative_hits")
+            return True, json.loads(row[0])
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.WARNING, self.servicename).log()
+            return False, None
+
+    def put(self, provider, ioc, value):
+        '''
+        put will store the information of an IoC and remove the least recently used
+            entries incase the cache is too large.
+        @param provider will be the name of the provider.
+        @param ioc will be the IoC.
+        @param value will be the information, which can be serialized to json.
+        '''
+        try:
+            now = time.time()
+            found = has_information(value)
+            expires = now + (self.ttls.get(provider, 0) if found else self.negative_ttl)
+            with self.lock:
+                if self.connection.execute("SELECT 1 FROM entries WHERE provider = ? AND ioc = ?", (provider, ioc)).fetchone() is None:
+                    self.size += 1
+                self.connection.execute("INSERT OR REPLACE INTO entries (provider, ioc, value, found, expires, accessed) VALUES (?, ?, ?, ?, ?, ?)", (provider, ioc, json.dumps(value), int(found), expires, now))
+                self.__count(provider, "stores")
+                if self.size > self.max_entries:
+                    self.__evict(now)
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.WARNING, self.servicename).log()
+
+    def __evict(self, now):
+        '''
+        __evict will remove the expired and the least recently used entries until the
+            cache has less than 90 percent of its entries. The lock has to be held.
+        @param now will be the current time.
+        '''
+        self.connection.execute("DELETE FROM entries WHERE expires < ?", (now,))
+        self.size = self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        if (surplus := self.size - int(self.max_entries * 0.9)) > 0:
+            self.connection.execute("DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY accessed LIMIT ?)", (surplus,))
+            self.size -= surplus
+
+    def lookup(self, provider, function):
+        '''
+        lookup will wrap a lookup function, so its results are stored. IoC's which
+            are missing in the result or are listed as failed in a LookupResult are not
+            stored, so they are looked up again with the next report.
+        @param provider will be the name of the provider.
+        @param function will be a function which takes a list of IoC's and returns a
+            dict in the format {ioc: information}.
+        @return the wrapped function.
+        '''
+        def cached_lookup(iocs):
+            information = function(iocs)
+            failed = getattr(information, "failed", set())
+            for ioc in iocs:
+                if information is not None and ioc in information and ioc not in failed:
+                    self.put(provider, ioc, information[ioc])
+            if len(failed) > 0:
+                with self.lock:
+                    self.__count(provider, "failures", len(failed))
+            return information
+        return cached_lookup
+
+    def stats(self):
+        '''
+        stats will return the counters of the cache.
+        @return a dict with the number of entries and the counters of every provider.
+        '''
+        with self.lock:
+            return {"entries": self.size, "providers": {provider: dict(counters) for provider, counters in self.counters.items()}}
@@ -0,0 +1,136 @@
+'''
+This script contains the enrichment engine, which looks up the IoC's of a report at
+    all providers at the same time.
+'''
+
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from libs.kafka.logging import LogMessage
+
+class Provider():
+    '''
+    Provider will be the configuration of an enrichment provider.
+    '''
+
+    def __init__(self, name, workers, chunk_size=1):
+        '''
+        CTor of the Provider-class.
+        @param name will be the name of the provider, like virustotal.
+        @param workers will be the maximum number of concurrent lookups at the provider.
+        @param chunk_size will be the number of IoC's per lookup. None will look up all
+            IoC's of a report at once, which fits local providers like MITRE.
+        '''
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.chunk_size = chunk_size
+
+
+class EnrichmentEngine():
+    '''
+    EnrichmentEngine will fan out the lookups of a report across the providers and their
+        IoC's. Every provider has its own pool of threads, so its limit holds for all
+        reports of the process and a slow provider does not delay the others. The
+        lookup functions take a list of IoC's and return a dict keyed by the IoC, so
+        the existing functions are called with a single IoC and their results merged.
+        With a cache the cached IoC's are answered before the pools are used.
+    '''
+
+    def __init__(self, providers, servicename, cache=None):
+        '''
+        CTor of the EnrichmentEngine-class.
+        @param providers will be a list of Providers.
+        @param servicename will be the name of the calling service.
+        @param cache will be an optional EnrichmentCache.
+        '''
+        self.providers = {provider.name: provider for provider in providers}
+        self.servicename = servicename
+        self.cache = cache
+        self.lock = Lock()
+        self.executors = {}
+
+    def __executor(self, name):
+        '''
+        __executor will return the pool of a provider and create it on the first call.
+        @param name will be the name of the provider.
+        @return a ThreadPoolExecutor.
+        '''
+        with self.lock:
+            if (executor := self.executors.get(name)) is None:
+                if (provider := self.providers.get(name)) is None:
+                    provider = self.providers[name] = Provider(name, 1)
+                executor = ThreadPoolExecutor(max_workers=provider.workers, thread_name_prefix="enrich_{}".format(name))
+                self.executors[name] = executor
+            return executor
+
+    def submit(self, provider, function, iocs, namespace=None):
+        '''
+        submit will start the lookups of IoC's at a provider.
+        @param provider will be the name of the provider.
+        @param function will be a function which takes a list of IoC's and returns a
+            dict in the format {ioc: information}.
+        @param iocs will be a list of IoC's. Duplicates are looked up once.
+        @param namespace will be the name of the IoC's in the cache. Without a
+            namespace the cache is not used.
+        @return a list of futures in the order of the IoC's.
+        '''
+        iocs = list(dict.fromkeys(iocs or []))
+        if len(iocs) == 0:
+            return []
+        executor = self.__executor(provider)
+        chunk_size = self.providers[provider].chunk_size or len(iocs)
+        if self.cache is None or namespace is None:
+            return [executor.submit(function, iocs[index:index + chunk_size]) for index in range(0, len(iocs), chunk_size)]
+        function = self.cache.lookup(namespace, function)
+        futures, chunk = [], []
+        for ioc in iocs:
+            cached, value = self.cache.get(namespace, ioc)
+            if cached or len(chunk) == chunk_size:
+                if len(chunk) > 0:
+                    futures.append(executor.submit(function, chunk))
+                    chunk = []
+            if cached:
+                futures.append(Future())
+                futures[-1].set_result({ioc: value})
+            else:
+                chunk.append(ioc)
+        if len(chunk) > 0:
+            futures.append(executor.submit(function, chunk))
+        return futures
+
+    def gather(self, futures):
+        '''
+        gather will wait for the lookups of submit and merge their results. A failed
+            lookup is logged and misses in the result, the other lookups are kept.
+        @param futures will be the list returned by submit.
+        @return a dict in the format {ioc: information}.
+        '''
+        information = {}
+        for future in futures:
+            try:
+                if (result := future.result()) is not None:
+                    information.update(result)
+            except Exception as error:
+                LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+        return information
+
+    def enrich(self, jobs):
+        '''
+        enrich will start all jobs at once and wait for them, so the time of a report
+            depends on its slowest lookup instead of the sum of all lookups.
+        @param jobs will be a dict in the format {key: (provider, function, iocs)} or
+            {key: (provider, function, iocs, namespace)} for cached lookups.
+        @return a dict in the format {key: {ioc: information}}.
+        '''
+        futures = {key: self.submit(*job) for key, job in jobs.items()}
+        return {key: self.gather(pending) for key, pending in futures.items()}
+
+    def shutdown(self):
+        '''
+        shutdown will stop the pools of all providers.
+        '''
+        with self.lock:
+            executors, self.executors = self.executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False)
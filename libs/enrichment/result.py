@@ -0,0 +1,27 @@
+'''
+This script contains the result of a lookup function of the enrichment engine.
+'''
+
+class LookupResult(dict):
+    '''
+    LookupResult will be the result of a lookup in the format {ioc: information}. An IoC
+        whose lookup failed, because the provider was not reachable or refused the
+        request, keeps an empty default for the report but is listed in failed, so its
+        default is not cached as a "not found" answer.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        '''
+        CTor of the LookupResult-class.
+        '''
+        super().__init__(*args, **kwargs)
+        self.failed = set()
+
+    def fail(self, ioc, default):
+        '''
+        fail will add an IoC whose lookup failed.
+        @param ioc will be the IoC.
+        @param default will be the empty information of the IoC for the report.
+        '''
+        self[ioc] = default
+        self.failed.add(ioc)
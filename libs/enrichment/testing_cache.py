@@ -0,0 +1,92 @@
+'''
+Tests for cache.py
+'''
+
+import os
+import tempfile
+
+from unittest import TestCase
+
+from libs.enrichment.cache import EnrichmentCache
+from libs.enrichment.engine import EnrichmentEngine
+from libs.enrichment.engine import Provider
+from libs.enrichment.result import LookupResult
+
+class EnrichmentCacheTests(TestCase):
+    '''
+    Tests for the enrichment cache.
+    '''
+
+    def test_ttl_and_negative_caching(self):
+        '''
+        Test to check if found and "not found" answers get their own time to live.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            cache = EnrichmentCache(os.path.join(directory, "cache.db"), 100, {"cve": 3600}, -1, "testing")
+            cache.put("cve", "CVE-2021-0001", {"Summary": "Something", "CVS-Score": None})
+            cache.put("cve", "CVE-2021-0002", {"Summary": None, "CVS-Score": None})
+            self.assertEqual(cache.get("cve", "CVE-2021-0001"), (True, {"Summary": "Something", "CVS-Score": None}))
+            self.assertEqual(cache.get("cve", "CVE-2021-0002"), (False, None))
+            self.assertEqual(cache.get("misp", "CVE-2021-0001"), (False, None))
+            self.assertEqual(cache.stats()["providers"]["cve"], {"hits": 1, "negative_hits": 0, "misses": 1, "stores": 2, "failures": 0})
+            cache.connection.close()
+
+    def test_least_recently_used_are_removed(self):
+        '''
+        Test to check if the least recently used entries are removed first.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            cache = EnrichmentCache(os.path.join(directory, "cache.db"), 10, {"misp": 3600}, 3600, "testing")
+            for index in range(10):
+                cache.put("misp", str(index), "1, 2")
+            cache.get("misp", "0")
+            cache.put("misp", "10", "3")
+            self.assertEqual(cache.stats()["entries"], 9)
+            self.assertTrue(cache.get("misp", "0")[0])
+            self.assertFalse(cache.get("misp", "1")[0])
+            cache.connection.close()
+
+    def test_engine_answers_from_cache(self):
+        '''
+        Test to check if the engine looks up only uncached IoC's and keeps their order.
+        '''
+        calls = []
+        def lookup(chunk):
+            calls.extend(chunk)
+            return {ioc: ioc.upper() for ioc in chunk if ioc != "broken"}
+        with tempfile.TemporaryDirectory() as directory:
+            cache = EnrichmentCache(os.path.join(directory, "cache.db"), 100, {"test": 3600}, 3600, "testing")
+            engine = EnrichmentEngine([Provider("test", 2)], "testing", cache)
+            first = engine.enrich({"iocs": ("test", lookup, ["b", "a", "broken"], "test")})
+            second = engine.enrich({"iocs": ("test", lookup, ["c", "a", "broken", "b"], "test")})
+            engine.shutdown()
+            cache.connection.close()
+        self.assertEqual(first["iocs"], {"b": "B", "a": "A"})
+        self.assertEqual(list(second["iocs"].items()), [("c", "C"), ("a", "A"), ("b", "B")])
+        self.assertEqual(sorted(calls), ["a", "b", "broken", "broken", "c"])
+
+    def test_failed_lookup_is_not_cached(self):
+        '''
+        Test to check if a lookup which fails once keeps its default for the report, is
+            not cached as "not found" and is cached after it succeeds.
+        '''
+        calls = []
+        def lookup(chunk):
+            calls.extend(chunk)
+            information = LookupResult()
+            for ioc in chunk:
+                if calls.count(ioc) == 1:
+                    information.fail(ioc, {"Country": None})
+                else:
+                    information[ioc] = {"Country": "DE"}
+            return information
+        with tempfile.TemporaryDirectory() as directory:
+            cache = EnrichmentCache(os.path.join(directory, "cache.db"), 100, {"vt_ipv4": 3600}, 3600, "testing")
+            engine = EnrichmentEngine([Provider("virustotal", 1)], "testing", cache)
+            results = [engine.enrich({"ipv4": ("virustotal", lookup, ["1.1.1.1"], "vt_ipv4")})["ipv4"] for _ in range(3)]
+            stats = cache.stats()["providers"]["vt_ipv4"]
+            engine.shutdown()
+            cache.connection.close()
+        self.assertEqual(results, [{"1.1.1.1": {"Country": None}}, {"1.1.1.1": {"Country": "DE"}}, {"1.1.1.1": {"Country": "DE"}}])
+        self.assertEqual(calls, ["1.1.1.1", "1.1.1.1"])
+        self.assertEqual(stats, {"hits": 1, "negative_hits": 0, "misses": 2, "stores": 1, "failures": 1})
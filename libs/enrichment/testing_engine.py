@@ -0,0 +1,59 @@
+'''
+Tests for engine.py
+'''
+
+import time
+
+from threading import Lock
+from unittest import TestCase
+
+from libs.enrichment.engine import EnrichmentEngine
+from libs.enrichment.engine import Provider
+
+class EnrichmentEngineTests(TestCase):
+    '''
+    Tests for the enrichment engine.
+    '''
+
+    def test_results_are_merged_in_order(self):
+        '''
+        Test to check if the lookups of single IoC's are merged in the order of the
+            IoC's and a failed lookup does not drop the others.
+        '''
+        def lookup(chunk):
+            if chunk == ["fail"]:
+                raise ValueError("lookup failed")
+            return {ioc: ioc.upper() for ioc in chunk}
+        engine = EnrichmentEngine([Provider("test", 4), Provider("local", 1, chunk_size=None)], "testing")
+        result = engine.enrich({
+            "single": ("test", lookup, ["c", "a", "fail", "b", "a"]),
+            "batch": ("local", lambda chunk: {"size": len(chunk)}, ["x", "y", "z"]),
+            "empty": ("test", lookup, None),
+        })
+        engine.shutdown()
+        self.assertEqual(list(result["single"].items()), [("c", "C"), ("a", "A"), ("b", "B")])
+        self.assertEqual(result["batch"], {"size": 3})
+        self.assertEqual(result["empty"], {})
+
+    def test_provider_limit(self):
+        '''
+        Test to check if the lookups run concurrently, but never more than the limit
+            of the provider.
+        '''
+        lock, running, peak = Lock(), [0], [0]
+        def lookup(chunk):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return {chunk[0]: True}
+        engine = EnrichmentEngine([Provider("test", 3)], "testing")
+        start = time.monotonic()
+        result = engine.enrich({"iocs": ("test", lookup, [str(index) for index in range(12)])})
+        duration = time.monotonic() - start
+        engine.shutdown()
+        self.assertEqual(len(result["iocs"]), 12)
+        self.assertEqual(peak[0], 3)
+        self.assertLess(duration, 12 * 0.02)
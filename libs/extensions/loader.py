@@ -25,13 +25,17 @@ class Extension():
         self.pattern_args = pattern_args
         self.group = group
         self.hidden =  not_in_report
+        self.compiled = None
 
     def get_pattern(self):
         '''
-        get_pattern will return a compiled regex with flags.
+        get_pattern will return a compiled regex with flags. The regex will only be
+            compiled on the first call.
         '''
         try:
-            return re.compile(self.pattern, self.pattern_args)
+            if self.compiled is None:
+                self.compiled = re.compile(self.pattern, self.pattern_args)
+            return self.compiled
         except Exception:
             return self.pattern
 
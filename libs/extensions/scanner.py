@@ -0,0 +1,152 @@
+'''
+This script contains a scanner which runs all extensions on a text.
+'''
+
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from libs.kafka.logging import LogMessage
+
+MIN_ANCHOR_LENGTH = 2
+
+REPEATS = tuple(getattr(sre_parse, name) for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') if hasattr(sre_parse, name))
+
+def literal_of(subpattern):
+    '''
+    literal_of will return the string a parsed regex matches, incase it only consists
+        of literals.
+    @param subpattern will be a parsed regex.
+    @return a string or None.
+    '''
+    chars = []
+    for opcode, argument in subpattern:
+        if opcode is sre_parse.LITERAL:
+            chars.append(chr(argument))
+        elif opcode is sre_parse.IN and len(argument) == 1 and argument[0][0] is sre_parse.LITERAL:
+            chars.append(chr(argument[0][1]))
+        elif opcode in REPEATS and argument[0] == argument[1] and (literal := literal_of(argument[2])) is not None:
+            chars.append(literal * argument[0])
+        elif opcode is sre_parse.SUBPATTERN and not (argument[1] or argument[2]) and (literal := literal_of(argument[-1])) is not None:
+            chars.append(literal)
+        else:
+            return None
+    return "".join(chars)
+
+def required_literals(subpattern):
+    '''
+    required_literals will search a parsed regex for literals of which at least one
+        is part of every match. The set with the longest shortest literal will be
+        returned.
+    @param subpattern will be a parsed regex.
+    @return a frozenset of strings or None incase there is no such set.
+    '''
+    candidates, run = [], []
+    for opcode, argument in subpattern:
+        if (literal := literal_of([(opcode, argument)])) is not None:
+            run.append(literal)
+            continue
+        if len(run) > 0:
+            candidates.append(frozenset(["".join(run)]))
+            run = []
+        if opcode in REPEATS and argument[0] >= 1:
+            candidates.append(required_literals(argument[2]))
+        elif opcode is sre_parse.SUBPATTERN and not (argument[1] or argument[2]):
+            candidates.append(required_literals(argument[-1]))
+        elif opcode is sre_parse.BRANCH:
+            branches = [required_literals(branch) for branch in argument[1]]
+            if all(branch is not None for branch in branches):
+                candidates.append(frozenset().union(*branches))
+        elif opcode is sre_parse.IN and all(item[0] is sre_parse.LITERAL for item in argument):
+            candidates.append(frozenset(chr(item[1]) for item in argument))
+    if len(run) > 0:
+        candidates.append(frozenset(["".join(run)]))
+    candidates = [candidate for candidate in candidates if candidate is not None and len(candidate) > 0]
+    return max(candidates, key=lambda candidate: min(len(literal) for literal in candidate), default=None)
+
+def pattern_anchors(pattern):
+    '''
+    pattern_anchors will return the literals which have to appear in a text, so the
+        compiled regex can match. At least one of the literals has to appear.
+    @param pattern will be a compiled regex.
+    @return a frozenset of strings or None incase the regex has to run on every text.
+    '''
+    try:
+        anchors = required_literals(sre_parse.parse(pattern.pattern, pattern.flags))
+        if anchors is None or min(len(anchor) for anchor in anchors) < MIN_ANCHOR_LENGTH or pattern.flags & re.LOCALE:
+            return None
+        if pattern.flags & re.IGNORECASE:
+            if not all(anchor.isascii() for anchor in anchors):
+                return None
+            anchors = frozenset(anchor.lower() for anchor in anchors)
+        return anchors
+    except Exception:
+        return None
+
+class ExtensionScanner():
+    '''
+    ExtensionScanner will run all extensions on a text. The regex of every extension will
+        be compiled once. Before a regex runs, the scanner checks whether the literals the
+        regex needs are part of the text and skips every regex which can not match.
+    '''
+
+    def __init__(self, extensions, servicename):
+        '''
+        CTor of the ExtensionScanner-class.
+        @param extensions will be a list of extensions.
+        @param servicename will be the name of the calling service.
+        '''
+        self.servicename = servicename
+        self.__extensions = []
+        for ext in extensions:
+            pattern = ext.get_pattern()
+            anchors = pattern_anchors(pattern) if isinstance(pattern, re.Pattern) else None
+            ignorecase = isinstance(pattern, re.Pattern) and bool(pattern.flags & re.IGNORECASE)
+            self.__extensions.append((ext, pattern, anchors, ignorecase))
+
+    @staticmethod
+    def contains_any(haystack, anchors, seen):
+        '''
+        contains_any will check whether at least one of the anchors is part of the text.
+        @param haystack will be the text.
+        @param anchors will be a set of strings.
+        @param seen will be a dict with the results of earlier checks on the same text.
+        @return a boolean.
+        '''
+        for anchor in anchors:
+            if anchor not in seen:
+                seen[anchor] = anchor in haystack
+            if seen[anchor]:
+                return True
+        return False
+
+    def scan(self, string):
+        '''
+        scan will execute the extensions on a string.
+        @param string will be the string to check against.
+        @return findings in the string machting the extensions-rules.
+        '''
+        findings = {}
+        try:
+            seen, lowered = {False: {}, True: {}}, None
+            for ext, pattern, anchors, ignorecase in self.__extensions:
+                try:
+                    if ignorecase and anchors is not None and lowered is None:
+                        lowered = string.lower() if string.isascii() else False
+                    if anchors is not None and not (ignorecase and lowered is False):
+                        if not ExtensionScanner.contains_any(lowered if ignorecase else string, anchors, seen[ignorecase]):
+                            findings[str(ext.field)] = []
+                            continue
+                    l_findings = re.findall(pattern, string)
+                    if len(l_findings) > 0 and isinstance(l_findings[0], tuple):
+                        findings[str(ext.field)] = [element[ext.get_group()] if len(element)-1 >= ext.get_group() else element.group(0) for element in l_findings]
+                    else:
+                        findings[str(ext.field)] = l_findings
+                except Exception as error:
+                    LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+        return findings
@@ -0,0 +1,89 @@
+'''
+Tests for scanner.py
+'''
+
+import os
+import re
+
+from unittest import TestCase
+
+import yaml
+
+from libs.extensions.loader import Extension
+from libs.extensions.scanner import ExtensionScanner
+from libs.extensions.scanner import pattern_anchors
+
+EXTENSIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "extensions")
+
+TEXTS = [
+    "",
+    "Nothing to see here.",
+    "The actor used AR21-013A and MAR-10322463-1.v1 with CWE-79 and MS17-010 on GET /index.php HTTP/1.1",
+    "Contact 10.0.0.1:8080 over 443/TCP, port 8443 and a payload of 2048 bytes from github.com/actor/tool",
+    "IMPHASH: 0123456789abcdef0123456789abcdef was seen at http://abcdefghijklmnop.onion and 0x52908400098527886E0F7030069857D2E4169EE7",
+    "HKLM\\Software\\Microsoft\\Windows\\CurrentVersion\\Run and C:\\Windows\\Temp\\evil.exe wrote application/x-msdownload",
+    "SB21-123 TA21-131A DcvjTfDYVN5fqoGuQDYAJRY3oJ2DPPb7eZ XuoNKhTPXEXfHvcBYqVJfUmDiDEcAD6d8Y G0032 S0154",
+    "dGVzdA==",
+]
+
+def load_test_extensions():
+    '''
+    load_test_extensions will load all shipped extensions without the logging of the loader.
+    '''
+    extensions = []
+    for name in sorted(os.listdir(EXTENSIONS_PATH)):
+        with open(os.path.join(EXTENSIONS_PATH, name)) as file:
+            data = yaml.load(file, Loader=yaml.FullLoader)
+        group = int(data['Group']) if 'Group' in data and data['Group'] is not None else 0
+        extensions.append(Extension(str(data['Name']), str(data['Field']), str(data['Pattern']), str(data['Reportfield']), str(data['MISPType']), data['PatternArgs'], group))
+    return extensions
+
+def scan_without_prefilter(extensions, string):
+    '''
+    scan_without_prefilter will be the scan as it was done before the scanner existed.
+    '''
+    findings = {}
+    for i in extensions:
+        try:
+            l_findings = re.findall(i.get_pattern(), string)
+            if len(l_findings) > 0 and isinstance(l_findings[0], tuple):
+                findings[str(i.field)] = [element[i.get_group()] if len(element)-1 >= i.get_group() else element.group(0) for element in l_findings]
+            else:
+                findings[str(i.field)] = l_findings
+        except Exception:
+            continue
+    return findings
+
+class ScannerTests(TestCase):
+    '''
+    Tests for the extension scanner.
+    '''
+
+    def test_scanner_matches_plain_scan(self):
+        '''
+        Test to check if the scanner returns the same findings as running every regex.
+        '''
+        extensions = load_test_extensions()
+        scanner = ExtensionScanner(extensions, "Test")
+        for text in TEXTS + ["\n".join(TEXTS)]:
+            self.assertEqual(scanner.scan(text), scan_without_prefilter(extensions, text))
+
+    def test_pattern_anchors(self):
+        '''
+        Test to check if the required literals of a regex are found.
+        '''
+        self.assertEqual(pattern_anchors(re.compile(r"(CWE-[0-9]{1,4})")), frozenset(["CWE-"]))
+        self.assertEqual(pattern_anchors(re.compile(r"(GET|POST)\s*/")), frozenset(["GET", "POST"]))
+        self.assertEqual(pattern_anchors(re.compile(r"[.]{1}(onion){1}")), frozenset([".onion"]))
+        self.assertEqual(pattern_anchors(re.compile(r"Port\s*[0-9]+", re.IGNORECASE)), frozenset(["port"]))
+        self.assertIsNone(pattern_anchors(re.compile(r"(?i:port)[0-9]+")))
+        self.assertIsNone(pattern_anchors(re.compile(r"(abc)?[0-9]+")))
+        self.assertIsNone(pattern_anchors(re.compile(r"[0-9]{1,4}\.[0-9]{1,4}")))
+
+    def test_ignorecase_prefilter(self):
+        '''
+        Test to check if a case insensitive regex is not skipped because of the case.
+        '''
+        scanner = ExtensionScanner([Extension("Ports", "ports", r"port\s*([0-9]+)", "Ports", "port", re.IGNORECASE)], "Test")
+        self.assertEqual(scanner.scan("PORT 8080"), {"ports": ["8080"]})
+        self.assertEqual(scanner.scan("nothing"), {"ports": []})
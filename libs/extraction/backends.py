@@ -0,0 +1,174 @@
+'''
+This script contains the backends which convert PDF-Files into text.
+'''
+
+import re
+
+from abc import ABC
+from abc import abstractmethod
+from io import StringIO
+
+from PyPDF2 import PdfFileReader
+
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+
+from libs.extraction.chunking import PAGE_BREAK
+
+CID_PATTERN = re.compile(r'\(cid:[0-9]+\)')
+
+class TextBackend(ABC):
+    '''
+    TextBackend will be the base class of all backends. A backend returns the text of
+        a PDF-File with a page break after every page.
+    '''
+
+    name = "base"
+
+    @abstractmethod
+    def extract(self, reportpath):
+        '''
+        extract will convert a PDF-File into text.
+        @param reportpath will be the path to the PDF-File.
+        @return the text of the PDF-File as string.
+        '''
+
+class PDFMinerBackend(TextBackend):
+    '''
+    PDFMinerBackend will convert PDF-Files with pdfminer. With layout analysis the
+        characters are grouped into words and lines like they appear on the page.
+    '''
+
+    name = "pdfminer"
+
+    def __init__(self, layout=True):
+        '''
+        CTor of the PDFMinerBackend-class.
+        @param layout will be a boolean indicating whether or not the layout analysis runs.
+        '''
+        self.layout = layout
+
+    def extract(self, reportpath):
+        '''
+        extract will convert a PDF-File into text. pdfminer keeps its CMap-caches
+            on class level, so they survive in a long-lived worker. The resource manager
+            caches fonts by object-id, which is only unique within one document. So every
+            document needs its own resource manager.
+        @param reportpath will be the path to the PDF-File.
+        @return the text of the PDF-File as string.
+        '''
+        pdf_content = StringIO()
+        with open(reportpath, 'rb') as file:
+            resource_manager = PDFResourceManager(caching=True)
+            device = TextConverter(resource_manager, pdf_content, laparams=LAParams() if self.layout else None)
+            interpreter = PDFPageInterpreter(resource_manager, device)
+            for page in PDFPage.create_pages(PDFDocument(PDFParser(file))):
+                interpreter.process_page(page)
+        return pdf_content.getvalue()
+
+class PDFMinerFastBackend(PDFMinerBackend):
+    '''
+    PDFMinerFastBackend will convert PDF-Files with pdfminer without layout analysis.
+    '''
+
+    name = "pdfminer-fast"
+
+    def __init__(self):
+        '''
+        CTor of the PDFMinerFastBackend-class.
+        '''
+        super().__init__(layout=False)
+
+class PyPDF2Backend(TextBackend):
+    '''
+    PyPDF2Backend will convert PDF-Files with PyPDF2, which only reads the text
+        operators of a page.
+    '''
+
+    name = "pypdf2"
+
+    def extract(self, reportpath):
+        '''
+        extract will convert a PDF-File into text.
+        @param reportpath will be the path to the PDF-File.
+        @return the text of the PDF-File as string.
+        '''
+        with open(reportpath, 'rb') as file:
+            reader = PdfFileReader(file, strict=False)
+            if reader.isEncrypted:
+                reader.decrypt('')
+            return "".join(reader.getPage(index).extractText() + PAGE_BREAK for index in range(reader.getNumPages()))
+
+def looks_garbled(text):
+    '''
+    looks_garbled will check whether a text is empty or could not be decoded properly.
+        That happens for fonts without a unicode mapping or when the words of a page
+        are not seperated by spaces.
+    @param text will be the text of a PDF-File.
+    @return a boolean.
+    '''
+    content = text.replace(PAGE_BREAK, "").strip()
+    if len(content) == 0:
+        return True
+    if sum(len(cid) for cid in CID_PATTERN.findall(content)) > len(content) * 0.1:
+        return True
+    if sum(1 for char in content if char.isprintable() or char.isspace()) < len(content) * 0.95:
+        return True
+    words = content.split()
+    return sum(len(word) for word in words) / len(words) > 25
+
+class FallbackBackend(TextBackend):
+    '''
+    FallbackBackend will try a fast backend first and fall back to another backend
+        incase the text of the fast one is empty, garbled or fails. A MemoryError is
+        raised, so the engine sees the memory limit. The number of fallbacks of the
+        process is counted in fallbacks.
+    '''
+
+    def __init__(self, primary, fallback):
+        '''
+        CTor of the FallbackBackend-class.
+        @param primary will be the backend which is tried first.
+        @param fallback will be the backend which is used for garbled texts.
+        '''
+        self.primary = primary
+        self.fallback = fallback
+        self.name = "{}+{}".format(primary.name, fallback.name)
+        self.fallbacks = 0
+
+    def extract(self, reportpath):
+        '''
+        extract will convert a PDF-File into text.
+        @param reportpath will be the path to the PDF-File.
+        @return the text of the PDF-File as string.
+        '''
+        try:
+            if not looks_garbled(text := self.primary.extract(reportpath)):
+                return text
+        except MemoryError:
+            raise
+        except Exception:
+            pass
+        self.fallbacks += 1
+        return self.fallback.extract(reportpath)
+
+BACKENDS = {
+    PDFMinerBackend.name: PDFMinerBackend,
+    PDFMinerFastBackend.name: PDFMinerFastBackend,
+    PyPDF2Backend.name: PyPDF2Backend,
+}
+
+def get_backend(name):
+    '''
+    get_backend will return a backend by its name. Every backend except the full
+        pdfminer backend falls back to the full pdfminer backend for garbled texts.
+    @param name will be the name of the backend: pdfminer, pdfminer-fast or pypdf2.
+    @return a TextBackend.
+    '''
+    if name not in BACKENDS or name == PDFMinerBackend.name:
+        return PDFMinerBackend()
+    return FallbackBackend(BACKENDS[name](), PDFMinerBackend())
@@ -0,0 +1,71 @@
+'''
+Benchmark for the text backends of the extractor. It compares the throughput of every
+    backend and the recall of the IoC's compared to the full pdfminer backend.
+
+Usage (from the iocextractor folder):
+    PYTHONPATH=.. python -m libs.extraction.benchmark_backends /path/to/pdfs
+'''
+
+import os
+import sys
+import time
+
+from libs.extensions.loader import load_extensions
+from libs.extensions.scanner import ExtensionScanner
+from libs.extraction.backends import BACKENDS
+from libs.extraction.backends import PDFMinerBackend
+from libs.extraction.backends import get_backend
+from libs.extraction.chunking import PAGE_BREAK
+from libs.extraction.engine import scan_text
+
+SERVICENAME = "Benchmark"
+
+def flatten(findings, prefix=""):
+    '''
+    flatten will turn a dict with findings into a set of (key, value) tuples.
+    '''
+    values = set()
+    for key, value in findings.items():
+        if isinstance(value, dict):
+            values |= flatten(value, "{}{}.".format(prefix, key))
+        elif isinstance(value, list):
+            values |= {("{}{}".format(prefix, key), str(element)) for element in value}
+    return values
+
+def run(corpus):
+    '''
+    run will extract every PDF-File of the corpus with every backend and print the results.
+    @param corpus will be a folder with PDF-Files.
+    '''
+    reports = sorted(os.path.join(corpus, name) for name in os.listdir(corpus) if name.endswith(".pdf"))
+    scanner = ExtensionScanner(load_extensions(SERVICENAME), SERVICENAME)
+    baseline = {}
+    print("{:<28} {:>8} {:>10} {:>10} {:>10} {:>10}".format("backend", "reports", "pages/s", "seconds", "recall", "fallbacks"))
+    for name in [PDFMinerBackend.name] + [name for name in BACKENDS if name != PDFMinerBackend.name]:
+        backend = get_backend(name)
+        texts, seconds = {}, 0.0
+        for report in reports:
+            start = time.perf_counter()
+            try:
+                texts[report] = backend.extract(report)
+            except Exception as error:
+                print("[-] {} failed on {}: {}".format(backend.name, report, error))
+                texts[report] = ""
+            seconds += time.perf_counter() - start
+        found, expected = 0, 0
+        for report, text in texts.items():
+            iocs = flatten(scan_text(text, scanner, SERVICENAME))
+            if name == PDFMinerBackend.name:
+                baseline[report] = iocs
+            found += len(iocs & baseline[report])
+            expected += len(baseline[report])
+        pages = sum(text.count(PAGE_BREAK) for text in texts.values())
+        print("{:<28} {:>8} {:>10.1f} {:>10.2f} {:>10.3f} {:>10}".format(
+            backend.name, len(reports), pages / seconds if seconds > 0 else 0.0, seconds,
+            found / expected if expected > 0 else 1.0, getattr(backend, "fallbacks", 0)))
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__)
+        sys.exit(1)
+    run(sys.argv[1])
@@ -0,0 +1,143 @@
+'''
+This script contains a content-addressed on-disk cache for the findings of reports.
+'''
+
+import os
+import re
+import json
+import hashlib
+
+from threading import Lock
+
+from libs.kafka.logging import LogMessage
+
+FILES = "files"
+TEXTS = "texts"
+
+def file_digest(path):
+    '''
+    file_digest will return the SHA-256 of the bytes of a file.
+    @param path will be the path to the file.
+    @return the digest as hex-string.
+    '''
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def text_digest(text):
+    '''
+    text_digest will return the SHA-256 of a normalized text. All whitespace will be
+        collapsed, so the same report with a different layout gets the same digest.
+    @param text will be the text of a report.
+    @return the digest as hex-string.
+    '''
+    return hashlib.sha256(re.sub(r'\s+', ' ', text).strip().encode('UTF-8')).hexdigest()
+
+class ExtractionCache():
+    '''
+    ExtractionCache will store the findings of reports on disk. The first level is keyed
+        by the digest of the file, the second level by the digest of the normalized text.
+        The least recently used entries will be removed when the cache grows over its size.
+    '''
+
+    def __init__(self, directory, max_bytes, servicename):
+        '''
+        CTor of the ExtractionCache-class.
+        @param directory will be the folder of the cache.
+        @param max_bytes will be the maximum size of the cache in bytes.
+        @param servicename will be the name of the calling service.
+        '''
+        self.directory = directory
+        self.max_bytes = max(0, int(max_bytes))
+        self.servicename = servicename
+        self.__lock = Lock()
+        self.__size = None
+
+    def __path(self, level, digest):
+        '''
+        __path will return the path of an entry.
+        '''
+        return os.path.join(self.directory, level, digest[:2], "{}.json".format(digest))
+
+    def __entries(self):
+        '''
+        __entries will return all entries of the cache as a list of tuples in the format
+            (last_access, size, path).
+        '''
+        entries = []
+        for level in [FILES, TEXTS]:
+            for root, _, files in os.walk(os.path.join(self.directory, level)):
+                for name in files:
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                        entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+                    except OSError:
+                        continue
+        return entries
+
+    def get(self, level, digest):
+        '''
+        get will return the cached findings of a report.
+        @param level will be FILES or TEXTS.
+        @param digest will be the digest of the file or the text.
+        @return the cached entry as dict or None incase it is not cached.
+        '''
+        try:
+            path = self.__path(level, digest)
+            with open(path) as file:
+                entry = json.load(file)
+            os.utime(path)
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.WARNING, self.servicename).log()
+            return None
+
+    def put(self, level, digest, entry):
+        '''
+        put will store the findings of a report and evict the least recently used entries
+            incase the cache is to large.
+        @param level will be FILES or TEXTS.
+        @param digest will be the digest of the file or the text.
+        @param entry will be a dict which can be serialized to json.
+        '''
+        try:
+            path = self.__path(level, digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(temp_path, 'w') as file:
+                json.dump(entry, file)
+            size = os.path.getsize(temp_path)
+            with self.__lock:
+                try:
+                    size -= os.path.getsize(path)
+                except OSError:
+                    pass
+                os.replace(temp_path, path)
+                if self.__size is None:
+                    self.__size = sum(entry_size for _, entry_size, _ in self.__entries())
+                else:
+                    self.__size += size
+                if self.__size > self.max_bytes:
+                    self.__evict()
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.WARNING, self.servicename).log()
+
+    def __evict(self):
+        '''
+        __evict will remove the least recently used entries until the cache is smaller
+            than 90 percent of its size.
+        '''
+        entries = sorted(self.__entries())
+        self.__size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.__size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self.__size -= size
+            except OSError:
+                continue
@@ -0,0 +1,71 @@
+'''
+This script contains functions to scan large reports in chunks of pages.
+'''
+
+PAGE_BREAK = '\f'
+
+def split_pages(text):
+    '''
+    split_pages will split the text of a PDF-File at the page breaks pdfminer writes
+        after every page. Every page keeps its page break, so the pages joined together
+        are the text again.
+    @param text will be the text of a PDF-File.
+    @return a list of pages.
+    '''
+    pages = text.split(PAGE_BREAK)
+    return [page + PAGE_BREAK for page in pages[:-1]] + ([pages[-1]] if len(pages[-1]) > 0 else [])
+
+def build_chunks(text, pages_per_chunk, overlap):
+    '''
+    build_chunks will split a text into chunks of pages. Every chunk gets an overlap
+        window with the beginning of the following chunk, which is extended to the end
+        of its last line. So every match which starts in a chunk and ends at most
+        overlap characters after the end of the chunk will be found in that chunk.
+    @param text will be the text of a PDF-File.
+    @param pages_per_chunk will be the number of pages in a chunk.
+    @param overlap will be the size of the overlap window in characters.
+    @return a list of strings.
+    '''
+    pages = split_pages(text)
+    pages_per_chunk = max(1, int(pages_per_chunk))
+    chunks, start = [], 0
+    for index in range(0, len(pages), pages_per_chunk):
+        end = start + sum(len(page) for page in pages[index:index + pages_per_chunk])
+        window_end = end + max(0, int(overlap))
+        if window_end < len(text) and (line_end := text.find('\n', window_end)) >= 0:
+            window_end = line_end + 1
+        chunks.append(text[start:min(window_end, len(text))])
+        start = end
+    return chunks
+
+def merge_findings(results):
+    '''
+    merge_findings will merge the findings of several chunks into one dict. Lists will
+        be joined without duplicates in the order of their first appearance, nested dicts
+        will be merged the same way and for all other values the first one is kept.
+    @param results will be a list of dicts with findings.
+    @return a dict with the merged findings.
+    '''
+    merged = {}
+    for result in results:
+        for key, value in result.items():
+            if key not in merged:
+                merged[key] = merge_findings([value]) if isinstance(value, dict) else (list(dict.fromkeys(value)) if isinstance(value, list) else value)
+            elif isinstance(merged[key], dict) and isinstance(value, dict):
+                merged[key] = merge_findings([merged[key], value])
+            elif isinstance(merged[key], list) and isinstance(value, list):
+                merged[key] = list(dict.fromkeys(merged[key] + value))
+    return merged
+
+def scan_chunked(text, scan, pages_per_chunk, overlap, mapper=map):
+    '''
+    scan_chunked will split a text into chunks, scan every chunk and merge the findings.
+    @param text will be the text of a PDF-File.
+    @param scan will be a function which takes a string and returns a dict with findings.
+    @param pages_per_chunk will be the number of pages in a chunk.
+    @param overlap will be the size of the overlap window in characters.
+    @param mapper will be a map-function like the one of an executor, so the chunks
+        can be scanned in parallel.
+    @return a dict with the merged findings.
+    '''
+    return merge_findings(list(mapper(scan, build_chunks(text, pages_per_chunk, overlap))))
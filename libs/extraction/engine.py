@@ -0,0 +1,374 @@
+'''
+This script contains the process-pool engine which extracts IoC's from PDF-Files.
+'''
+
+import os
+import time
+import queue
+import itertools
+import resource
+import multiprocessing
+
+from threading import Lock
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import iocextract as ioce
+
+from ioc_finder import find_iocs
+
+from libs.core.filter import filter_dict_values
+from libs.core.merge_dicts import merge_dicts
+from libs.extensions.loader import load_extensions
+from libs.extensions.scanner import ExtensionScanner
+from libs.extraction.backends import get_backend
+from libs.extraction.cache import ExtractionCache
+from libs.extraction.cache import FILES
+from libs.extraction.cache import TEXTS
+from libs.extraction.cache import file_digest
+from libs.extraction.cache import text_digest
+from libs.extraction.chunking import PAGE_BREAK
+from libs.extraction.chunking import scan_chunked
+
+_WORKER_STATE = {}
+
+class ExtractionError(Exception):
+    '''
+    ExtractionError will be raised when a report exceeds the limits of the engine or
+        crashes a worker process.
+    '''
+
+    def __init__(self, reason):
+        '''
+        CTor of the ExtractionError-class.
+        @param reason will be a description why the extraction failed.
+        '''
+        super().__init__(reason)
+        self.reason = reason
+
+def initialize_worker(servicename, cache_directory=None, backend="pdfminer", memory_limit=0, started=None):
+    '''
+    initialize_worker will be executed once in every new worker process. It loads
+        and compiles all extensions, so a worker can reuse them for every document.
+    @param servicename will be the name of the calling service.
+    @param cache_directory will be the folder of the extraction cache or None.
+    @param backend will be the name of the backend which converts PDF-Files into text.
+    @param memory_limit will be the maximum address space of the worker in bytes. 0
+        disables the limit.
+    @param started will be a queue, which gets the ID and the start time of every task,
+        or None.
+    '''
+    if memory_limit > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    _WORKER_STATE['started'] = started
+    _WORKER_STATE['servicename'] = servicename
+    _WORKER_STATE['backend'] = get_backend(backend)
+    _WORKER_STATE['cache'] = ExtractionCache(cache_directory, 0, servicename) if cache_directory is not None else None
+    _WORKER_STATE['scanner'] = ExtensionScanner(load_extensions(servicename), servicename)
+
+def run_task(task, function, *args):
+    '''
+    run_task will run a task inside a worker process and report its start first, so the
+        timeout of the engine does not count the time the task waits in the pool.
+    @param task will be the ID of the task.
+    @param function will be the task, like extract_report or scan_chunk.
+    @param args will be the arguments of the task.
+    @return the result of the task.
+    '''
+    if (started := _WORKER_STATE.get('started')) is not None:
+        started.put((task, time.time()))
+    return function(*args)
+
+def scan_text(pdftext, scanner, servicename):
+    '''
+    scan_text will search all IoC's in a text by running ioc_finder, the yara-rule
+        extraction and all extensions.
+    @param pdftext will be the text of a report.
+    @param scanner will be an ExtensionScanner with all extensions.
+    @param servicename will be the name of the calling service.
+    @return a dict with all findings.
+    '''
+    iocs = find_iocs(pdftext)
+    iocs['yara_rules'] = [rule for rule in ioce.extract_yara_rules(pdftext)]
+    ex_ioc = scanner.scan(pdftext)
+    return merge_dicts(iocs, filter_dict_values(ex_ioc, servicename), servicename)
+
+def scan_chunk(chunk):
+    '''
+    scan_chunk is the task which runs inside a worker process to scan one chunk of
+        a large report.
+    @param chunk will be a part of the text of a report.
+    @return a dict with all findings.
+    '''
+    return scan_text(chunk, _WORKER_STATE['scanner'], _WORKER_STATE['servicename'])
+
+def extract_report(reportpath, chunk_pages=0):
+    '''
+    extract_report is the task which runs inside a worker process. It will extract
+        the text of a PDF-File and search all IoC's in it. A report with the same
+        normalized text as an already extracted one will not be scanned again. The
+        text of a report with more than chunk_pages pages will be returned instead of
+        the findings, so its chunks can be scanned by several workers.
+    @param reportpath will be the path to the PDF-File.
+    @param chunk_pages will be the number of pages in a chunk. 0 disables chunking.
+    @return a dict in the format {"findings": {}, "text": None, "digest": "", "resubmission": False,
+        "fallback": False}. fallback is True incase the text came from the fallback backend.
+    '''
+    fallbacks = getattr(backend := _WORKER_STATE['backend'], 'fallbacks', 0)
+    pdftext = backend.extract(reportpath)
+    fallback = getattr(backend, 'fallbacks', 0) > fallbacks
+    digest = text_digest(pdftext)
+    if (cache := _WORKER_STATE['cache']) is not None and (entry := cache.get(TEXTS, digest)) is not None:
+        return {"findings": entry['findings'], "text": None, "digest": digest, "resubmission": True, "fallback": fallback}
+    if chunk_pages > 0 and pdftext.count(PAGE_BREAK) > chunk_pages:
+        return {"findings": None, "text": pdftext, "digest": digest, "resubmission": False, "fallback": fallback}
+    return {"findings": scan_chunk(pdftext), "text": None, "digest": digest, "resubmission": False, "fallback": fallback}
+
+class ExtractionEngine():
+    '''
+    ExtractionEngine will be a bounded pool of long-lived worker processes
+        for the extraction of IoC's. The GIL does not serialize the
+        CPU-bound parsing and scanning, because every document is handled
+        in a seperate process. A document which runs longer than the timeout
+        gets its worker pool killed. That restarts the whole pool, so the
+        documents which ran in the killed pool at the same time are retried
+        in a worker of their own.
+    '''
+
+    def __init__(self, servicename, workers=None, recycle_after=50, chunk_pages=0, chunk_overlap=4096, cache=None, backend="pdfminer", timeout=0, memory_limit=0):
+        '''
+        CTor of the ExtractionEngine-class.
+        @param servicename will be the name of the calling service.
+        @param workers will be the number of worker processes. Defaults
+            to the number of cpus.
+        @param recycle_after will be the number of documents a worker handles
+            before it gets replaced, so the memory growth of pdfminer stays bounded.
+        @param chunk_pages will be the number of pages in a chunk. Reports with more
+            pages will be scanned in chunks by several workers. 0 disables chunking.
+        @param chunk_overlap will be the number of characters a chunk overlaps with
+            the next one. It has to be larger than the longest IoC.
+        @param cache will be an ExtractionCache for the findings or None.
+        @param backend will be the name of the backend which converts PDF-Files into text.
+        @param timeout will be the maximum time in seconds a worker spends on a document
+            or a chunk. 0 disables the timeout.
+        @param memory_limit will be the maximum address space of a worker in bytes. 0
+            disables the limit.
+        '''
+        self.servicename = servicename
+        self.workers = max(1, int(workers)) if workers else (os.cpu_count() or 1)
+        self.recycle_after = max(1, int(recycle_after))
+        self.chunk_pages = max(0, int(chunk_pages))
+        self.chunk_overlap = max(0, int(chunk_overlap))
+        self.cache = cache
+        self.backend = backend
+        self.timeout = max(0, float(timeout))
+        self.memory_limit = max(0, int(memory_limit))
+        self.__executor = None
+        self.__documents = 0
+        self.__lock = Lock()
+        self.__tasks = itertools.count()
+        self.__started = multiprocessing.Queue()
+        self.__start_times = {}
+        self.__counters = {"documents": 0, "timeouts": 0, "memory_errors": 0, "crashes": 0, "retries": 0, "fallbacks": 0}
+
+    def __create_executor(self, workers):
+        '''
+        __create_executor will create a new process pool.
+        @param workers will be the number of worker processes.
+        @return a ProcessPoolExecutor.
+        '''
+        return ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker, initargs=(
+            self.servicename, self.cache.directory if self.cache is not None else None, self.backend, self.memory_limit, self.__started))
+
+    def __submit(self, executor, function, *args):
+        '''
+        __submit will hand a task over to a pool.
+        @param executor will be the pool.
+        @param function will be the task, like extract_report or scan_chunk.
+        @param args will be the arguments of the task.
+        @return a tuple in the format (task, future).
+        '''
+        with self.__lock:
+            task = next(self.__tasks)
+            self.__start_times[task] = None
+        return task, executor.submit(run_task, task, function, *args)
+
+    def __start_time(self, task):
+        '''
+        __start_time will return the time a worker started a task. The reported starts
+            of all waiting tasks are collected from the queue of the workers.
+        @param task will be the ID of the task.
+        @return the start time or None incase no worker started the task yet.
+        '''
+        with self.__lock:
+            try:
+                while True:
+                    started, start_time = self.__started.get_nowait()
+                    if started in self.__start_times:
+                        self.__start_times[started] = start_time
+            except (queue.Empty, OSError, ValueError):
+                pass
+            return self.__start_times.get(task)
+
+    def __get_executor(self):
+        '''
+        __get_executor will return the current process pool. After workers * recycle_after
+            documents the pool will be replaced by a new one. Documents which are
+            already running will be finished by the old pool.
+        @return a ProcessPoolExecutor.
+        '''
+        if self.__executor is not None and self.__documents >= self.workers * self.recycle_after:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
+        if self.__executor is None:
+            self.__executor = self.__create_executor(self.workers)
+            self.__documents = 0
+        return self.__executor
+
+    def __kill(self, executor):
+        '''
+        __kill will kill all worker processes of a pool. ProcessPoolExecutor can not
+            cancel a running task, so the processes are killed directly.
+        @param executor will be the ProcessPoolExecutor.
+        '''
+        with self.__lock:
+            if executor is self.__executor:
+                self.__executor = None
+        for process in list((getattr(executor, '_processes', None) or {}).values()):
+            try:
+                process.kill()
+            except Exception:
+                continue
+        executor.shutdown(wait=False)
+
+    def __wait(self, task, future, executor):
+        '''
+        __wait will wait for the result of a task. The timeout starts when a worker
+            reports the start of the task, so the time a task waits in the pool does
+            not count. A timeout kills the whole pool.
+        @param task will be the ID of the task.
+        @param future will be the future of the task.
+        @param executor will be the pool which runs the task.
+        @return the result of the task.
+        '''
+        started = None
+        try:
+            while True:
+                try:
+                    return future.result(timeout=0.5 if self.timeout > 0 else None)
+                except FutureTimeoutError:
+                    if started is None:
+                        started = self.__start_time(task)
+                    if started is not None and time.time() - started > self.timeout:
+                        with self.__lock:
+                            self.__counters['timeouts'] += 1
+                        self.__kill(executor)
+                        raise ExtractionError("Extraction took longer than {} seconds.".format(self.timeout))
+                except MemoryError as error:
+                    with self.__lock:
+                        self.__counters['memory_errors'] += 1
+                    raise ExtractionError("Extraction exceeded the memory limit of {} bytes.".format(self.memory_limit)) from error
+        finally:
+            with self.__lock:
+                self.__start_times.pop(task, None)
+
+    def submit(self, reportpath):
+        '''
+        submit will hand a PDF-File over to a worker process.
+        @param reportpath will be the path to the PDF-File.
+        @return a tuple in the format (task, future, executor). The future will have the
+            result of extract_report.
+        '''
+        with self.__lock:
+            executor = self.__get_executor()
+            self.__documents += 1
+            self.__counters['documents'] += 1
+        return self.__submit(executor, extract_report, reportpath, self.chunk_pages) + (executor,)
+
+    def __extract(self, reportpath, executor=None):
+        '''
+        __extract will extract all IoC's of a PDF-File in the pool or in the given
+            executor.
+        @param reportpath will be the path to the PDF-File.
+        @param executor will be an executor for the report or None for the pool.
+        @return the result of extract_report with the findings of all chunks.
+        '''
+        if executor is None:
+            task, future, executor = self.submit(reportpath)
+        else:
+            task, future = self.__submit(executor, extract_report, reportpath, self.chunk_pages)
+        result = self.__wait(task, future, executor)
+        if result.get('fallback', False):
+            with self.__lock:
+                self.__counters['fallbacks'] += 1
+        if result['text'] is not None:
+            def mapper(function, chunks):
+                futures = [self.__submit(executor, function, chunk) for chunk in chunks]
+                return [self.__wait(task, chunk_future, executor) for task, chunk_future in futures]
+            result['findings'] = scan_chunked(result['text'], scan_chunk, self.chunk_pages, self.chunk_overlap, mapper=mapper)
+        return result
+
+    def __extract_isolated(self, reportpath):
+        '''
+        __extract_isolated will extract a PDF-File in a worker process of its own, so a
+            crash can be assigned to the report.
+        @param reportpath will be the path to the PDF-File.
+        @return the result of extract_report with the findings of all chunks.
+        '''
+        executor = self.__create_executor(1)
+        try:
+            return self.__extract(reportpath, executor)
+        except BrokenProcessPool as error:
+            with self.__lock:
+                self.__counters['crashes'] += 1
+            raise ExtractionError("Extraction crashed the worker process.") from error
+        finally:
+            executor.shutdown(wait=False)
+
+    def extract(self, reportpath):
+        '''
+        extract will extract all IoC's of a PDF-File and wait for the result. The text of
+            a large report will be scanned in chunks by several workers in parallel. A file
+            which is in the cache will neither be parsed nor scanned. When the pool breaks,
+            because a worker crashed or got killed, the report will be retried in a worker
+            of its own.
+        @param reportpath will be the path to the PDF-File.
+        @return a dict in the format {"findings": {}, "digest": "", "resubmission": False}.
+            The digest will be the SHA-256 of the normalized text.
+        @raise ExtractionError incase the report exceeds the limits or crashes a worker.
+        '''
+        digest = file_digest(reportpath) if self.cache is not None else None
+        if digest is not None and (entry := self.cache.get(FILES, digest)) is not None:
+            return {"findings": entry['findings'], "digest": entry['digest'], "resubmission": True}
+        try:
+            result = self.__extract(reportpath)
+        except BrokenProcessPool:
+            with self.__lock:
+                self.__counters['retries'] += 1
+            result = self.__extract_isolated(reportpath)
+        if self.cache is not None:
+            entry = {"findings": result['findings'], "digest": result['digest']}
+            self.cache.put(FILES, digest, entry)
+            if not result['resubmission']:
+                self.cache.put(TEXTS, result['digest'], entry)
+        return {"findings": result['findings'], "digest": result['digest'], "resubmission": result['resubmission']}
+
+    def stats(self):
+        '''
+        stats will return the counters of the engine.
+        @return a dict in the format {"documents": 0, "timeouts": 0, "memory_errors": 0,
+            "crashes": 0, "retries": 0, "fallbacks": 0}. fallbacks counts the reports whose
+            text came from the fallback backend.
+        '''
+        with self.__lock:
+            return dict(self.__counters)
+
+    def shutdown(self):
+        '''
+        shutdown will stop all worker processes.
+        '''
+        with self.__lock:
+            if self.__executor is not None:
+                self.__executor.shutdown(wait=True)
+                self.__executor = None
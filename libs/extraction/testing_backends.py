@@ -0,0 +1,52 @@
+'''
+Tests for backends.py
+'''
+
+from unittest import TestCase
+
+from libs.extraction.backends import FallbackBackend
+from libs.extraction.backends import TextBackend
+
+class StaticBackend(TextBackend):
+    '''
+    StaticBackend will return the same text for every PDF-File.
+    '''
+
+    def __init__(self, name, text):
+        '''
+        CTor of the StaticBackend-class.
+        '''
+        self.name = name
+        self.text = text
+
+    def extract(self, reportpath):
+        '''
+        extract will return the text of the backend.
+        '''
+        return self.text
+
+
+class BackendTests(TestCase):
+    '''
+    Tests for the backends of the extraction.
+    '''
+
+    def test_backend_needs_extract(self):
+        '''
+        Test to check if a backend without extract can not be created.
+        '''
+        with self.assertRaises(TypeError):
+            TextBackend()
+
+    def test_fallbacks_are_counted(self):
+        '''
+        Test to check if only a garbled text of the primary backend falls back.
+        '''
+        fallback = StaticBackend("full", "The actor used the server.\f")
+        backend = FallbackBackend(StaticBackend("fast", "The actor used the server.\f"), fallback)
+        self.assertEqual(backend.name, "fast+full")
+        backend.extract("report.pdf")
+        self.assertEqual(backend.fallbacks, 0)
+        backend.primary = StaticBackend("fast", "(cid:12)(cid:34)(cid:56)\f")
+        self.assertEqual(backend.extract("report.pdf"), fallback.text)
+        self.assertEqual(backend.fallbacks, 1)
@@ -0,0 +1,78 @@
+'''
+Tests for cache.py
+'''
+
+import os
+import time
+import tempfile
+
+from unittest import TestCase
+
+from libs.extraction.cache import FILES, TEXTS, ExtractionCache, text_digest
+
+def entry(name):
+    '''
+    entry will return an entry of 101 bytes as json.
+    @param name will be a name of one character.
+    @return the entry as dict.
+    '''
+    return {"input_filename": name * 79}
+
+def backdate(directory, seconds):
+    '''
+    backdate will make all entries of a cache older.
+    @param directory will be the folder of the cache.
+    @param seconds will be the age in seconds.
+    '''
+    past = time.time() - seconds
+    for root, _, files in os.walk(directory):
+        for name in files:
+            os.utime(os.path.join(root, name), (past, past))
+
+class ExtractionCacheTests(TestCase):
+    '''
+    Tests for the on-disk cache of the findings.
+    '''
+
+    def test_levels_and_digests(self):
+        '''
+        Test to check if the levels are separated and the text digest ignores the layout.
+        '''
+        self.assertEqual(text_digest("evil.com\n\n  1.2.3.4 "), text_digest("evil.com 1.2.3.4"))
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ExtractionCache(directory, 10000, "testing")
+            cache.put(FILES, "aa11", entry("a"))
+            self.assertEqual(cache.get(FILES, "aa11"), entry("a"))
+            self.assertIsNone(cache.get(TEXTS, "aa11"))
+            self.assertIsNone(cache.get(FILES, "bb22"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        '''
+        Test to check if the cache removes the least recently used entry when it grows
+            over its size and keeps an entry which has been read.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ExtractionCache(directory, 250, "testing")
+            cache.put(FILES, "aa11", entry("a"))
+            cache.put(FILES, "bb22", entry("b"))
+            backdate(directory, 60)
+            self.assertEqual(cache.get(FILES, "aa11"), entry("a"))
+            cache.put(TEXTS, "cc33", entry("c"))
+            self.assertEqual(cache.get(FILES, "aa11"), entry("a"))
+            self.assertIsNone(cache.get(FILES, "bb22"))
+            self.assertEqual(cache.get(TEXTS, "cc33"), entry("c"))
+
+    def test_replaced_entry_is_counted_once(self):
+        '''
+        Test to check if storing an entry again does not grow the size of the cache, so
+            no entry is evicted before the cache is full.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ExtractionCache(directory, 330, "testing")
+            for name in ["a", "b", "c"]:
+                cache.put(FILES, name * 4, entry(name))
+            backdate(directory, 60)
+            for _ in range(5):
+                cache.put(FILES, "cccc", entry("c"))
+            for name in ["a", "b", "c"]:
+                self.assertEqual(cache.get(FILES, name * 4), entry(name))
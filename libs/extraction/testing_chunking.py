@@ -0,0 +1,185 @@
+'''
+Tests for chunking.py
+'''
+
+import re
+import random
+
+from functools import partial
+from unittest import TestCase
+
+from libs.extensions.scanner import ExtensionScanner
+from libs.extensions.testing_scanner import load_test_extensions
+from libs.extraction.chunking import build_chunks
+from libs.extraction.chunking import merge_findings
+from libs.extraction.chunking import scan_chunked
+from libs.extraction.chunking import split_pages
+from libs.extraction.engine import scan_text
+
+PATTERNS = {
+    "ipv4s": re.compile(r"\b(?:[0-9]{1,3}\.){3}[0-9]{1,3}\b"),
+    "cves": re.compile(r"CVE-[0-9]{4}-[0-9]{4,7}"),
+    "ip_port_comb": re.compile(r"(([0-9]{1,4}[.]{1}){3}([0-9]{1,4}){1}:{1}[0-9]{1,5})"),
+    "file_paths": re.compile(r"((([a-zA-Z]:|%[a-zA-Z0-9%]*)\\([ a-zA-Z0-9\\_\'#+.~&%$§\/\"\(\)\[\]]*){0,}))"),
+    "yara_rules": re.compile(r"rule \w+\s*\{.*?condition:.*?\}", re.DOTALL),
+}
+
+def scan(text):
+    '''
+    scan will be a regex based stand-in for the scanners of the extractor.
+    '''
+    findings = {}
+    for key, pattern in PATTERNS.items():
+        findings[key] = list(dict.fromkeys(match.group(0) for match in pattern.finditer(text)))
+    findings['attack_techniques'] = {"enterprise": list(dict.fromkeys(re.findall(r"\bT1[0-9]{3}\b", text)))}
+    return findings
+
+def generate_report(pages, seed):
+    '''
+    generate_report will generate the text of a report with IoC's at the beginning
+        and the end of pages and yara-rules which span over page breaks.
+    '''
+    rand = random.Random(seed)
+    words = ["the", "actor", "used", "server", "payload", "was", "observed", "on", "host"]
+    text = []
+    for page in range(pages):
+        lines = ["{}.{}.{}.{}".format(rand.randint(1, 254), rand.randint(0, 254), rand.randint(0, 254), page % 250 + 1)]
+        for _ in range(rand.randint(5, 30)):
+            line = [rand.choice(words) for _ in range(rand.randint(3, 12))]
+            if rand.random() < 0.3:
+                line.insert(rand.randint(0, len(line)), "CVE-20{:02d}-{:05d}".format(rand.randint(10, 21), rand.randint(0, 99999)))
+            if rand.random() < 0.2:
+                line.append("10.{}.{}.{}:{}".format(page % 250, rand.randint(0, 254), rand.randint(0, 254), rand.randint(1, 65535)))
+            if rand.random() < 0.1:
+                line.append("C:\\Users\\Public\\file{}.exe".format(rand.randint(0, 1000)))
+            if rand.random() < 0.1:
+                line.append("T1{:03d}".format(rand.randint(0, 999)))
+            lines.append(" ".join(line))
+        if page % 4 == 3:
+            lines.append("rule page_{} {{\n strings:\n $a = \"x{}\"".format(page, page))
+            text.append("\n".join(lines) + "\n\f condition:\n $a\n}\n")
+        else:
+            lines.append("CVE-2021-{:05d}".format(page))
+            text.append("\n".join(lines) + "\n\f")
+    return "".join(text)
+
+def generate_threat_report(pages, seed):
+    '''
+    generate_threat_report will generate the text of a report with IoC's of ioc_finder
+        and the extensions in the first and last line of every page and yara-rules
+        which span over page breaks.
+    '''
+    rand = random.Random(seed)
+    words = ["the", "actor", "used", "server", "payload", "was", "observed", "on", "host"]
+    text = []
+    for page in range(pages):
+        lines = ["Contact {}.{}.{}.{} at evil{}.com".format(rand.randint(1, 223), rand.randint(0, 254), rand.randint(0, 254), page + 1, page)]
+        for _ in range(rand.randint(3, 8)):
+            line = [rand.choice(words) for _ in range(rand.randint(3, 10))]
+            line.append(rand.choice([
+                "CVE-20{:02d}-{:05d}".format(rand.randint(10, 21), rand.randint(0, 99999)),
+                "http://bad{}.example.org/path/{}.php".format(page, rand.randint(0, 99)),
+                "{:032x}".format(rand.getrandbits(128)),
+                "{:064x}".format(rand.getrandbits(256)),
+                "mail{}@phish{}.net".format(rand.randint(0, 9), page),
+                "AR21-{:03d}A".format(rand.randint(0, 999)),
+                "T1{:03d}".format(rand.randint(0, 999)),
+            ]))
+            lines.append(" ".join(line))
+        if page % 3 == 2:
+            lines.append("rule page_{} {{\n    strings:\n        $a = \"x{}\"".format(page, page))
+            text.append("\n".join(lines) + "\n\f    condition:\n        $a\n}\n")
+        else:
+            lines.append("last line CVE-2021-{:05d} and 10.0.{}.1".format(page, page))
+            text.append("\n".join(lines) + "\n\f")
+    return "".join(text)
+
+class ChunkingTests(TestCase):
+    '''
+    Tests for the chunked scanning of reports.
+    '''
+
+    def assertSameFindings(self, expected, actual):
+        '''
+        assertSameFindings will compare two dicts with findings regardless of the order.
+        '''
+        self.assertEqual(set(expected.keys()), set(actual.keys()))
+        for key, value in expected.items():
+            if isinstance(value, dict):
+                self.assertSameFindings(value, actual[key])
+            else:
+                self.assertEqual(set(value), set(actual[key]), key)
+
+    def test_split_pages_keeps_text(self):
+        '''
+        Test to check if the pages joined together are the text again.
+        '''
+        text = generate_report(12, 1)
+        self.assertEqual("".join(split_pages(text)), text)
+        self.assertEqual(len(split_pages(text)), text.count("\f") + (0 if text.endswith("\f") else 1))
+        self.assertEqual(split_pages("a\fb"), ["a\f", "b"])
+
+    def test_chunks_start_at_page_boundaries(self):
+        '''
+        Test to check if every chunk starts with a page and overlaps the next chunk.
+        '''
+        text = generate_report(20, 2)
+        pages = split_pages(text)
+        chunks = build_chunks(text, 3, 200)
+        self.assertEqual(len(chunks), 7)
+        for index, chunk in enumerate(chunks):
+            self.assertTrue(chunk.startswith(pages[index * 3]))
+            if index < len(chunks) - 1:
+                self.assertTrue(chunk.startswith("".join(pages[index * 3:index * 3 + 3])))
+                self.assertGreater(len(chunk), len("".join(pages[index * 3:index * 3 + 3])))
+        self.assertTrue(chunks[-1].endswith(pages[-1]))
+
+    def test_chunked_scan_is_identical_to_full_scan(self):
+        '''
+        Test to check if the chunked scan finds exactly the IoC's of a scan over the
+            whole text for different chunk sizes.
+        '''
+        for seed in range(5):
+            text = generate_report(40, seed)
+            expected = scan(text)
+            for pages_per_chunk in [1, 2, 3, 7, 25, 40, 100]:
+                self.assertSameFindings(expected, scan_chunked(text, scan, pages_per_chunk, 512))
+
+    def test_chunked_scan_text_is_identical_to_full_scan(self):
+        '''
+        Test to check if the chunked scan with ioc_finder, the yara-rule extraction and
+            all shipped extensions finds exactly the IoC's of a scan over the whole text,
+            including the yara-rules which span over the borders of the chunks.
+        '''
+        scan_report = partial(scan_text, scanner=ExtensionScanner(load_test_extensions(), "testing"), servicename="testing")
+        text = generate_threat_report(6, 7)
+        expected = scan_report(text)
+        self.assertEqual(len(expected['yara_rules']), 2)
+        self.assertGreater(len(expected['cves']), 0)
+        self.assertGreater(len(expected['analysisreport']), 0)
+        for pages_per_chunk in [1, 3]:
+            self.assertSameFindings(expected, scan_chunked(text, scan_report, pages_per_chunk, 512))
+
+    def test_match_across_page_break_needs_overlap(self):
+        '''
+        Test to check if a match which spans over a page break is found with an overlap
+            window and missed without one.
+        '''
+        text = "intro\nrule spanning {\n $a = \"x\"\n\f condition:\n $a\n}\nend\f"
+        self.assertEqual(scan_chunked(text, scan, 1, 64)['yara_rules'], scan(text)['yara_rules'])
+        self.assertEqual(scan_chunked(text, scan, 1, 0)['yara_rules'], [])
+
+    def test_merge_findings(self):
+        '''
+        Test to check if findings of chunks are merged without duplicates.
+        '''
+        merged = merge_findings([
+            {"ipv4s": ["1.1.1.1", "2.2.2.2"], "attack_tactics": {"enterprise": ["TA0001"]}, "input_filename": "a"},
+            {"ipv4s": ["2.2.2.2", "3.3.3.3"], "attack_tactics": {"enterprise": ["TA0001", "TA0002"]}, "cves": []},
+        ])
+        self.assertEqual(merged, {
+            "ipv4s": ["1.1.1.1", "2.2.2.2", "3.3.3.3"],
+            "attack_tactics": {"enterprise": ["TA0001", "TA0002"]},
+            "input_filename": "a",
+            "cves": []
+        })
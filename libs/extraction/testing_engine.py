@@ -0,0 +1,109 @@
+'''
+Tests for engine.py
+'''
+
+import os
+import time
+
+from threading import Thread
+from unittest import TestCase
+from unittest import mock
+
+from libs.extraction.backends import BACKENDS
+from libs.extraction.backends import TextBackend
+from libs.extraction.engine import ExtractionEngine
+from libs.extraction.engine import ExtractionError
+
+class StubBackend(TextBackend):
+    '''
+    StubBackend will behave by the name of the PDF-File: hang.pdf never returns,
+        memory.pdf allocates more than the memory limit and slow.pdf takes a second.
+    '''
+
+    name = "testing"
+
+    def extract(self, reportpath):
+        '''
+        extract will return a short text after the behaviour of the PDF-File.
+        '''
+        name = os.path.basename(reportpath)
+        if name.startswith("hang"):
+            time.sleep(60)
+        elif name.startswith("memory"):
+            return str(bytearray(1024 * 1024 * 1024))
+        elif name.startswith("slow"):
+            time.sleep(1)
+        return "The actor used the server 10.0.0.1 against {}.\f".format(name)
+
+
+class ExtractionEngineTests(TestCase):
+    '''
+    Tests for the watchdog of the extraction engine.
+    '''
+
+    def setUp(self):
+        '''
+        setUp will register the stub backend, so the forked workers use it.
+        '''
+        patcher = mock.patch.dict(BACKENDS, {StubBackend.name: StubBackend})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def extract_all(self, engine, names):
+        '''
+        extract_all will extract reports at the same time, like the workers of the server.
+        @param engine will be the ExtractionEngine.
+        @param names will be the names of the reports.
+        @return a dict in the format {name: result or ExtractionError}.
+        '''
+        results = {}
+        def extract(name):
+            try:
+                results[name] = engine.extract(name)
+            except ExtractionError as error:
+                results[name] = error
+        threads = [Thread(target=extract, args=(name,)) for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(30)
+        return results
+
+    def test_hanging_report_is_killed(self):
+        '''
+        Test to check if a hanging report is stopped after the timeout and the other
+            reports of the killed pool are extracted again.
+        '''
+        engine = ExtractionEngine("testing", workers=2, backend=StubBackend.name, timeout=2)
+        self.addCleanup(engine.shutdown)
+        start = time.monotonic()
+        results = self.extract_all(engine, ["hang.pdf", "slow.pdf", "good.pdf"])
+        self.assertLess(time.monotonic() - start, 20)
+        self.assertIsInstance(results["hang.pdf"], ExtractionError)
+        self.assertIn("10.0.0.1", results["slow.pdf"]["findings"]["ipv4s"])
+        self.assertIn("10.0.0.1", results["good.pdf"]["findings"]["ipv4s"])
+        self.assertEqual(engine.stats()["timeouts"], 1)
+
+    def test_memory_limit(self):
+        '''
+        Test to check if a report above the memory limit fails with an ExtractionError.
+        '''
+        engine = ExtractionEngine("testing", workers=1, backend=StubBackend.name, memory_limit=768 * 1024 * 1024)
+        self.addCleanup(engine.shutdown)
+        results = self.extract_all(engine, ["memory.pdf"])
+        self.assertIsInstance(results["memory.pdf"], ExtractionError)
+        self.assertEqual(engine.stats()["memory_errors"], 1)
+        self.assertIn("10.0.0.1", engine.extract("good.pdf")["findings"]["ipv4s"])
+
+    def test_waiting_in_the_pool_does_not_count(self):
+        '''
+        Test to check if the timeout starts in the worker, so reports which wait behind
+            others in the pool are not stopped.
+        '''
+        engine = ExtractionEngine("testing", workers=1, backend=StubBackend.name, timeout=1.8)
+        self.addCleanup(engine.shutdown)
+        names = ["slow{}.pdf".format(index) for index in range(4)]
+        results = self.extract_all(engine, names)
+        for name in names:
+            self.assertIn("10.0.0.1", results[name]["findings"]["ipv4s"])
+        self.assertEqual(engine.stats()["timeouts"], 0)
@@ -0,0 +1,68 @@
+'''
+Tests for workqueue.py
+'''
+
+from threading import Thread
+from unittest import TestCase
+
+from libs.extraction.workqueue import WorkQueue
+
+class WorkQueueTests(TestCase):
+    '''
+    Tests for the bounded work queue.
+    '''
+
+    def test_claim_and_ack(self):
+        '''
+        Test to check if an item is known from put until ack, so a pending or claimed
+            report is not enqueued a second time.
+        '''
+        queue = WorkQueue(maxsize=10)
+        self.assertTrue(queue.put("a.pdf"))
+        self.assertFalse(queue.put("a.pdf"))
+        self.assertEqual(queue.claim(timeout=0), "a.pdf")
+        self.assertIn("a.pdf", queue)
+        self.assertFalse(queue.put("a.pdf"))
+        self.assertEqual(queue.stats(), {"pending": 0, "claimed": 1})
+        queue.ack("a.pdf")
+        self.assertNotIn("a.pdf", queue)
+        self.assertEqual(queue.stats(), {"pending": 0, "claimed": 0})
+        self.assertTrue(queue.put("a.pdf"))
+
+    def test_release_requeues_in_front(self):
+        '''
+        Test to check if a released item is claimed again before the other items and
+            an unclaimed item can not be released.
+        '''
+        queue = WorkQueue(maxsize=10)
+        for item in ["a.pdf", "b.pdf", "c.pdf"]:
+            queue.put(item)
+        self.assertEqual(queue.claim(timeout=0), "a.pdf")
+        self.assertEqual(queue.claim(timeout=0), "b.pdf")
+        queue.release("b.pdf")
+        queue.release("d.pdf")
+        self.assertEqual(queue.stats(), {"pending": 2, "claimed": 1})
+        self.assertEqual(queue.claim(timeout=0), "b.pdf")
+        self.assertEqual(queue.claim(timeout=0), "c.pdf")
+        self.assertIsNone(queue.claim(timeout=0.01))
+
+    def test_bounded_and_concurrent_claims(self):
+        '''
+        Test to check if the queue refuses items above maxsize and concurrent workers
+            claim every item exactly once.
+        '''
+        queue = WorkQueue(maxsize=100)
+        self.assertTrue(all(queue.put(index) for index in range(100)))
+        self.assertFalse(queue.put(100))
+        claimed = []
+        def worker():
+            while (item := queue.claim(timeout=0.05)) is not None:
+                claimed.append(item)
+                queue.ack(item)
+        threads = [Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), list(range(100)))
+        self.assertEqual(queue.stats(), {"pending": 0, "claimed": 0})
@@ -0,0 +1,100 @@
+'''
+This script contains an inotify based watcher for the reports folder.
+'''
+
+import os
+import ctypes
+import ctypes.util
+import select
+import struct
+
+from threading import Thread
+
+from libs.kafka.logging import LogMessage
+
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+
+EVENT_STRUCT = struct.Struct('iIII')
+BUFFER_SIZE = 64 * (EVENT_STRUCT.size + 256)
+
+class DirectoryWatcher():
+    '''
+    DirectoryWatcher will watch a folder for files which are moved into it. Writers
+        have to create a file under a temporary name and rename it into the folder
+        after the last write, so only complete files will be reported.
+    '''
+
+    def __init__(self, path, callback, servicename):
+        '''
+        CTor of the DirectoryWatcher-class.
+        @param path will be the folder to watch.
+        @param callback will be a function which gets called with the path of every
+            file moved into the folder.
+        @param servicename will be the name of the calling service.
+        '''
+        self.path = path
+        self.callback = callback
+        self.servicename = servicename
+        self.__fd = None
+        self.__running = False
+
+    def start(self):
+        '''
+        start will register the inotify watch and start a daemon thread which reads
+            the events.
+        @return a boolean indicating whether or not the watcher is running.
+        '''
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            if (fd := libc.inotify_init1(IN_CLOEXEC)) < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            if libc.inotify_add_watch(fd, os.fsencode(self.path), IN_MOVED_TO) < 0:
+                errno = ctypes.get_errno()
+                os.close(fd)
+                raise OSError(errno, "inotify_add_watch failed for {}".format(self.path))
+            self.__fd = fd
+            self.__running = True
+            Thread(target=self.__read_events, daemon=True).start()
+        except Exception as error:
+            LogMessage("Cannot watch {}: {}".format(self.path, error), LogMessage.LogTyp.WARNING, self.servicename).log()
+        return self.__running
+
+    def stop(self):
+        '''
+        stop will stop the watcher and close the inotify handle.
+        '''
+        self.__running = False
+
+    def __read_events(self):
+        '''
+        __read_events will read the inotify events and hand every moved file over
+            to the callback.
+        '''
+        try:
+            while self.__running:
+                readable, _, _ = select.select([self.__fd], [], [], 1.0)
+                if not readable:
+                    continue
+                buffer = os.read(self.__fd, BUFFER_SIZE)
+                offset = 0
+                while offset + EVENT_STRUCT.size <= len(buffer):
+                    _, mask, _, length = EVENT_STRUCT.unpack_from(buffer, offset)
+                    name = buffer[offset + EVENT_STRUCT.size:offset + EVENT_STRUCT.size + length].rstrip(b'\0')
+                    offset += EVENT_STRUCT.size + length
+                    if mask & IN_Q_OVERFLOW:
+                        LogMessage("inotify queue overflowed for {}".format(self.path), LogMessage.LogTyp.WARNING, self.servicename).log()
+                    elif mask & IN_IGNORED:
+                        self.__running = False
+                    elif mask & IN_MOVED_TO and len(name) > 0:
+                        try:
+                            self.callback(os.path.join(self.path, os.fsdecode(name)))
+                        except Exception as error:
+                            LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+        finally:
+            os.close(self.__fd)
+            self.__running = False
@@ -0,0 +1,92 @@
+'''
+This script contains a bounded work queue with claim/ack semantics.
+'''
+
+from collections import deque
+from threading import Condition
+
+class WorkQueue():
+    '''
+    WorkQueue will be a bounded in-process queue for work items like paths of reports.
+        An item is known to the queue from put until ack, so an item which is pending
+        or claimed by a worker can not be added a second time. The queue itself is not
+        persisted, the reports stay in the reports folder until they are acknowledged
+        and will be enqueued again after a restart.
+    '''
+
+    def __init__(self, maxsize=1000):
+        '''
+        CTor of the WorkQueue-class.
+        @param maxsize will be the maximum number of pending items.
+        '''
+        self.maxsize = max(1, int(maxsize))
+        self.__pending = deque()
+        self.__claimed = set()
+        self.__known = set()
+        self.__condition = Condition()
+
+    def put(self, item):
+        '''
+        put will add an item to the queue incase it is not pending or claimed already.
+        @param item will be the item to add.
+        @return a boolean indicating whether or not the item has been added.
+        '''
+        with self.__condition:
+            if item in self.__known or len(self.__pending) >= self.maxsize:
+                return False
+            self.__known.add(item)
+            self.__pending.append(item)
+            self.__condition.notify()
+            return True
+
+    def claim(self, timeout=None):
+        '''
+        claim will take the next pending item. The item stays known to the queue
+            until ack or release is called for it.
+        @param timeout will be the time in seconds to wait for an item. None will
+            wait forever.
+        @return the claimed item or None incase the timeout has expired.
+        '''
+        with self.__condition:
+            if not self.__condition.wait_for(lambda: len(self.__pending) > 0, timeout=timeout):
+                return None
+            item = self.__pending.popleft()
+            self.__claimed.add(item)
+            return item
+
+    def ack(self, item):
+        '''
+        ack will mark a claimed item as done and remove it from the queue.
+        @param item will be the claimed item.
+        '''
+        with self.__condition:
+            self.__claimed.discard(item)
+            self.__known.discard(item)
+
+    def release(self, item):
+        '''
+        release will put a claimed item back to the front of the queue, so it can
+            be claimed again.
+        @param item will be the claimed item.
+        '''
+        with self.__condition:
+            if item in self.__claimed:
+                self.__claimed.discard(item)
+                self.__pending.appendleft(item)
+                self.__condition.notify()
+
+    def __contains__(self, item):
+        '''
+        __contains__ will return a boolean indicating whether or not the item is
+            pending or claimed.
+        '''
+        with self.__condition:
+            return item in self.__known
+
+    def stats(self):
+        '''
+        stats will return the number of pending and claimed items.
+        @return a dict in the format {"pending": 0, "claimed": 0}.
+        '''
+        with self.__condition:
+            return {"pending": len(self.__pending), "claimed": len(self.__claimed)}
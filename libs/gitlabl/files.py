@@ -25,3 +25,26 @@ def read_file_from_gitlab(gitlabserver, token, repository, file, servicename, br
     except Exception as error:
         LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
     return file_content
+
+def get_file_revision(gitlabserver, token, repository, file, servicename, branch_name=""):
+    '''
+    get_file_revision will return the id of the last commit which changed a file. It
+        is a cheap way to check if a file changed without downloading it.
+    @param gitlabserver will be the address of the gitlab entdpoint.
+    @parma token will be the access-token for gitlab.
+    @param repository will be the name of the repository.
+    @param file with be a path in on a branch. The branch will be the dailybranch by default.
+    @param servicename will be the name of the service calling this function.
+    @return the commit id as string, incase of an error an empty string.
+    '''
+    revision = ""
+    try:
+        if branch_name == "":
+            branch_name = get_branch_name()
+        gprojects = get_project_handle(gitlabserver, token, repository, servicename)
+        commits = gprojects.commits.list(ref_name=branch_name, path=file, per_page=1, page=1)
+        if len(commits) > 0:
+            revision = commits[0].id
+    except Exception as error:
+        LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+    return revision
@@ -11,6 +11,8 @@ import gitlab
 
 from libs.kafka.logging import LogMessage
 
+# Ids of the projects by (gitlabserver, projectname), so the projects are listed only once.
+PROJECT_IDS = {}
 
 def create_repository_if_not_exists(gitlabserver, token, repository, servicename):
     '''
@@ -80,7 +82,8 @@ def get_branch_name():
 def get_project_handle(gitlabserver, token, repository, servicename):
     '''
     get_project_handle will return a handle to a project, in order
-        to work on a project. Like creating files, issues, etc.
+        to work on a project. Like creating files, issues, etc. The id of the
+        project is cached after the first lookup.
     @param gitlabserver will be the address of the gitlab entdpoint.
     @parma token will be the access-token for gitlab.
     @param repository will be the name of the repository.
@@ -89,8 +92,15 @@ def get_project_handle(gitlabserver, token, repository, servicename):
     gprojects = None
     try:
         if (gitlab_instance := gitlab.Gitlab(gitlabserver, token)) is not None:
-            if (projectid := get_projectid_by_name(gitlab_instance, repository, servicename)) is not None:
-                gprojects = gitlab_instance.projects.get(projectid)
+            if (projectid := PROJECT_IDS.get((gitlabserver, repository))) is None:
+                projectid = get_projectid_by_name(gitlab_instance, repository, servicename)
+            if projectid is not None:
+                try:
+                    gprojects = gitlab_instance.projects.get(projectid)
+                    PROJECT_IDS[(gitlabserver, repository)] = projectid
+                except Exception:
+                    PROJECT_IDS.pop((gitlabserver, repository), None)
+                    raise
     except Exception as error:
         LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
     return gprojects
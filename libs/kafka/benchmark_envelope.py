@@ -0,0 +1,77 @@
+'''
+Benchmark for the message envelope. It compares the size on the wire and the time to
+    encode and decode typical and large findings with the former JSON messages.
+
+Usage (from the iocextractor folder):
+    PYTHONPATH=.. python -m libs.kafka.benchmark_envelope
+'''
+
+import json
+import time
+import random
+
+from libs.kafka.envelope import dumps, pack, unpack, zstandard
+
+def generate(iocs, seed=0):
+    '''
+    generate will generate findings in the format of the extractor.
+    @param iocs will be the number of IoC's of every type.
+    @return the findings as dict.
+    '''
+    rand = random.Random(seed)
+    return {
+        "input_filename": "report.pdf",
+        "domains": ["host{}.example{}.com".format(index, rand.randint(0, 99)) for index in range(iocs)],
+        "ipv4s": ["{}.{}.{}.{}".format(*[rand.randint(0, 255) for _ in range(4)]) for _ in range(iocs)],
+        "urls": ["http://host{}.example.com/path/{}".format(index, rand.getrandbits(32)) for index in range(iocs)],
+        "sha256s": ["{:064x}".format(rand.getrandbits(256)) for _ in range(iocs)],
+        "yara_rules": ["rule r{} {{ strings: $a = \"{:x}\" condition: $a }}".format(index, rand.getrandbits(64)) for index in range(iocs // 10)],
+    }
+
+def measure(encode, decode, rounds):
+    '''
+    measure will time an encoder and a decoder.
+    @return a tuple in the format (bytes, encode seconds, decode seconds).
+    '''
+    start = time.perf_counter()
+    for _ in range(rounds):
+        value = encode()
+    encoded = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        decode(value)
+    decoded = (time.perf_counter() - start) / rounds
+    return len(value[0] if isinstance(value, tuple) else value), encoded, decoded
+
+def get_variants(findings):
+    '''
+    get_variants will return the encoders and decoders of the findings.
+    @param findings will be the findings as dict.
+    @return a dict in the format {name: (encode, decode)}.
+    '''
+    variants = {
+        "json indent=4": (lambda: json.dumps(findings, indent=4, sort_keys=True).encode('UTF-8'), lambda value: json.loads(value.decode('UTF-8'))),
+        "json": (lambda: json.dumps(findings).encode('UTF-8'), lambda value: json.loads(value.decode('UTF-8'))),
+        "envelope": (lambda: pack(dumps(findings), compression="none"), lambda value: json.loads(unpack(*value))),
+        "envelope gzip": (lambda: pack(dumps(findings), compression="gzip", minimum=0), lambda value: json.loads(unpack(*value))),
+    }
+    if zstandard is not None:
+        variants["envelope zstd"] = (lambda: pack(dumps(findings), compression="zstd", minimum=0), lambda value: json.loads(unpack(*value)))
+    return variants
+
+def run():
+    '''
+    run will print the results for typical and large findings.
+    '''
+    for name, iocs, rounds in (("typical", 200, 200), ("large", 20000, 5)):
+        findings = generate(iocs)
+        variants = get_variants(findings)
+        print("{} findings ({} IoC's per type)".format(name, iocs))
+        baseline = None
+        for variant, (encode, decode) in variants.items():
+            size, encoded, decoded = measure(encode, decode, rounds)
+            baseline = baseline or size
+            print("  {:<15} {:>10} bytes {:>6.1f}% encode {:>8.3f} ms decode {:>8.3f} ms".format(variant, size, 100 * size / baseline, encoded * 1000, decoded * 1000))
+
+if __name__ == "__main__":
+    run()
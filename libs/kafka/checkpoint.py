@@ -0,0 +1,122 @@
+'''
+This script contains a checkpoint store, which keeps the latest value of a KAFKA
+    topic in the memory, on the disk and in the topic itself.
+'''
+
+import os
+
+from threading import Lock
+
+from kafka.consumer import KafkaConsumer
+from kafka.structs import TopicPartition
+
+from libs.kafka.logging import LogMessage
+from libs.kafka.producer import publish
+
+class CheckpointStore():
+    '''
+    CheckpointStore will store checkpoints in a compacted KAFKA topic and in a local
+        file. The latest checkpoint is read from the memory, after a start from the
+        last offset of every partition of the topic and incase KAFKA is not reachable
+        or empty from the local file. So a lookup never depends on the length of the topic.
+    '''
+
+    def __init__(self, kafkaserver, topic, path, servicename, timeout_ms=5000):
+        '''
+        CTor of the CheckpointStore-class.
+        @param kafkaserver will be the address of the KAFKA server.
+        @param topic will be the name of the compacted topic.
+        @param path will be the path of the local checkpoint file.
+        @param servicename will be the name of the calling service.
+        @param timeout_ms will be the maximum time to read the last offsets.
+        '''
+        self.kafkaserver = kafkaserver
+        self.topic = topic
+        self.path = path
+        self.servicename = servicename
+        self.timeout_ms = timeout_ms
+        self.lock = Lock()
+        self.latest = None
+
+    def __read_topic(self):
+        '''
+        __read_topic will read the last record of every partition of the topic.
+        @return the value of the newest record as str or None if the topic is empty.
+        '''
+        consumer = KafkaConsumer(bootstrap_servers=self.kafkaserver, client_id='checkpoint', api_version=(2, 7, 0), enable_auto_commit=False)
+        try:
+            partitions = [TopicPartition(self.topic, partition) for partition in (consumer.partitions_for_topic(self.topic) or [])]
+            consumer.assign(partitions)
+            end_offsets = consumer.end_offsets(partitions)
+            if len(waiting := {partition for partition in partitions if end_offsets.get(partition, 0) > 0}) == 0:
+                return None
+            for partition in waiting:
+                consumer.seek(partition, end_offsets[partition] - 1)
+            last_records = []
+            for _ in range(max(self.timeout_ms // 500, 1)):
+                for partition, records in consumer.poll(timeout_ms=500).items():
+                    if partition in waiting and len(records) > 0:
+                        last_records.append(records[-1])
+                        waiting.discard(partition)
+                if len(waiting) == 0:
+                    break
+            if len(last_records) > 0:
+                return max(last_records, key=lambda record: record.timestamp).value.decode('UTF-8')
+            return None
+        finally:
+            consumer.close()
+
+    def __read_file(self):
+        '''
+        __read_file will read the local checkpoint file.
+        @return the checkpoint as str or None if there is no file.
+        '''
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="UTF-8") as file:
+                return file.read() or None
+        return None
+
+    def __write_file(self, value):
+        '''
+        __write_file will replace the local checkpoint file at once.
+        @param value will be the checkpoint as str.
+        '''
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = "{}.tmp".format(self.path)
+        with open(temp_path, "w", encoding="UTF-8") as file:
+            file.write(value)
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        '''
+        load will return the latest checkpoint.
+        @return the checkpoint as str or None if there is no checkpoint.
+        '''
+        with self.lock:
+            if self.latest is None:
+                try:
+                    self.latest = self.__read_topic()
+                except Exception as error:
+                    LogMessage(str(error), LogMessage.LogTyp.WARNING, self.servicename).log()
+            if self.latest is None:
+                try:
+                    self.latest = self.__read_file()
+                except Exception as error:
+                    LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+            return self.latest
+
+    def store(self, value, key):
+        '''
+        store will save a checkpoint in the memory, the local file and the topic.
+        @param value will be the checkpoint as str or bytes.
+        @param key will be the key of the checkpoint in the compacted topic.
+        '''
+        if isinstance(value, bytes):
+            value = value.decode('UTF-8')
+        with self.lock:
+            self.latest = value
+        try:
+            self.__write_file(value)
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+        publish(self.kafkaserver, self.topic, value, key=key)
@@ -0,0 +1,130 @@
+'''
+This script contains the claim-check transport. Messages above a threshold are
+    stored compressed in a content-addressed blob store, which is shared by the
+    services, and KAFKA carries only a reference with the digest.
+'''
+
+import os
+import gzip
+import json
+import time
+import hashlib
+
+from libs.core.environment import envvar
+from libs.kafka.logging import LogMessage
+
+# ENVIRONMENT-VARS
+CLAIMCHECK_PATH = envvar("CLAIMCHECK_PATH", "/app/claimcheck")
+CLAIMCHECK_THRESHOLD = int(envvar("CLAIMCHECK_THRESHOLD", str(512 * 1024)))
+CLAIMCHECK_RETENTION = int(envvar("CLAIMCHECK_RETENTION", str(7 * 24 * 3600)))
+
+REFERENCE_KEY = "claimcheck"
+
+class ClaimCheckError(Exception):
+    '''
+    ClaimCheckError will be raised if a referenced blob is missing or damaged.
+    '''
+
+
+class BlobStore():
+    '''
+    BlobStore will store gzip compressed blobs in a directory. A blob is named by the
+        SHA-256 digest of its content, so a blob is written only once.
+    '''
+
+    def __init__(self, directory, servicename):
+        '''
+        CTor of the BlobStore-class.
+        @param directory will be the directory of the blobs, shared by all services.
+        @param servicename will be the name of the calling service.
+        '''
+        self.directory = directory
+        self.servicename = servicename
+
+    def __path(self, digest):
+        '''
+        __path will return the path of a blob.
+        @param digest will be the SHA-256 digest of the blob.
+        @return the path as str.
+        '''
+        return os.path.join(self.directory, digest[:2], "{}.gz".format(digest))
+
+    def put(self, data):
+        '''
+        put will store the data unless a blob with the same digest exists. An existing
+            blob is touched instead, so expire keeps it as long as new messages
+            reference it.
+        @param data will be the content as bytes.
+        @return the SHA-256 digest of the content.
+        '''
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.__path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = "{}.{}.tmp".format(path, os.getpid())
+            with open(temp_path, "wb") as file:
+                file.write(gzip.compress(data, compresslevel=6))
+            os.replace(temp_path, path)
+        return digest
+
+    def get(self, digest):
+        '''
+        get will load a blob and verify its digest.
+        @param digest will be the SHA-256 digest of the blob.
+        @return the content as bytes.
+        '''
+        try:
+            with open(self.__path(digest), "rb") as file:
+                data = gzip.decompress(file.read())
+        except (OSError, EOFError) as error:
+            raise ClaimCheckError("Blob {} can not be read: {}".format(digest, error)) from error
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ClaimCheckError("Blob {} does not match its digest".format(digest))
+        return data
+
+    def expire(self, max_age):
+        '''
+        expire will remove all blobs which are older than max_age.
+        @param max_age will be the age in seconds.
+        @return the number of removed blobs.
+        '''
+        removed = 0
+        deadline = time.time() - max_age
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    if os.path.getmtime(path := os.path.join(root, name)) < deadline:
+                        os.remove(path)
+                        removed += 1
+                except OSError as error:
+                    LogMessage(str(error), LogMessage.LogTyp.WARNING, self.servicename).log()
+        return removed
+
+
+def check_in(payload, store, threshold=CLAIMCHECK_THRESHOLD):
+    '''
+    check_in will replace a payload above the threshold by a reference to a blob.
+    @param payload will be the message as str.
+    @param store will be the BlobStore.
+    @param threshold will be the maximum size of a message in bytes.
+    @return the message or the reference as str.
+    '''
+    data = payload.encode('UTF-8')
+    if len(data) <= threshold:
+        return payload
+    digest = store.put(data)
+    return json.dumps({REFERENCE_KEY: {"digest": digest, "size": len(data), "encoding": "gzip"}})
+
+def check_out(message, store):
+    '''
+    check_out will resolve a reference created by check_in. Other messages are
+        returned unchanged.
+    @param message will be the decoded message as dict.
+    @param store will be the BlobStore.
+    @return the message as dict.
+    '''
+    if isinstance(message, dict) and len(message) == 1 and isinstance(reference := message.get(REFERENCE_KEY), dict):
+        return json.loads(store.get(reference["digest"]).decode('UTF-8'))
+    return message
@@ -0,0 +1,212 @@
+'''
+This script contains a KAFKA consumer, which handles its records in a bounded pool
+    of threads, one record per partition at a time, and commits an offset only after
+    all records before it are handled.
+'''
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from kafka import ConsumerRebalanceListener
+from kafka.consumer import KafkaConsumer
+from kafka.structs import OffsetAndMetadata
+from kafka.structs import TopicPartition
+
+from libs.core.environment import envvar
+from libs.kafka.logging import LogMessage
+
+# ENVIRONMENT-VARS
+CONSUMER_WORKERS = int(envvar("CONSUMER_WORKERS", "4"))
+CONSUMER_BACKLOG = int(envvar("CONSUMER_BACKLOG", str(2 * CONSUMER_WORKERS)))
+
+class PartitionTracker():
+    '''
+    PartitionTracker will keep the offsets of one partition in the order they were
+        polled, so only the offsets before the first unfinished record are committed.
+        The records of the partition wait in waiting until the running one is handled.
+    '''
+
+    def __init__(self):
+        '''
+        CTor of the PartitionTracker-class.
+        '''
+        self.offsets = deque()
+        self.done = set()
+        self.waiting = deque()
+        self.busy = False
+
+    def add(self, offset):
+        '''
+        add will track a polled offset.
+        @param offset will be the offset of the record.
+        '''
+        self.offsets.append(offset)
+
+    def finish(self, offset):
+        '''
+        finish will mark an offset as handled.
+        @param offset will be the offset of the record.
+        '''
+        self.done.add(offset)
+
+    def committable(self):
+        '''
+        committable will drop the leading handled offsets.
+        @return the next offset to commit or None if the first record is unfinished.
+        '''
+        offset = None
+        while len(self.offsets) > 0 and self.offsets[0] in self.done:
+            offset = self.offsets.popleft()
+            self.done.discard(offset)
+        return offset + 1 if offset is not None else None
+
+
+class BoundedConsumer(ConsumerRebalanceListener):
+    '''
+    BoundedConsumer will consume a topic as member of a consumer group and hand every
+        record to a bounded pool of threads. The records of a partition are handled one
+        after another in the order of their offsets, different partitions run in
+        parallel. While the consumer has CONSUMER_BACKLOG unfinished records the
+        partitions are paused, so a burst waits in KAFKA instead of the memory. The
+        offsets are committed after the records are handled, a crash repeats the
+        unfinished records (at-least-once).
+    '''
+
+    def __init__(self, topic, kafkaserver, group_id, client_id, handler, servicename, workers=None, backlog=None):
+        '''
+        CTor of the BoundedConsumer-class.
+        @param topic will be the name of the KAFKA topic.
+        @param kafkaserver will be the address of the KAFKA server.
+        @param group_id will be the name of the consumer group.
+        @param client_id will be the name of the client.
+        @param handler will be a function which gets a ConsumerRecord.
+        @param servicename will be the name of the calling service.
+        @param workers will be the number of threads, by default CONSUMER_WORKERS.
+        @param backlog will be the maximum number of unfinished records, by default
+            CONSUMER_BACKLOG.
+        '''
+        self.topic = topic
+        self.kafkaserver = kafkaserver
+        self.group_id = group_id
+        self.client_id = client_id
+        self.handler = handler
+        self.servicename = servicename
+        self.workers = workers or CONSUMER_WORKERS
+        self.backlog = max(backlog or CONSUMER_BACKLOG, self.workers)
+        self.lock = Lock()
+        self.trackers = {}
+        self.consumer = None
+        self.executor = None
+        self.counters = {"handled": 0, "pending": 0, "pauses": 0, "commits": 0}
+
+    def __dispatch(self, tracker):
+        '''
+        __dispatch will hand the next waiting record of a partition to the pool, incase
+            no record of the partition is running. The lock has to be held by the caller.
+        @param tracker will be the PartitionTracker of the partition.
+        '''
+        if not tracker.busy and len(tracker.waiting) > 0:
+            tracker.busy = True
+            self.executor.submit(self.__handle, tracker, tracker.waiting.popleft())
+
+    def __handle(self, tracker, record):
+        '''
+        __handle will call the handler, mark the record as handled and start the next
+            record of its partition.
+        @param tracker will be the PartitionTracker of the partition.
+        @param record will be the ConsumerRecord.
+        '''
+        try:
+            self.handler(record)
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+        finally:
+            with self.lock:
+                tracker.finish(record.offset)
+                tracker.busy = False
+                self.counters["handled"] += 1
+                self.counters["pending"] -= 1
+                if self.trackers.get(TopicPartition(record.topic, record.partition)) is tracker:
+                    self.__dispatch(tracker)
+
+    def __commit(self):
+        '''
+        __commit will commit the offsets of all handled records, which have no
+            unfinished record before them. It runs in the polling thread.
+        '''
+        try:
+            offsets = {}
+            with self.lock:
+                for partition, tracker in self.trackers.items():
+                    if (offset := tracker.committable()) is not None:
+                        offsets[partition] = offset
+            if len(offsets) > 0:
+                self.consumer.commit({partition: OffsetAndMetadata(offset, "") for partition, offset in offsets.items()})
+                self.counters["commits"] += 1
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, self.servicename).log()
+
+    def on_partitions_revoked(self, revoked):
+        '''
+        on_partitions_revoked will commit the handled records before the partitions are
+            assigned to another member of the group. The waiting records of these
+            partitions are dropped, they are delivered to the new owner. A running
+            record may be handled twice.
+        @param revoked will be a list of TopicPartitions.
+        '''
+        self.__commit()
+        with self.lock:
+            for partition in revoked:
+                if (tracker := self.trackers.pop(partition, None)) is not None:
+                    self.counters["pending"] -= len(tracker.waiting)
+                    tracker.waiting.clear()
+
+    def on_partitions_assigned(self, assigned):
+        '''
+        on_partitions_assigned will start tracking the assigned partitions.
+        @param assigned will be a list of TopicPartitions.
+        '''
+        with self.lock:
+            for partition in assigned:
+                self.trackers.setdefault(partition, PartitionTracker())
+
+    def run(self):
+        '''
+        run will consume the topic until the process stops. It blocks the calling thread.
+        '''
+        self.consumer = KafkaConsumer(
+            bootstrap_servers=self.kafkaserver,
+            client_id=self.client_id,
+            group_id=self.group_id,
+            enable_auto_commit=False,
+            api_version=(2, 7, 0))
+        self.consumer.subscribe([self.topic], listener=self)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.client_id) as self.executor:
+            while True:
+                self.__commit()
+                with self.lock:
+                    room = self.backlog - self.counters["pending"]
+                if room <= 0:
+                    if len(self.consumer.paused()) == 0:
+                        self.counters["pauses"] += 1
+                    self.consumer.pause(*self.consumer.assignment())
+                elif len(paused := self.consumer.paused()) > 0:
+                    self.consumer.resume(*paused)
+                records = self.consumer.poll(timeout_ms=500, max_records=max(room, 1))
+                for partition, messages in records.items():
+                    with self.lock:
+                        tracker = self.trackers.setdefault(partition, PartitionTracker())
+                        for message in messages:
+                            tracker.add(message.offset)
+                            tracker.waiting.append(message)
+                            self.counters["pending"] += 1
+                        self.__dispatch(tracker)
+
+    def stats(self):
+        '''
+        stats will return the counters of the consumer.
+        @return a dict with the number of handled and pending records, pauses and commits.
+        '''
+        with self.lock:
+            return dict(self.counters)
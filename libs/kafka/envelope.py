@@ -0,0 +1,104 @@
+'''
+This script contains the envelope of the messages between the services. A message is
+    compact JSON, larger messages are compressed with zstd or gzip. The version and
+    the compression are sent in the KAFKA headers, so messages without headers are
+    read as plain JSON like before.
+'''
+
+import gzip
+import json
+
+from libs.core.environment import envvar
+from libs.kafka.producer import publish
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ENVIRONMENT-VARS
+ENVELOPE_COMPRESSION = envvar("ENVELOPE_COMPRESSION", "auto")
+ENVELOPE_COMPRESS_MIN = int(envvar("ENVELOPE_COMPRESS_MIN", "16384"))
+
+VERSION = b"1"
+VERSION_HEADER = "envelope-version"
+ENCODING_HEADER = "content-encoding"
+
+def available_compression(preferred=ENVELOPE_COMPRESSION):
+    '''
+    available_compression will return the compression which is used for new messages.
+    @param preferred will be auto, zstd, gzip or none. auto prefers zstd if the
+        zstandard package is installed.
+    @return the name of the compression.
+    '''
+    if preferred == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if preferred == "zstd" and zstandard is None:
+        return "gzip"
+    return preferred
+
+def dumps(data):
+    '''
+    dumps will serialize data into compact JSON.
+    @param data will be a dict or list.
+    @return a JSON str without whitespace.
+    '''
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+def pack(payload, compression=None, minimum=ENVELOPE_COMPRESS_MIN):
+    '''
+    pack will put a payload into an envelope.
+    @param payload will be a JSON str or bytes.
+    @param compression will be the compression, by default ENVELOPE_COMPRESSION.
+    @param minimum will be the size in bytes from which a payload is compressed.
+    @return a tuple in the format (value, headers) for the KAFKA producer.
+    '''
+    value = payload.encode('UTF-8') if isinstance(payload, str) else payload
+    encoding = available_compression(compression or ENVELOPE_COMPRESSION)
+    if len(value) < minimum or encoding == "none":
+        encoding = "identity"
+    elif encoding == "zstd":
+        value = zstandard.ZstdCompressor(level=3).compress(value)
+    else:
+        encoding = "gzip"
+        value = gzip.compress(value, compresslevel=1)
+    return value, [(VERSION_HEADER, VERSION), (ENCODING_HEADER, encoding.encode('UTF-8'))]
+
+def unpack(value, headers=None):
+    '''
+    unpack will take a payload out of an envelope. Values without headers are
+        plain JSON messages of older services.
+    @param value will be the value of the KAFKA record.
+    @param headers will be the headers of the KAFKA record.
+    @return the payload as str.
+    '''
+    encoding = dict(headers or []).get(ENCODING_HEADER, b"identity").decode('UTF-8')
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("The message is compressed with zstd, but zstandard is not installed")
+        value = zstandard.ZstdDecompressor().decompress(value)
+    elif encoding == "gzip":
+        value = gzip.decompress(value)
+    elif encoding != "identity":
+        raise ValueError("Unknown content-encoding {}".format(encoding))
+    return value.decode('UTF-8')
+
+def loads_record(record):
+    '''
+    loads_record will decode the JSON of a KAFKA record.
+    @param record will be the ConsumerRecord.
+    @return the decoded message.
+    '''
+    return json.loads(unpack(record.value, getattr(record, "headers", None)))
+
+def publish_envelope(kafkaserver, topic, payload, key=None):
+    '''
+    publish_envelope will publish a payload in an envelope.
+    @param kafkaserver will be the address of the KAFKA server.
+    @param topic will be the name of the KAFKA topic.
+    @param payload will be a JSON str.
+    @param key will be an optional key of the message.
+    @return a future of the send.
+    '''
+    value, headers = pack(payload)
+    return publish(kafkaserver, topic, value, key=key, headers=headers)
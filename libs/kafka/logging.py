@@ -2,38 +2,214 @@
 This script contains functions and classes related to logging.
 '''
 
+import os
 import json
+import time
+import atexit
 
+from collections import deque
 from datetime import datetime
+from threading import Event
+from threading import Lock
+from threading import Thread
 
 from enum import Enum
 from colorama import init as colorinit
 from termcolor import colored
-from kafka.producer import KafkaProducer
 
 from libs.core.environment import envvar
-from .topichandler import create_topic_if_not_exists
+from .producer import publish
+
+# ENVIRONMENT-VARS
+KAFKA_SERVER = envvar("KAFKA_SERVER", "0.0.0.0:9092")
+LOGGING_TOPIC = envvar("LOGGER_TOPIC", "logging")
+LOG_LEVEL = envvar("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(envvar("LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(envvar("LOG_BATCH_SIZE", "500"))
+LOG_DEDUP_SECONDS = float(envvar("LOG_DEDUP_SECONDS", "60"))
+LOG_CLOSE_TIMEOUT = float(envvar("LOG_CLOSE_TIMEOUT", "5"))
+
+LEVELS = {"INFO": 0, "WARNING": 1, "ERROR": 2}
+
+colorinit()
 
 def send_health_message(kafkaserver, topicname, servicename):
     '''
     send_health_message will send a fine to the KAFKA server
-        with the name of the service.
+        with the name of the service. The topic is created by
+        provision_topics on the start of the service.
     @param kafkaserver will be the address of the KAFKA server.
     @param topicname will be the name of the KAFKA topic.
     @param serivcename will be the name of the calling service.
     '''
     try:
-        create_topic_if_not_exists(kafkaserver, topicname)
-        producer = KafkaProducer(bootstrap_servers=kafkaserver, client_id=str(servicename), api_version=(2,7,0))
         message = json.dumps({
             "Sender": servicename,
             "Message": "Fine",
             "Time": datetime.now().strftime("%H:%M:%S")
         })
-        producer.send(topicname, message.encode('UTF-8'))
+        publish(kafkaserver, topicname, message)
     except Exception as error:
         print(error)
 
+class LogShipper():
+    '''
+    LogShipper will print and ship the log messages of a process in a background
+        thread, so logging never blocks the calling service. The messages wait in a
+        bounded queue, which drops the oldest message when it is full. Identical
+        messages are only shipped once per window, the number of repetitions is
+        shipped when the window ends.
+    '''
+
+    def __init__(self, kafkaserver, topic, maxsize, batch_size, window):
+        '''
+        CTor of the LogShipper-class.
+        @param kafkaserver will be the address of the KAFKA server.
+        @param topic will be the name of the logging topic.
+        @param maxsize will be the maximum number of waiting messages.
+        @param batch_size will be the maximum number of messages shipped at once.
+        @param window will be the number of seconds identical messages are suppressed.
+        '''
+        self.kafkaserver = kafkaserver
+        self.topic = topic
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        '''
+        reset will drop the state of the shipper. It runs in a forked child, where the
+            thread of the parent does not exist.
+        '''
+        self.lock = Lock()
+        self.wakeup = Event()
+        self.queue = deque(maxlen=self.maxsize)
+        self.repeated = {}
+        self.thread = None
+        self.counters = {"shipped": 0, "dropped": 0, "suppressed": 0}
+
+    def submit(self, logmessage):
+        '''
+        submit will queue a LogMessage unless an identical message was queued within
+            the window.
+        @param logmessage will be the LogMessage.
+        '''
+        key = (logmessage.typ, str(logmessage.message), str(logmessage.servicename))
+        now = time.monotonic()
+        with self.lock:
+            if self.thread is None:
+                self.thread = Thread(target=self.__run, daemon=True)
+                self.thread.start()
+            if (state := self.repeated.get(key)) is not None and now - state["since"] < self.window:
+                state["count"] += 1
+                self.counters["suppressed"] += 1
+                return
+            self.repeated[key] = {"since": now, "count": 0, "logmessage": logmessage}
+            self.__append(logmessage, 0)
+        self.wakeup.set()
+
+    def __append(self, logmessage, repeated):
+        '''
+        __append will add a message to the queue, a full queue drops its oldest message.
+            The lock has to be held by the caller.
+        @param logmessage will be the LogMessage.
+        @param repeated will be the number of suppressed repetitions of the message.
+        '''
+        if len(self.queue) == self.maxsize:
+            self.counters["dropped"] += 1
+        self.queue.append((logmessage, repeated))
+
+    def __expire(self, now):
+        '''
+        __expire will end the windows which are older than now and queue the number of
+            repetitions of their message.
+        @param now will be the current time.monotonic() or infinity to end all windows.
+        '''
+        with self.lock:
+            for key, state in list(self.repeated.items()):
+                if now - state["since"] >= self.window:
+                    del self.repeated[key]
+                    if state["count"] > 0:
+                        self.__append(state["logmessage"], state["count"])
+
+    def __ship(self, batch):
+        '''
+        __ship will print and publish a batch of messages. In case KAFKA is not reachable
+            the rest of the batch is dropped.
+        @param batch will be a list of tuples in the format (LogMessage, repeated).
+        '''
+        for logmessage, repeated in batch:
+            if not logmessage.mute:
+                logmessage.print_message(repeated)
+        shipped = 0
+        try:
+            for logmessage, repeated in batch:
+                publish(self.kafkaserver, self.topic, logmessage.to_json(repeated))
+                shipped += 1
+        except Exception as error:
+            print(error)
+        with self.lock:
+            self.counters["shipped"] += shipped
+            self.counters["dropped"] += len(batch) - shipped
+
+    def drain(self, deadline=None):
+        '''
+        drain will ship all queued messages.
+        @param deadline will be the time.monotonic() after which no further batch is
+            shipped or None to ship all messages.
+        '''
+        while deadline is None or time.monotonic() < deadline:
+            with self.lock:
+                batch = [self.queue.popleft() for _ in range(min(len(self.queue), self.batch_size))]
+            if len(batch) == 0:
+                break
+            self.__ship(batch)
+
+    def __run(self):
+        '''
+        __run will be the loop of the background thread.
+        '''
+        while True:
+            self.wakeup.wait(1.0)
+            self.wakeup.clear()
+            self.__expire(time.monotonic())
+            self.drain()
+
+    def close(self, timeout=LOG_CLOSE_TIMEOUT):
+        '''
+        close will ship the pending repetitions and the queued messages. It runs when
+            the process exits. A producer blocks up to a minute per message while KAFKA
+            is not reachable, so the messages are shipped in a thread of their own and
+            the messages left after the timeout are only printed and dropped.
+        @param timeout will be the maximum number of seconds to ship the messages.
+        '''
+        self.__expire(float("inf"))
+        shipping = Thread(target=self.drain, args=(time.monotonic() + timeout,), daemon=True)
+        shipping.start()
+        shipping.join(timeout)
+        with self.lock:
+            remaining = list(self.queue)
+            self.queue.clear()
+            self.counters["dropped"] += len(remaining)
+        for logmessage, repeated in remaining:
+            if not logmessage.mute:
+                logmessage.print_message(repeated)
+        if len(remaining) > 0:
+            print("{} log messages have not been shipped.".format(len(remaining)))
+
+    def stats(self):
+        '''
+        stats will return the counters of the shipper.
+        @return a dict with the number of shipped, dropped and suppressed messages.
+        '''
+        with self.lock:
+            return dict(self.counters, pending=len(self.queue))
+
+SHIPPER = LogShipper(KAFKA_SERVER, LOGGING_TOPIC, LOG_QUEUE_SIZE, LOG_BATCH_SIZE, LOG_DEDUP_SECONDS)
+os.register_at_fork(after_in_child=SHIPPER.reset)
+atexit.register(SHIPPER.close)
+
 class LogMessage():
     '''
     LogMessage will repesent a Warning, Info or Error-Log.
@@ -62,33 +238,42 @@ class LogMessage():
         self.typ = typ
         self.servicename = servicename
         self.mute = mute
-        self.kafkaserver = envvar("KAFKA_SERVER", "0.0.0.0:9092")
-        self.logging_topic = envvar("LOGGER_TOPIC", "logging")
-        colorinit()
-        create_topic_if_not_exists(self.kafkaserver, self.logging_topic)
+        self.kafkaserver = KAFKA_SERVER
+        self.logging_topic = LOGGING_TOPIC
 
-    def __json(self):
+    def to_json(self, repeated=0):
         '''
-        __json will turn an LogMessage object into json.
+        to_json will turn an LogMessage object into json.
         @param self is the LogMessage object.
+        @param repeated will be the number of suppressed repetitions of the message.
         @return json-formatted-str
         '''
-        return json.dumps({
+        message = {
             "typ": self.typ.value[2],
             "message": self.message,
             "service": self.servicename
-        })
+        }
+        if repeated > 0:
+            message["repeated"] = repeated
+        return json.dumps(message)
+
+    def print_message(self, repeated=0):
+        '''
+        print_message will print the message in the color of its type.
+        @param self is the LogMessage object.
+        @param repeated will be the number of suppressed repetitions of the message.
+        '''
+        suffix = " (repeated {} times)".format(repeated) if repeated > 0 else ""
+        print(colored("{} {}: {} - ({}){}".format(self.typ.value[1], self.typ.value[2], self.message, self.servicename, suffix), self.typ.value[0]))
 
     def log(self):
         '''
-        log will print a message given to the object and also stream it to the kafka logging topic.
+        log will hand the message to the LogShipper, which prints it and streams it to the
+            kafka logging topic in the background. Messages below LOG_LEVEL are ignored.
         @param self is the LogMessage object.
         '''
         try:
-            if not self.mute:
-                print(colored("{} {}: {} - ({})".format(self.typ.value[1], self.typ.value[2], self.message, self.servicename), self.typ.value[0]))
-            producer = KafkaProducer(bootstrap_servers=self.kafkaserver, client_id='logging', api_version=(2, 7, 0))
-            message = str(self.__json()).encode('UTF-8')
-            producer.send(self.logging_topic, message)
+            if LEVELS.get(self.typ.value[2], 0) >= LEVELS.get(LOG_LEVEL, 0):
+                SHIPPER.submit(self)
         except Exception as error:
             print(error)
@@ -0,0 +1,147 @@
+'''
+This script contains the processed-ID store of the consumers. A submission is
+    identified by the digest of its content and the name it was submitted with, so a
+    redelivered message is skipped before any expensive work is done, while a report
+    resubmitted under another name is processed as resubmission.
+'''
+
+import os
+import time
+import sqlite3
+
+from threading import Lock
+
+from libs.core.environment import envvar
+from libs.kafka.logging import LogMessage
+
+# ENVIRONMENT-VARS
+PROCESSED_RETENTION = int(envvar("PROCESSED_RETENTION", str(90 * 24 * 3600)))
+
+PENDING = 0
+DONE = 1
+
+def submission_id(report_id, name):
+    '''
+    submission_id will return the ID of a submission.
+    @param report_id will be the digest of the report or None.
+    @param name will be the name the report was submitted with, like the filename.
+    @return the ID in the format digest/name or None incase the report has no digest.
+    '''
+    if report_id is None:
+        return None
+    return "{}/{}".format(report_id, name or "")
+
+class ProcessedStore():
+    '''
+    ProcessedStore will remember the IDs of processed reports in a SQLite database. An
+        ID is claimed before a report is processed, so two workers never handle the same
+        report at once, and it is completed only after the report is processed. A failed
+        report releases its claim and is processed again by a waiting worker or on the
+        next delivery.
+    '''
+
+    def __init__(self, path, servicename, retention=PROCESSED_RETENTION):
+        '''
+        CTor of the ProcessedStore-class. Claims left over by a crash are removed.
+        @param path will be the path of the database.
+        @param servicename will be the name of the calling service.
+        @param retention will be the time in seconds an ID is remembered.
+        '''
+        self.path = path
+        self.servicename = servicename
+        self.retention = retention
+        self.lock = Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS processed (report_id TEXT PRIMARY KEY, state INTEGER NOT NULL, updated REAL NOT NULL)")
+            self.connection.execute("DELETE FROM processed WHERE state = ? OR updated < ?", (PENDING, time.time() - self.retention))
+
+    def claim(self, report_id):
+        '''
+        claim will reserve a report for the calling worker.
+        @param report_id will be the ID of the report.
+        @return True if the report has to be processed, False if it is processed
+            already or by another worker.
+        '''
+        with self.lock:
+            cursor = self.connection.execute("INSERT OR IGNORE INTO processed (report_id, state, updated) VALUES (?, ?, ?)", (report_id, PENDING, time.time()))
+            return cursor.rowcount == 1
+
+    def complete(self, report_id):
+        '''
+        complete will mark a claimed report as processed.
+        @param report_id will be the ID of the report.
+        '''
+        with self.lock:
+            self.connection.execute("UPDATE processed SET state = ?, updated = ? WHERE report_id = ?", (DONE, time.time(), report_id))
+
+    def release(self, report_id):
+        '''
+        release will remove the claim of a report which could not be processed.
+        @param report_id will be the ID of the report.
+        '''
+        with self.lock:
+            self.connection.execute("DELETE FROM processed WHERE report_id = ? AND state = ?", (report_id, PENDING))
+
+    def state(self, report_id):
+        '''
+        state will return the state of a report.
+        @param report_id will be the ID of the report.
+        @return PENDING, DONE or None incase the report is unknown.
+        '''
+        with self.lock:
+            row = self.connection.execute("SELECT state FROM processed WHERE report_id = ?", (report_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def seen(self, report_id):
+        '''
+        seen will check if a report has been processed.
+        @param report_id will be the ID of the report.
+        @return True if the report has been processed.
+        '''
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM processed WHERE report_id = ? AND state = ?", (report_id, DONE)).fetchone() is not None
+
+    def skip(self, report_id, backoff=0.1, max_backoff=5.0):
+        '''
+        skip will claim a report and log a duplicate. Incase another worker processes
+            the report right now, skip waits until that worker is done, so the message
+            is not committed before the report is processed. Messages without an ID
+            are never skipped.
+        @param report_id will be the ID of the report or None.
+        @param backoff will be the first delay in seconds between two checks.
+        @param max_backoff will be the maximum delay in seconds between two checks.
+        @return True if the report has been processed and has to be skipped.
+        '''
+        if report_id is None:
+            return False
+        delay = backoff
+        try:
+            while not self.claim(report_id):
+                if self.state(report_id) == DONE:
+                    LogMessage("The report {} has been processed already and is skipped.".format(report_id), LogMessage.LogTyp.INFO, self.servicename).log()
+                    return True
+                time.sleep(delay)
+                delay = min(delay * 2, max_backoff)
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.WARNING, self.servicename).log()
+        return False
+
+    def finish(self, report_id, success):
+        '''
+        finish will complete or release the claim of a report.
+        @param report_id will be the ID of the report or None.
+        @param success will be True if the report has been processed.
+        '''
+        if report_id is None:
+            return
+        try:
+            if success:
+                self.complete(report_id)
+            else:
+                self.release(report_id)
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.WARNING, self.servicename).log()
@@ -0,0 +1,104 @@
+'''
+This script contains a process-wide registry of KAFKA producers, so every
+    service reuses one producer per KAFKA server instead of connecting for
+    every message.
+'''
+
+import os
+import atexit
+
+from threading import Lock
+
+from kafka.producer import KafkaProducer
+
+from libs.core.environment import envvar
+
+# ENVIRONMENT-VARS
+KAFKA_LINGER_MS = int(envvar("KAFKA_LINGER_MS", "5"))
+KAFKA_BATCH_SIZE = int(envvar("KAFKA_BATCH_SIZE", "65536"))
+KAFKA_COMPRESSION = envvar("KAFKA_COMPRESSION", "gzip")
+KAFKA_CLOSE_TIMEOUT = int(envvar("KAFKA_CLOSE_TIMEOUT", "10"))
+KAFKA_CLIENT_ID = envvar("SERVICENAME", "yafra")
+
+PRODUCERS = {}
+LOCKS = {"registry": Lock()}
+# The producers of a parent process are unusable after a fork, their io-thread
+# does not exist in the child.
+OWNER = {"pid": os.getpid()}
+
+def reset_after_fork():
+    '''
+    reset_after_fork will drop the producers and the lock inherited by a forked child,
+        the lock could have been held by another thread of the parent.
+    '''
+    LOCKS["registry"] = Lock()
+    PRODUCERS.clear()
+    OWNER["pid"] = os.getpid()
+
+os.register_at_fork(after_in_child=reset_after_fork)
+
+def get_producer(kafkaserver):
+    '''
+    get_producer will return the producer of the current process for a KAFKA server
+        and create it on the first call. The producer is thread-safe.
+    @param kafkaserver will be the address of the KAFKA server.
+    @return a KafkaProducer.
+    '''
+    with LOCKS["registry"]:
+        if OWNER["pid"] != os.getpid():
+            PRODUCERS.clear()
+            OWNER["pid"] = os.getpid()
+        if (producer := PRODUCERS.get(kafkaserver)) is None:
+            producer = KafkaProducer(
+                bootstrap_servers=kafkaserver,
+                client_id=KAFKA_CLIENT_ID,
+                api_version=(2, 7, 0),
+                linger_ms=KAFKA_LINGER_MS,
+                batch_size=KAFKA_BATCH_SIZE,
+                compression_type=None if KAFKA_COMPRESSION in ("", "none") else KAFKA_COMPRESSION)
+            PRODUCERS[kafkaserver] = producer
+    return producer
+
+def publish(kafkaserver, topic, value, key=None, headers=None):
+    '''
+    publish will append a message to the batch of the shared producer. The message is
+        sent in the background, at the latest after KAFKA_LINGER_MS milliseconds.
+    @param kafkaserver will be the address of the KAFKA server.
+    @param topic will be the name of the KAFKA topic.
+    @param value will be the message as str or bytes.
+    @param key will be an optional key of the message as str or bytes.
+    @param headers will be an optional list of tuples in the format (str, bytes).
+    @return a future of the send, which resolves to the metadata of the record.
+    '''
+    if isinstance(value, str):
+        value = value.encode('UTF-8')
+    if isinstance(key, str):
+        key = key.encode('UTF-8')
+    return get_producer(kafkaserver).send(topic, value=value, key=key, headers=headers)
+
+def flush_producers(timeout=None):
+    '''
+    flush_producers will block until all buffered messages of the process are sent.
+    @param timeout will be the maximum number of seconds to wait per producer.
+    '''
+    with LOCKS["registry"]:
+        producers = list(PRODUCERS.values()) if OWNER["pid"] == os.getpid() else []
+    for producer in producers:
+        producer.flush(timeout=timeout)
+
+def close_producers(timeout=KAFKA_CLOSE_TIMEOUT):
+    '''
+    close_producers will flush and close all producers of the process. It runs when
+        the process exits.
+    @param timeout will be the maximum number of seconds to wait per producer.
+    '''
+    with LOCKS["registry"]:
+        producers = list(PRODUCERS.values()) if OWNER["pid"] == os.getpid() else []
+        PRODUCERS.clear()
+    for producer in producers:
+        try:
+            producer.close(timeout=timeout)
+        except Exception as error:
+            print(error)
+
+atexit.register(close_producers)
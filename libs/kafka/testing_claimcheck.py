@@ -0,0 +1,70 @@
+'''
+Tests for claimcheck.py
+'''
+
+import os
+import json
+import time
+import tempfile
+
+from unittest import TestCase
+
+from libs.kafka.claimcheck import BlobStore, ClaimCheckError, check_in, check_out
+
+class ClaimCheckTests(TestCase):
+    '''
+    Tests for the claim-check transport.
+    '''
+
+    def test_large_payload_is_replaced_by_reference(self):
+        '''
+        Test to check if a large payload is stored and resolved again.
+        '''
+        findings = {"input_filename": "report.pdf", "yara_rules": ["rule a { condition: true }"] * 1000}
+        with tempfile.TemporaryDirectory() as directory:
+            store = BlobStore(directory, "testing")
+            message = check_in(json.dumps(findings), store, threshold=1024)
+            self.assertLess(len(message), 1024)
+            self.assertEqual(check_out(json.loads(message), store), findings)
+
+    def test_small_payload_stays_inline(self):
+        '''
+        Test to check if a small payload is sent unchanged.
+        '''
+        findings = {"input_filename": "report.pdf", "domains": ["example.com"]}
+        with tempfile.TemporaryDirectory() as directory:
+            store = BlobStore(directory, "testing")
+            self.assertEqual(check_in(json.dumps(findings), store, threshold=1024), json.dumps(findings))
+            self.assertEqual(check_out(findings, store), findings)
+            self.assertEqual(os.listdir(directory), [])
+
+    def test_damaged_blob_is_rejected(self):
+        '''
+        Test to check if a blob which does not match its digest is rejected.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            store = BlobStore(directory, "testing")
+            digest = store.put(b"findings")
+            other = store.put(b"other findings")
+            os.replace(os.path.join(directory, other[:2], "{}.gz".format(other)), os.path.join(directory, digest[:2], "{}.gz".format(digest)))
+            with self.assertRaises(ClaimCheckError):
+                store.get(digest)
+
+    def test_referenced_blob_is_not_expired(self):
+        '''
+        Test to check if storing the same data again renews the blob, so expire does
+            not remove a blob which a new message references.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            store = BlobStore(directory, "testing")
+            digest = store.put(b"findings")
+            path = os.path.join(directory, digest[:2], "{}.gz".format(digest))
+            old = time.time() - 3600
+            os.utime(path, (old, old))
+            self.assertEqual(store.put(b"findings"), digest)
+            self.assertEqual(store.expire(60), 0)
+            self.assertEqual(store.get(digest), b"findings")
+            os.utime(path, (old, old))
+            self.assertEqual(store.expire(60), 1)
+            self.assertEqual(store.put(b"findings"), digest)
+            self.assertEqual(store.get(digest), b"findings")
@@ -0,0 +1,161 @@
+'''
+Tests for consumer.py
+'''
+
+import time
+import random
+
+from types import SimpleNamespace
+from threading import Lock
+from unittest import TestCase
+from unittest import mock
+
+from kafka.structs import TopicPartition
+
+from libs.kafka.consumer import BoundedConsumer
+from libs.kafka.consumer import PartitionTracker
+
+class StopConsuming(Exception):
+    '''
+    StopConsuming will end the loop of BoundedConsumer.run in the tests.
+    '''
+
+
+class FakeConsumer():
+    '''
+    FakeConsumer will deliver prepared batches of records like a KafkaConsumer.
+    '''
+
+    def __init__(self, batches, **kwargs):
+        '''
+        CTor of the FakeConsumer-class.
+        @param batches will be a list of dicts in the format {TopicPartition: [records]}.
+        '''
+        self.batches = list(batches)
+        self.partitions = {partition for batch in self.batches for partition in batch}
+        self.bounded = None
+        self.paused_partitions = set()
+        self.commits = []
+        self.idle = 0
+
+    def subscribe(self, topics, listener):
+        '''
+        subscribe will assign all partitions of the batches to the listener.
+        '''
+        self.bounded = listener
+        listener.on_partitions_assigned(list(self.partitions))
+
+    def assignment(self):
+        '''
+        assignment will return the assigned partitions.
+        '''
+        return set(self.partitions)
+
+    def paused(self):
+        '''
+        paused will return the paused partitions.
+        '''
+        return set(self.paused_partitions)
+
+    def pause(self, *partitions):
+        '''
+        pause will pause partitions.
+        '''
+        self.paused_partitions.update(partitions)
+
+    def resume(self, *partitions):
+        '''
+        resume will resume partitions.
+        '''
+        self.paused_partitions.difference_update(partitions)
+
+    def poll(self, timeout_ms=0, max_records=None):
+        '''
+        poll will return the next batch unless the partitions are paused. After the last
+            batch it waits for the handlers and stops the consumer after one more commit.
+        '''
+        if len(self.batches) > 0 and len(self.paused_partitions) == 0:
+            return self.batches.pop(0)
+        time.sleep(0.005)
+        if len(self.batches) == 0 and self.bounded.stats()["pending"] == 0:
+            self.idle += 1
+            if self.idle > 1:
+                raise StopConsuming()
+        return {}
+
+    def commit(self, offsets):
+        '''
+        commit will record the committed offsets.
+        '''
+        self.commits.append({partition: metadata.offset for partition, metadata in offsets.items()})
+
+class PartitionTrackerTests(TestCase):
+    '''
+    Tests for the tracking of the committable offsets.
+    '''
+
+    def test_commit_stops_at_unfinished_record(self):
+        '''
+        Test to check if only the offsets before the first unfinished record are committed.
+        '''
+        tracker = PartitionTracker()
+        for offset in range(10, 15):
+            tracker.add(offset)
+        tracker.finish(11)
+        tracker.finish(12)
+        self.assertIsNone(tracker.committable())
+        tracker.finish(10)
+        self.assertEqual(tracker.committable(), 13)
+        self.assertIsNone(tracker.committable())
+        tracker.finish(14)
+        tracker.finish(13)
+        self.assertEqual(tracker.committable(), 15)
+
+
+class BoundedConsumerTests(TestCase):
+    '''
+    Tests for the bounded consumer.
+    '''
+
+    def test_partitions_are_handled_in_order(self):
+        '''
+        Test to check if the records of a partition are handled one after another in
+            the order of their offsets, while the partitions run in parallel.
+        '''
+        rand = random.Random(3)
+        partitions = [TopicPartition("ioc", index) for index in range(3)]
+        offsets = {partition: 0 for partition in partitions}
+        batches = []
+        for _ in range(10):
+            batch = {}
+            for partition in rand.sample(partitions, 2):
+                count = rand.randint(1, 4)
+                batch[partition] = [SimpleNamespace(topic=partition.topic, partition=partition.partition, offset=offset) for offset in range(offsets[partition], offsets[partition] + count)]
+                offsets[partition] += count
+            batches.append(batch)
+        lock = Lock()
+        handled = {partition: [] for partition in partitions}
+        running = {partition: 0 for partition in partitions}
+        observed = {"collisions": 0, "parallel": 0}
+        def handler(record):
+            partition = TopicPartition(record.topic, record.partition)
+            with lock:
+                running[partition] += 1
+                observed["collisions"] += int(running[partition] > 1)
+                observed["parallel"] = max(observed["parallel"], sum(1 for value in running.values() if value > 0))
+            time.sleep(rand.random() * 0.01)
+            with lock:
+                handled[partition].append(record.offset)
+                running[partition] -= 1
+        fake = FakeConsumer(batches)
+        with mock.patch("libs.kafka.consumer.KafkaConsumer", lambda **kwargs: fake):
+            consumer = BoundedConsumer("ioc", "localhost:9092", "group", "testing", handler, "testing", workers=4, backlog=6)
+            with self.assertRaises(StopConsuming):
+                consumer.run()
+        for partition in partitions:
+            self.assertEqual(handled[partition], list(range(offsets[partition])))
+            self.assertEqual(fake.commits[-1].get(partition, offsets[partition]), offsets[partition])
+        self.assertEqual(observed["collisions"], 0)
+        self.assertGreater(observed["parallel"], 1)
+        self.assertEqual(consumer.stats()["handled"], sum(offsets.values()))
+        self.assertEqual(consumer.stats()["pending"], 0)
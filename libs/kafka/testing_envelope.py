@@ -0,0 +1,43 @@
+'''
+Tests for envelope.py
+'''
+
+import json
+
+from collections import namedtuple
+from unittest import TestCase
+
+from libs.kafka.envelope import dumps, pack, unpack, loads_record
+
+Record = namedtuple("Record", ["value", "headers"])
+
+class EnvelopeTests(TestCase):
+    '''
+    Tests for the message envelope.
+    '''
+
+    def test_large_message_is_compressed(self):
+        '''
+        Test to check if a message above the minimum is compressed and decoded again.
+        '''
+        findings = {"domains": ["host{}.example.com".format(index) for index in range(1000)]}
+        value, headers = pack(dumps(findings), compression="gzip", minimum=1024)
+        self.assertEqual(dict(headers)["content-encoding"], b"gzip")
+        self.assertLess(len(value), len(json.dumps(findings)) // 4)
+        self.assertEqual(loads_record(Record(value, headers)), findings)
+
+    def test_small_message_is_not_compressed(self):
+        '''
+        Test to check if a message below the minimum is sent as compact JSON.
+        '''
+        value, headers = pack(dumps({"domains": ["example.com"]}), compression="gzip", minimum=1024)
+        self.assertEqual(value, b'{"domains":["example.com"]}')
+        self.assertEqual(dict(headers)["content-encoding"], b"identity")
+
+    def test_plain_json_without_headers(self):
+        '''
+        Test to check if messages of older services without headers are decoded.
+        '''
+        value = json.dumps({"domains": ["example.com"]}, indent=4).encode('UTF-8')
+        self.assertEqual(loads_record(Record(value, [])), {"domains": ["example.com"]})
+        self.assertEqual(unpack(value), json.dumps({"domains": ["example.com"]}, indent=4))
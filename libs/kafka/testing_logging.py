@@ -0,0 +1,62 @@
+'''
+Tests for logging.py
+'''
+
+import json
+import time
+
+from unittest import TestCase, mock
+
+from libs.kafka.logging import LogMessage, LogShipper
+
+class LogShipperTests(TestCase):
+    '''
+    Tests for the background shipping of log messages.
+    '''
+
+    @mock.patch("libs.kafka.logging.publish")
+    def test_repeated_messages_are_suppressed(self, publish):
+        '''
+        Test to check if identical messages are shipped once and their repetitions
+            are counted.
+        '''
+        shipper = LogShipper("localhost:9092", "logging", 100, 10, 60)
+        shipper.thread = True # ship in the test instead of the background thread
+        for _ in range(50):
+            shipper.submit(LogMessage("GitLab is down", LogMessage.LogTyp.ERROR, "testing", mute=True))
+        shipper.submit(LogMessage("MISP is down", LogMessage.LogTyp.ERROR, "testing", mute=True))
+        shipper.close()
+        messages = [json.loads(call.args[2]) for call in publish.call_args_list]
+        self.assertEqual([message["message"] for message in messages], ["GitLab is down", "MISP is down", "GitLab is down"])
+        self.assertEqual(messages[2]["repeated"], 49)
+        self.assertEqual(shipper.stats()["suppressed"], 49)
+
+    @mock.patch("libs.kafka.logging.publish")
+    def test_full_queue_drops_oldest(self, publish):
+        '''
+        Test to check if a full queue drops its oldest messages.
+        '''
+        shipper = LogShipper("localhost:9092", "logging", 3, 10, 60)
+        shipper.thread = True # ship in the test instead of the background thread
+        for index in range(5):
+            shipper.submit(LogMessage("message {}".format(index), LogMessage.LogTyp.INFO, "testing", mute=True))
+        shipper.drain()
+        messages = [json.loads(call.args[2])["message"] for call in publish.call_args_list]
+        self.assertEqual(messages, ["message 2", "message 3", "message 4"])
+        self.assertEqual(shipper.stats()["dropped"], 2)
+
+    @mock.patch("libs.kafka.logging.publish")
+    def test_close_gives_up_after_timeout(self, publish):
+        '''
+        Test to check if close returns after its timeout while KAFKA is not reachable and
+            drops the messages which are left.
+        '''
+        publish.side_effect = lambda *args: time.sleep(0.5)
+        shipper = LogShipper("localhost:9092", "logging", 100, 1, 60)
+        shipper.thread = True # ship in the test instead of the background thread
+        for index in range(5):
+            shipper.submit(LogMessage("message {}".format(index), LogMessage.LogTyp.INFO, "testing", mute=True))
+        start = time.monotonic()
+        shipper.close(timeout=0.2)
+        self.assertLess(time.monotonic() - start, 0.45)
+        self.assertEqual(shipper.stats(), {"shipped": 0, "dropped": 4, "suppressed": 0, "pending": 0})
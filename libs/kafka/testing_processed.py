@@ -0,0 +1,89 @@
+'''
+Tests for processed.py
+'''
+
+import os
+import time
+import tempfile
+
+from threading import Thread
+from unittest import TestCase
+
+from libs.kafka.processed import ProcessedStore
+from libs.kafka.processed import submission_id
+
+class ProcessedStoreTests(TestCase):
+    '''
+    Tests for the processed-ID store.
+    '''
+
+    def test_report_is_processed_once(self):
+        '''
+        Test to check if a report is skipped after it has been processed and a failed
+            report is processed again.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            store = ProcessedStore(os.path.join(directory, "processed.db"), "testing")
+            self.assertFalse(store.skip("report"))
+            store.finish("report", False)
+            self.assertFalse(store.skip("report"))
+            store.finish("report", True)
+            self.assertTrue(store.seen("report"))
+            self.assertTrue(store.skip("report"))
+            self.assertFalse(store.skip(None))
+            store.connection.close()
+
+    def test_claims_of_a_crash_are_removed(self):
+        '''
+        Test to check if the claims of a crashed process are removed on the start and
+            processed reports are kept.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "processed.db")
+            store = ProcessedStore(path, "testing")
+            store.claim("pending")
+            store.claim("done")
+            store.complete("done")
+            store.connection.close()
+            store = ProcessedStore(path, "testing")
+            self.assertTrue(store.claim("pending"))
+            self.assertFalse(store.claim("done"))
+            store.connection.close()
+
+    def test_pending_report_is_waited_for(self):
+        '''
+        Test to check if a worker waits for a report another worker is processing and
+            takes it over after a failure or skips it after a success.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            store = ProcessedStore(os.path.join(directory, "processed.db"), "testing")
+            self.assertFalse(store.skip("report"))
+            results = []
+            waiting = Thread(target=lambda: results.append(store.skip("report", backoff=0.01)))
+            waiting.start()
+            time.sleep(0.05)
+            self.assertEqual(results, [])
+            store.finish("report", False)
+            waiting.join(1)
+            self.assertEqual(results, [False])
+            waiting = Thread(target=lambda: results.append(store.skip("report", backoff=0.01)))
+            waiting.start()
+            time.sleep(0.05)
+            store.finish("report", True)
+            waiting.join(1)
+            self.assertEqual(results, [False, True])
+            store.connection.close()
+
+    def test_resubmission_under_another_name(self):
+        '''
+        Test to check if the same report submitted under another name is processed,
+            while a redelivery of the same submission is skipped.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            store = ProcessedStore(os.path.join(directory, "processed.db"), "testing")
+            self.assertFalse(store.skip(submission_id("digest", "report.pdf")))
+            store.finish(submission_id("digest", "report.pdf"), True)
+            self.assertTrue(store.skip(submission_id("digest", "report.pdf")))
+            self.assertFalse(store.skip(submission_id("digest", "copy of report.pdf")))
+            self.assertIsNone(submission_id(None, "report.pdf"))
+            store.connection.close()
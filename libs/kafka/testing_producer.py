@@ -0,0 +1,78 @@
+'''
+Tests for producer.py
+'''
+
+from unittest import TestCase
+from unittest import mock
+
+from libs.kafka import producer
+
+class FakeProducer():
+    '''
+    FakeProducer will record the messages instead of sending them.
+    '''
+
+    def __init__(self, **config):
+        '''
+        CTor of the FakeProducer-class.
+        '''
+        self.config = config
+        self.messages = []
+        self.closed = False
+
+    def send(self, topic, value=None, key=None, headers=None):
+        '''
+        send will record a message.
+        '''
+        self.messages.append((topic, value, key, headers))
+
+    def flush(self, timeout=None):
+        '''
+        flush will do nothing, all messages are recorded at once.
+        '''
+
+    def close(self, timeout=None):
+        '''
+        close will mark the producer as closed.
+        '''
+        self.closed = True
+
+
+class ProducerTests(TestCase):
+    '''
+    Tests for the shared KAFKA producers.
+    '''
+
+    def setUp(self):
+        '''
+        setUp will replace the KafkaProducer and start with an empty registry.
+        '''
+        for patcher in [mock.patch.object(producer, "KafkaProducer", FakeProducer), mock.patch.dict(producer.PRODUCERS, clear=True)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_producer_is_shared(self):
+        '''
+        Test to check if all messages to a KAFKA server go through one producer and
+            are encoded.
+        '''
+        producer.publish("kafka:9092", "findings", "{}", key="report")
+        producer.publish("kafka:9092", "reports", b"{}")
+        producer.publish("other:9092", "findings", "{}")
+        self.assertEqual(len(producer.PRODUCERS), 2)
+        shared = producer.PRODUCERS["kafka:9092"]
+        self.assertEqual(shared.messages, [("findings", b"{}", b"report", None), ("reports", b"{}", None, None)])
+        self.assertEqual(shared.config["linger_ms"], producer.KAFKA_LINGER_MS)
+
+    def test_forked_child_gets_its_own_producer(self):
+        '''
+        Test to check if a child process does not reuse the producer of its parent and
+            close_producers closes every producer once.
+        '''
+        parent = producer.get_producer("kafka:9092")
+        with mock.patch.dict(producer.OWNER, {"pid": -1}):
+            child = producer.get_producer("kafka:9092")
+        self.assertIsNot(parent, child)
+        producer.close_producers(timeout=0)
+        self.assertTrue(child.closed)
+        self.assertEqual(producer.PRODUCERS, {})
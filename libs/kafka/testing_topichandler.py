@@ -0,0 +1,56 @@
+'''
+Tests for topichandler.py
+'''
+
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest import mock
+
+from libs.kafka.topichandler import compact_topics
+
+class FakeAdminClient():
+    '''
+    FakeAdminClient will answer DescribeConfigs v1 like a KAFKA broker.
+    '''
+
+    def __init__(self, topics):
+        '''
+        CTor of the FakeAdminClient-class.
+        @param topics will be a dict in the format {"topicname": {"config": (value, source)}}.
+        '''
+        self.topics = topics
+        self.altered = []
+
+    def describe_configs(self, config_resources):
+        '''
+        describe_configs will return one response with the entries of all topics.
+        '''
+        return [SimpleNamespace(resources=[
+            (0, None, resource.resource_type, resource.name, [(name, value, False, source, False, []) for name, (value, source) in self.topics[resource.name].items()])
+            for resource in config_resources
+        ])]
+
+    def alter_configs(self, config_resources):
+        '''
+        alter_configs will record the altered topics.
+        '''
+        self.altered.extend((resource.name, resource.configs) for resource in config_resources)
+
+
+class TopicHandlerTests(TestCase):
+    '''
+    Tests for the provisioning of topics.
+    '''
+
+    def test_compact_keeps_overrides(self):
+        '''
+        Test to check if only topics with another cleanup policy are altered and they
+            keep the configs which are set on the topic.
+        '''
+        admin_client = FakeAdminClient({
+            "checkpoint": {"cleanup.policy": ("compact", 1), "retention.ms": ("604800000", 5)},
+            "claims": {"cleanup.policy": ("delete", 5), "retention.ms": ("86400000", 1), "segment.bytes": ("1073741824", 4)},
+        })
+        with mock.patch("libs.kafka.topichandler.get_admin_client", return_value=admin_client):
+            compact_topics("localhost:9092", ["checkpoint", "claims"])
+        self.assertEqual(admin_client.altered, [("claims", {"retention.ms": "86400000", "cleanup.policy": "compact"})])
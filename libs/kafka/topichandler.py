@@ -2,23 +2,187 @@
 Kafka related funtions for the entire system.
 '''
 
-from kafka.consumer import KafkaConsumer
+import time
 
+from threading import Lock
+
+from kafka.admin import ConfigResource
+from kafka.admin import ConfigResourceType
 from kafka.admin import KafkaAdminClient
+from kafka.admin import NewPartitions
 from kafka.admin import NewTopic
+from kafka.errors import TopicAlreadyExistsError
+
+from libs.core.environment import envvar
+
+# ENVIRONMENT-VARS
+LOGGING_TOPIC = envvar("LOGGER_TOPIC", "logging")
+TOPIC_REFRESH_SECONDS = int(envvar("KAFKA_TOPIC_REFRESH", "300"))
+KAFKA_PARTITIONS = int(envvar("KAFKA_PARTITIONS", "6"))
 
-def create_topic_if_not_exists(kafkaserver, topicname):
+# Known topics and admin clients by KAFKA server, so the topics of the cluster are
+# only fetched after TOPIC_REFRESH_SECONDS.
+KNOWN_TOPICS = {}
+ADMIN_CLIENTS = {}
+LOCK = Lock()
+ADMIN_LOCK = Lock()
+COMPACTED = {"cleanup.policy": "compact"}
+# The config source of a topic override in DescribeConfigs v1 and newer.
+DYNAMIC_TOPIC_CONFIG = 1
+
+def get_admin_client(kafkaserver):
     '''
-    create_topic_if_not_exists will create a given topic incase it does not already exists.
+    get_admin_client will return the admin client of a KAFKA server and create it
+        on the first call.
+    @param kafkaserver will be the ip:port where the server is running.
+    @return a KafkaAdminClient.
+    '''
+    with ADMIN_LOCK:
+        if (admin_client := ADMIN_CLIENTS.get(kafkaserver)) is None:
+            admin_client = KafkaAdminClient(bootstrap_servers=kafkaserver, client_id='lib', api_version=(2, 7, 0))
+            ADMIN_CLIENTS[kafkaserver] = admin_client
+        return admin_client
+
+def known_topics(kafkaserver, refresh=False):
+    '''
+    known_topics will return the cached topics of a KAFKA server. The topics are
+        fetched again once they are older than TOPIC_REFRESH_SECONDS.
     @param kafkaserver will be the ip:port where the server is running.
+    @param refresh will force a new fetch of the topics.
+    @return a set with the names of the topics.
+    '''
+    with LOCK:
+        cached = KNOWN_TOPICS.get(kafkaserver)
+        if refresh or cached is None or time.monotonic() - cached["fetched"] > TOPIC_REFRESH_SECONDS:
+            cached = {"topics": set(get_admin_client(kafkaserver).list_topics()), "fetched": time.monotonic()}
+            KNOWN_TOPICS[kafkaserver] = cached
+        return set(cached["topics"])
+
+def create_topics_if_not_exist(kafkaserver, topicnames, num_partitions=1, topic_configs=None):
+    '''
+    create_topics_if_not_exist will create all missing topics with a single request.
+        Topics in the cache are not checked again.
+    @param kafkaserver will be the ip:port where the server is running.
+    @param topicnames will be a list with the names of the topics.
+    @param num_partitions will be the number of partitions of a topic as int or as
+        dict in the format {"topicname": num_partitions}, missing topics get one.
+    @param topic_configs will be a dict in the format {"topicname": {"config": "value"}}.
+    '''
+    try:
+        if len(missing := set(topicnames) - known_topics(kafkaserver)) > 0:
+            if len(missing := missing - known_topics(kafkaserver, refresh=True)) > 0:
+                topic_list = [NewTopic(name=topicname, num_partitions=partitions_of(topicname, num_partitions), replication_factor=1, topic_configs=(topic_configs or {}).get(topicname, {})) for topicname in sorted(missing)]
+                try:
+                    get_admin_client(kafkaserver).create_topics(new_topics=topic_list, validate_only=False)
+                except TopicAlreadyExistsError:
+                    pass
+                with LOCK:
+                    KNOWN_TOPICS[kafkaserver]["topics"].update(missing)
+                print("[+] Created new topics. Names: {}".format(", ".join(sorted(missing))))
+    except Exception as error:
+        print(error)
+
+def partitions_of(topicname, num_partitions):
+    '''
+    partitions_of will return the number of partitions of a topic.
     @param topicname will be the name of the topic.
+    @param num_partitions will be an int or a dict in the format {"topicname": num_partitions}.
+    @return the number of partitions as int.
+    '''
+    if isinstance(num_partitions, dict):
+        return num_partitions.get(topicname, 1)
+    return num_partitions
+
+def add_partitions_if_needed(kafkaserver, num_partitions):
+    '''
+    add_partitions_if_needed will raise the number of partitions of existing topics.
+        The number of partitions is never reduced.
+    @param kafkaserver will be the ip:port where the server is running.
+    @param num_partitions will be a dict in the format {"topicname": num_partitions}.
     '''
     try:
-        consumer = KafkaConsumer(bootstrap_servers=kafkaserver, group_id='libary')
-        if (topics := consumer.topics()) is not None and not topicname in topics:
-            admin_client = KafkaAdminClient(bootstrap_servers=kafkaserver, client_id='lib', api_version=(2, 7, 0))
-            topic_list = [NewTopic(name=topicname, num_partitions=1, replication_factor=1)]
-            admin_client.create_topics(new_topics=topic_list, validate_only=False)
-            print("[+] Created a new topic. Name: {}".format(topicname))
+        admin_client = get_admin_client(kafkaserver)
+        new_partitions = {}
+        for topic in admin_client.describe_topics(list(num_partitions)):
+            if topic.get("error_code", 0) == 0 and len(topic["partitions"]) < num_partitions[topic["topic"]]:
+                new_partitions[topic["topic"]] = NewPartitions(total_count=num_partitions[topic["topic"]])
+        if len(new_partitions) > 0:
+            admin_client.create_partitions(new_partitions)
+            print("[+] Added partitions. Topics: {}".format(", ".join(sorted(new_partitions))))
+    except Exception as error:
+        print(error)
+
+def describe_topic_configs(admin_client, topicnames):
+    '''
+    describe_topic_configs will fetch the configs of topics.
+    @param admin_client will be a KafkaAdminClient.
+    @param topicnames will be a list with the names of the topics.
+    @return a dict in the format {"topicname": (configs, overrides)}. configs holds the
+        value of every config, overrides only the configs which are set on the topic.
+    '''
+    described = {}
+    for response in admin_client.describe_configs([ConfigResource(ConfigResourceType.TOPIC, topicname) for topicname in topicnames]):
+        for error_code, _, _, topicname, entries in response.resources:
+            if error_code != 0:
+                continue
+            configs, overrides = {}, {}
+            for entry in entries:
+                name, value, read_only = entry[0], entry[1], entry[2]
+                configs[name] = value
+                # v0 has the flag is_default, v1 and newer the config source.
+                if not read_only and value is not None and (entry[3] == DYNAMIC_TOPIC_CONFIG if len(entry) > 5 else not entry[3]):
+                    overrides[name] = value
+            described[topicname] = (configs, overrides)
+    return described
+
+def compact_topics(kafkaserver, topicnames):
+    '''
+    compact_topics will set the cleanup policy of existing topics to compact, so
+        KAFKA keeps only the latest message of every key. AlterConfigs replaces all
+        configs of a topic, so only topics with another policy are altered and they
+        keep their other configs.
+    @param kafkaserver will be the ip:port where the server is running.
+    @param topicnames will be a list with the names of the topics.
+    '''
+    try:
+        admin_client = get_admin_client(kafkaserver)
+        resources = [
+            ConfigResource(ConfigResourceType.TOPIC, topicname, configs=dict(overrides, **COMPACTED))
+            for topicname, (configs, overrides) in sorted(describe_topic_configs(admin_client, topicnames).items())
+            if configs.get("cleanup.policy") != COMPACTED["cleanup.policy"]
+        ]
+        if len(resources) > 0:
+            admin_client.alter_configs(resources)
+            print("[+] Compacted topics. Names: {}".format(", ".join(resource.name for resource in resources)))
     except Exception as error:
         print(error)
+
+def create_topic_if_not_exists(kafkaserver, topicname, num_partitions=1):
+    '''
+    create_topic_if_not_exists will create a given topic incase it does not already exists.
+    @param kafkaserver will be the ip:port where the server is running.
+    @param topicname will be the name of the topic.
+    @param num_partitions will be the number of partitions of the topic.
+    '''
+    create_topics_if_not_exist(kafkaserver, [topicname], num_partitions)
+
+def provision_topics(kafkaserver, topicnames, partitioned=(), compacted=()):
+    '''
+    provision_topics will create the topics of a service and the logging topic once on
+        the start of the service, so logging and health messages never have to check
+        their topics. The partitioned topics get KAFKA_PARTITIONS partitions, so the
+        consumers of a group can share their messages.
+    @param kafkaserver will be the ip:port where the server is running.
+    @param topicnames will be a list with the names of the topics of the service.
+    @param partitioned will be a list with the names of the topics which are shared
+        by the replicas of a consumer group.
+    @param compacted will be a list with the names of the topics which keep only the
+        latest message of every key.
+    '''
+    num_partitions = {topicname: KAFKA_PARTITIONS for topicname in partitioned}
+    topic_configs = {topicname: COMPACTED for topicname in compacted}
+    create_topics_if_not_exist(kafkaserver, list(topicnames) + list(partitioned) + list(compacted) + [LOGGING_TOPIC], num_partitions, topic_configs)
+    if len(num_partitions) > 0:
+        add_partitions_if_needed(kafkaserver, num_partitions)
+    if len(topic_configs) > 0:
+        compact_topics(kafkaserver, list(topic_configs))
@@ -125,22 +125,41 @@ def traverse(inp, elements={}, servicename=""):
         LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
     return elements
 
-def convert_markdown_to_json(filecontent, filename, servicename):
+def convert_markdown_to_dict(filecontent, filename, servicename, report_id=None):
     '''
-    convert_markdown_to_json will convert a given markdown-file into
-        a JSON-Serialized-Object.
+    convert_markdown_to_dict will convert a given markdown-file into
+        a dict.
     @param filecontent will be the content of the file/markdown to
         parse and convert.
-    @return will return a json-object.
+    @param report_id will be the optional ID of the report, which is added
+        to the dict.
+    @return will return a dict or None incase of an error.
     '''
-    json_data = None
+    data = None
     try:
         disallowed_sections = ['Overview', 'Table of content', 'Mitre Att&ck']
         file_content = parse_string(filecontent)
         file_content = list(filter(lambda x: x.text not in disallowed_sections, file_content.children))
         data = {"data": traverse(file_content, {}, servicename), "Eventname": filename}
-        if data is not None and len(data) > 0:
-            json_data = json.dumps(data, indent=4, sort_keys=True)
+        if report_id is not None:
+            data["report_id"] = report_id
+    except Exception as error:
+        LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+    return data
+
+def convert_markdown_to_json(filecontent, filename, servicename, report_id=None):
+    '''
+    convert_markdown_to_json will convert a given markdown-file into
+        a compact JSON-Serialized-Object.
+    @param filecontent will be the content of the file/markdown to
+        parse and convert.
+    @param report_id will be the optional ID of the report.
+    @return will return a json-object.
+    '''
+    json_data = None
+    try:
+        if (data := convert_markdown_to_dict(filecontent, filename, servicename, report_id)) is not None and len(data) > 0:
+            json_data = json.dumps(data, sort_keys=True, separators=(",", ":"))
     except Exception as error:
         LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
     return json_data
@@ -10,14 +10,16 @@ def get_appearance_in_misp(misp_handle, target, servicename):
     @param misp_handle will be a handle to the misp platform.
     @param target will be the value to search for.
     @param servicename will be the name of the calling service.
-    @return a string will all findings.
+    @return a string will all findings or None incase the search failed.
     '''
-    appearance = ""
+    appearance = None
     try:
         appearance = misp_handle.search('events', 'json', value=target)
         if appearance is not None:
             appearance = [element['Event']['id'] for element in appearance]
             appearance = ", ".join(appearance)
+        else:
+            appearance = ""
     except Exception as error:
         LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
     return appearance
@@ -1,11 +1,11 @@
 '''
 This file contains functions to generate data in for mitre tactics
-and techniques on an enterprise level.
+and techniques on an enterprise level. The information is taken
+from the index of the process, see index.py.
 '''
 
-from pyattck import Attck
-
 from libs.kafka.logging import LogMessage
+from libs.mitre.index import get_mitre_index
 
 def get_mitre_information_tactics_enterpise(tactic_list, servicename):
     '''
@@ -23,16 +23,10 @@ def get_mitre_information_tactics_enterpise(tactic_list, servicename):
     '''
     tactics = {}
     try:
-        attack = Attck()
+        index = get_mitre_index(servicename)["tactics"]
         for entry in tactic_list:
-            for tactic in attack.enterprise.tactics:
-                if tactic.id == entry:
-                    tactics[entry] = {
-                        "TA-ID": tactic.id,
-                        "Title": tactic.name,
-                        "Summary": tactic.description,
-                        "Mitre_Link": tactic.wiki
-                    }
+            if (tactic := index.get(entry)) is not None:
+                tactics[entry] = dict(tactic)
     except Exception as error:
         LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
     return tactics
@@ -54,18 +48,10 @@ def get_mitre_information_techniques_enterpise(technique_list, servicename):
     '''
     r_techniques = {}
     try:
-        attack = Attck(nested_subtechniques=False)
+        index = get_mitre_index(servicename)["techniques"]
         for i_technique in technique_list:
-            for technique in attack.enterprise.techniques:
-                if technique.id == i_technique:
-                    r_techniques[i_technique] =  {
-                        "TECH-ID": technique.id,
-                        "Title": technique.name,
-                        "Summary": technique.description,
-                        "Mitre_Link": technique.wiki,
-                        "APTs": [{"ID": entry.id, "Name": entry.name, "Link": entry.wiki} for entry in technique.actors],
-                        "Detections": technique.detection,
-                    }
+            if (technique := index.get(i_technique)) is not None:
+                r_techniques[i_technique] = dict(technique)
     except Exception as error:
         LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
     return r_techniques
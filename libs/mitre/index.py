@@ -0,0 +1,134 @@
+'''
+This script contains the index of the MITRE ATT&CK enterprise matrix. The index is built
+    once from pyattck, stored as compressed JSON and loaded from this snapshot on the
+    next start, so a tactic or technique is a dict lookup.
+'''
+
+import os
+import gzip
+import json
+import time
+
+from threading import Lock
+
+from pyattck import Attck
+
+from libs.core.environment import envvar
+from libs.kafka.logging import LogMessage
+
+# ENVIRONMENT-VARS
+MITRE_INDEX_PATH = envvar("MITRE_INDEX_PATH", "/app/iocpusher/cache/mitre_enterprise.json.gz")
+MITRE_INDEX_MAX_AGE = int(envvar("MITRE_INDEX_MAX_AGE", str(7 * 24 * 3600)))
+MITRE_INDEX_RETRY = int(envvar("MITRE_INDEX_RETRY", "3600"))
+
+# The index of the process in the format {"tactics": {id: {}}, "techniques": {id: {}}}
+#   and the time of the last failed load.
+INDEX = {"tactics": None, "techniques": None, "failed": None}
+LOCK = Lock()
+LOAD_LOCK = Lock()
+
+def build_index(update=False):
+    '''
+    build_index will build the index from the STIX bundle of pyattck.
+    @param update will download the latest bundle before.
+    @return the index as dict in the format {"tactics": {}, "techniques": {}}.
+    '''
+    attack = Attck(nested_subtechniques=False)
+    if update:
+        attack.update()
+    return {
+        "tactics": {tactic.id: {
+            "TA-ID": tactic.id,
+            "Title": tactic.name,
+            "Summary": tactic.description,
+            "Mitre_Link": tactic.wiki
+        } for tactic in attack.enterprise.tactics},
+        "techniques": {technique.id: {
+            "TECH-ID": technique.id,
+            "Title": technique.name,
+            "Summary": technique.description,
+            "Mitre_Link": technique.wiki,
+            "APTs": [{"ID": entry.id, "Name": entry.name, "Link": entry.wiki} for entry in technique.actors],
+            "Detections": technique.detection,
+        } for technique in attack.enterprise.techniques},
+    }
+
+def store_index(index, path):
+    '''
+    store_index will write the index as gzip compressed JSON and replace the old
+        snapshot at once.
+    @param index will be the index as dict.
+    @param path will be the path of the snapshot.
+    '''
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = "{}.{}.tmp".format(path, os.getpid())
+    with gzip.open(temp_path, "wt", encoding="UTF-8", compresslevel=6) as file:
+        json.dump(index, file, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+def read_index(path):
+    '''
+    read_index will read a snapshot of the index.
+    @param path will be the path of the snapshot.
+    @return the index as dict.
+    '''
+    with gzip.open(path, "rt", encoding="UTF-8") as file:
+        return json.load(file)
+
+def load_mitre_index(servicename, path=MITRE_INDEX_PATH, max_age=MITRE_INDEX_MAX_AGE):
+    '''
+    load_mitre_index will load the index of the process. A snapshot which is younger
+        than max_age is read, otherwise the index is built from the latest bundle and
+        stored. Incase the build fails an older snapshot is used, without any index the
+        time of the failure is recorded.
+    @param servicename will be the name of the calling service.
+    @param path will be the path of the snapshot.
+    @param max_age will be the maximum age of the snapshot in seconds.
+    @return the index as dict.
+    '''
+    index = None
+    try:
+        if os.path.isfile(path) and time.time() - os.path.getmtime(path) < max_age:
+            index = read_index(path)
+    except Exception as error:
+        LogMessage(str(error), LogMessage.LogTyp.WARNING, servicename).log()
+    if index is None:
+        try:
+            index = build_index(update=True)
+            store_index(index, path)
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+        try:
+            if index is None and os.path.isfile(path):
+                index = read_index(path)
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+    with LOCK:
+        if index is not None:
+            INDEX["tactics"], INDEX["techniques"], INDEX["failed"] = index["tactics"], index["techniques"], None
+        else:
+            INDEX["failed"] = time.time()
+    return index
+
+def get_mitre_index(servicename, retry=MITRE_INDEX_RETRY):
+    '''
+    get_mitre_index will return the index of the process and load it on the first call.
+        After a failed load the lookups get an empty index until retry seconds passed,
+        so pyattck is not called for every report.
+    @param servicename will be the name of the calling service.
+    @param retry will be the number of seconds until a failed load is repeated.
+    @return the index as dict in the format {"tactics": {}, "techniques": {}}.
+    '''
+    def current():
+        with LOCK:
+            if INDEX["tactics"] is not None or (INDEX["failed"] is not None and time.time() - INDEX["failed"] < retry):
+                return {"tactics": INDEX["tactics"] or {}, "techniques": INDEX["techniques"] or {}}
+        return None
+    if (index := current()) is not None:
+        return index
+    with LOAD_LOCK:
+        if (index := current()) is not None:
+            return index
+        load_mitre_index(servicename)
+    with LOCK:
+        return {"tactics": INDEX["tactics"] or {}, "techniques": INDEX["techniques"] or {}}
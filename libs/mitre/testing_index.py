@@ -0,0 +1,85 @@
+'''
+Tests for index.py
+'''
+
+import os
+import tempfile
+
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest import mock
+
+from libs.mitre import index
+from libs.mitre.enterprise import get_mitre_information_tactics_enterpise
+from libs.mitre.enterprise import get_mitre_information_techniques_enterpise
+
+class FakeAttck():
+    '''
+    FakeAttck will be a small enterprise matrix in the format of pyattck.
+    '''
+    updates = 0
+
+    def __init__(self, nested_subtechniques=True):
+        '''
+        CTor of the FakeAttck-class.
+        '''
+        actor = SimpleNamespace(id="G0007", name="APT28", wiki="https://attack.mitre.org/groups/G0007")
+        self.enterprise = SimpleNamespace(
+            tactics=[SimpleNamespace(id="TA0001", name="Initial Access", description="Entry", wiki="https://attack.mitre.org/tactics/TA0001")],
+            techniques=[SimpleNamespace(id="T1566", name="Phishing", description="Mails", wiki="https://attack.mitre.org/techniques/T1566", actors=[actor], detection="Filter")],
+        )
+
+    def update(self):
+        '''
+        update will count the downloads of the bundle.
+        '''
+        FakeAttck.updates += 1
+
+
+class BrokenAttck():
+    '''
+    BrokenAttck will fail like pyattck without a bundle.
+    '''
+    calls = 0
+
+    def __init__(self, nested_subtechniques=True):
+        '''
+        CTor of the BrokenAttck-class.
+        '''
+        BrokenAttck.calls += 1
+        raise RuntimeError("The bundle can not be downloaded.")
+
+
+class MitreIndexTests(TestCase):
+    '''
+    Tests for the index of MITRE ATT&CK.
+    '''
+
+    def test_snapshot_is_built_once(self):
+        '''
+        Test to check if the index is built once, stored and loaded from the snapshot.
+        '''
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(index, "Attck", FakeAttck), mock.patch.dict(index.INDEX, {"tactics": None, "techniques": None, "failed": None}):
+            path = os.path.join(directory, "mitre.json.gz")
+            built = index.load_mitre_index("testing", path=path)
+            self.assertEqual(FakeAttck.updates, 1)
+            self.assertEqual(index.load_mitre_index("testing", path=path), built)
+            self.assertEqual(FakeAttck.updates, 1)
+            self.assertEqual(get_mitre_information_tactics_enterpise(["TA0001", "TA9999"], "testing"), {"TA0001": {
+                "TA-ID": "TA0001", "Title": "Initial Access", "Summary": "Entry", "Mitre_Link": "https://attack.mitre.org/tactics/TA0001"}})
+            self.assertEqual(get_mitre_information_techniques_enterpise(["T1566"], "testing")["T1566"]["APTs"], [
+                {"ID": "G0007", "Name": "APT28", "Link": "https://attack.mitre.org/groups/G0007"}])
+
+    def test_failed_build_is_not_repeated(self):
+        '''
+        Test to check if a failed build is retried only after the retry time.
+        '''
+        with mock.patch.object(index, "Attck", BrokenAttck), mock.patch.dict(index.INDEX, {"tactics": None, "techniques": None, "failed": None}):
+            for _ in range(3):
+                self.assertEqual(index.get_mitre_index("testing"), {"tactics": {}, "techniques": {}})
+            self.assertEqual(BrokenAttck.calls, 1)
+            self.assertEqual(get_mitre_information_tactics_enterpise(["TA0001"], "testing"), {})
+            self.assertEqual(BrokenAttck.calls, 1)
+            index.INDEX["failed"] -= 2 * index.MITRE_INDEX_RETRY
+            index.get_mitre_index("testing")
+            self.assertEqual(BrokenAttck.calls, 2)
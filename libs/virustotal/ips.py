@@ -2,57 +2,63 @@
 This script contains functions to generate information about ips
 from virustotal. This functions require a API_KEY.
 '''
-import time
 import json
-import requests
 
+from libs.enrichment.result import LookupResult
 from libs.kafka.logging import LogMessage
+from libs.virustotal.quota import QuotaExhausted
+from libs.virustotal.quota import get_with_quota
 
 VT_IP_ENDPOINT = 'https://www.virustotal.com/vtapi/v2/ip-address/report?apikey={}&ip={}'
 
 #pylint: disable=R0914,R0801
-def get_vt_information_ipv4(vt_api_key, ips, servicename):
+def get_vt_information_ipv4(vt_api_key, ips, servicename, priority=0):
     '''
     get_vt_information_ipv4 will collect information from VirusTotal about a given list
         of ipv4 adresses. After the request the method will extract the country, all
         hostnames of the ip, the number of files which are detected by an AV and the number
         of files which are not detected by an AV.
     @param ips will be a list of ips in the format ['10.10.10.10', ].
-    @return will return a dict with dicts.
+    @param priority will be the priority of the requests in the quota scheduler.
+    @return will return a LookupResult with dicts. IP's which could not be looked up
+        are listed as failed.
     '''
-    information = {}
-    try:
-        for target in ips:
-            country, hosts, detected_files, undetected_files, asn = None, [], 0, 0, None
-            if vt_api_key != "":
-                response = requests.get(VT_IP_ENDPOINT.format(vt_api_key, target))
-                if response.status_code == 204:
-                    for _ in range(0,20):
-                        time.sleep(30)
-                        response = requests.get(VT_IP_ENDPOINT.format(vt_api_key, target))
-                        if response.status_code == 200:
-                            break
-                if response.status_code == 200:
-                    response = response.text
-                    json_response = json.loads(response)
-                    keys = json_response.keys()
-                    if 'country' in keys: #TODO countrys missing although its in there
-                        country = json_response['country']
-                    if 'hostname' in keys and (list_of_hosts := [entry['hostname'] for entry in json_response['resolutions']]) is not None and len(list_of_hosts) > 0:
-                        hosts = list_of_hosts
-                    if 'detected_downloaded_samples' in keys and  (det_files := [entry['total'] for entry in json_response['detected_downloaded_samples']]) is not None and len(det_files) > 0:
-                        detected_files = det_files[0]
-                    if 'undetected_downloaded_samples' in keys and  (undet_files := [entry['total'] for entry in json_response['undetected_downloaded_samples']]) is not None and len(undet_files) > 0:
-                        undetected_files = undet_files[0]
-                    if 'asn' in keys:
-                        asn = json_response['asn']
-            information[target] = {
-                "Country": country,
-                "Hosts": hosts,
-                "Detected_files": detected_files,
-                "Undetected_files": undetected_files,
-                "ASN": asn
-            }
-    except Exception as error:
-        LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+    information = LookupResult()
+    for target in ips:
+        country, hosts, detected_files, undetected_files, asn = None, [], 0, 0, None
+        failed = vt_api_key == ""
+        try:
+            if not failed:
+                if (response := get_with_quota(VT_IP_ENDPOINT.format(vt_api_key, target), priority)).status_code != 200:
+                    raise ConnectionError("VirusTotal answered {} for {}.".format(response.status_code, target))
+                response = response.text
+                json_response = json.loads(response)
+                keys = json_response.keys()
+                if 'country' in keys: #TODO countrys missing although its in there
+                    country = json_response['country']
+                if 'hostname' in keys and (list_of_hosts := [entry['hostname'] for entry in json_response['resolutions']]) is not None and len(list_of_hosts) > 0:
+                    hosts = list_of_hosts
+                if 'detected_downloaded_samples' in keys and  (det_files := [entry['total'] for entry in json_response['detected_downloaded_samples']]) is not None and len(det_files) > 0:
+                    detected_files = det_files[0]
+                if 'undetected_downloaded_samples' in keys and  (undet_files := [entry['total'] for entry in json_response['undetected_downloaded_samples']]) is not None and len(undet_files) > 0:
+                    undetected_files = undet_files[0]
+                if 'asn' in keys:
+                    asn = json_response['asn']
+        except QuotaExhausted as error:
+            LogMessage("{} {} is skipped.".format(error, target), LogMessage.LogTyp.WARNING, servicename).log()
+            failed = True
+        except Exception as error:
+            LogMessage(str(error), LogMessage.LogTyp.ERROR, servicename).log()
+            failed = True
+        entry = {
+            "Country": country,
+            "Hosts": hosts,
+            "Detected_files": detected_files,
+            "Undetected_files": undetected_files,
+            "ASN": asn
+        }
+        if failed:
+            information.fail(target, entry)
+        else:
+            information[target] = entry
     return information
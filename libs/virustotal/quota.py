@@ -0,0 +1,223 @@
+'''
+This script contains the quota scheduler of VirusTotal. All requests of a process go
+    through one token bucket, optionally shared with other processes by a lock file,
+    instead of sleeping after the API refused a request.
+'''
+
+import json
+import time
+import heapq
+import itertools
+
+from threading import Condition
+
+from libs.core.environment import envvar
+from libs.core.httpclient import HttpClient
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# ENVIRONMENT-VARS
+VT_REQUESTS_PER_MINUTE = float(envvar("VT_REQUESTS_PER_MINUTE", "4"))
+VT_REQUESTS_PER_DAY = int(envvar("VT_REQUESTS_PER_DAY", "500"))
+VT_QUOTA_FILE = envvar("VT_QUOTA_FILE", "")
+VT_MAX_RETRIES = int(envvar("VT_MAX_RETRIES", "3"))
+VT_MAX_WAIT = float(envvar("VT_MAX_WAIT", "600"))
+
+class QuotaExhausted(Exception):
+    '''
+    QuotaExhausted will be raised if a request can not be sent within its maximum
+        waiting time or has been refused by VirusTotal after all retries.
+    '''
+
+
+class QuotaScheduler():
+    '''
+    QuotaScheduler will hand out the requests of a quota by a token bucket. The bucket
+        holds the requests of one minute and refills continuously, a day has at most
+        per_day requests (UTC). Waiting requests are served by their priority, a lower
+        priority first and equal priorities in the order they arrived. With a lock file
+        the bucket is stored in the file, so all processes on the host share the quota.
+    '''
+
+    def __init__(self, per_minute, per_day=0, lock_path=None):
+        '''
+        CTor of the QuotaScheduler-class.
+        @param per_minute will be the number of requests per minute.
+        @param per_day will be the number of requests per day, 0 is unlimited.
+        @param lock_path will be the optional path of the shared bucket file.
+        '''
+        self.per_minute = float(per_minute)
+        self.per_day = int(per_day)
+        self.lock_path = lock_path if lock_path and fcntl is not None else None
+        self.condition = Condition()
+        self.waiting = []
+        self.sequence = itertools.count()
+        self.bucket = self.__full_bucket(time.time())
+        self.counters = {"requests": 0, "exhausted": 0, "given_up": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def __full_bucket(self, now):
+        '''
+        __full_bucket will return a full bucket.
+        @param now will be the current time.
+        @return the bucket as dict.
+        '''
+        return {"tokens": self.per_minute, "updated": now, "day": time.strftime("%Y-%m-%d", time.gmtime(now)), "used": 0}
+
+    def __refill(self, bucket, now):
+        '''
+        __refill will add the tokens since the last update and start a new day.
+        @param bucket will be the bucket as dict.
+        @param now will be the current time.
+        '''
+        bucket["tokens"] = min(self.per_minute, bucket["tokens"] + (now - bucket["updated"]) * self.per_minute / 60)
+        bucket["updated"] = now
+        if (day := time.strftime("%Y-%m-%d", time.gmtime(now))) != bucket["day"]:
+            bucket["day"], bucket["used"] = day, 0
+
+    def __take(self, bucket, now):
+        '''
+        __take will take a token from the bucket.
+        @param bucket will be the bucket as dict.
+        @param now will be the current time.
+        @return 0 if a token has been taken, otherwise the seconds until the next token.
+        '''
+        self.__refill(bucket, now)
+        if self.per_day > 0 and bucket["used"] >= self.per_day:
+            return 86400 - now % 86400
+        if bucket["tokens"] >= 1:
+            bucket["tokens"] -= 1
+            bucket["used"] += 1
+            return 0
+        return (1 - bucket["tokens"]) * 60 / self.per_minute
+
+    def __update(self, action):
+        '''
+        __update will apply an action to the bucket of the process or of the lock file.
+        @param action will be a function which gets the bucket and the current time.
+        @return the result of the action.
+        '''
+        if self.lock_path is None:
+            return action(self.bucket, time.time())
+        with open(self.lock_path, "a+", encoding="UTF-8") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                try:
+                    bucket = json.loads(file.read())
+                except ValueError:
+                    bucket = self.__full_bucket(time.time())
+                result = action(bucket, time.time())
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(bucket))
+                file.flush()
+                self.bucket = bucket
+                return result
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def acquire(self, priority=0, max_wait=None):
+        '''
+        acquire will block until the request may be sent.
+        @param priority will be the priority of the request, like the arrival of its report.
+        @param max_wait will be the maximum waiting time in seconds, None waits until
+            the request may be sent.
+        @return the waiting time in seconds.
+        @raise QuotaExhausted incase the request can not be sent within max_wait, like
+            after the requests of the day are used up.
+        '''
+        start = time.monotonic()
+        deadline = start + max_wait if max_wait is not None else None
+        with self.condition:
+            entry = (priority, next(self.sequence))
+            heapq.heappush(self.waiting, entry)
+            try:
+                while True:
+                    left = deadline - time.monotonic() if deadline is not None else None
+                    if self.waiting[0] == entry:
+                        if (wait := self.__update(self.__take)) == 0:
+                            heapq.heappop(self.waiting)
+                            break
+                        if left is not None and wait > left:
+                            self.counters["given_up"] += 1
+                            raise QuotaExhausted("The quota of VirusTotal allows no request within {} seconds.".format(max_wait))
+                        self.condition.wait(min(wait, 1.0))
+                    elif left is not None and left <= 0:
+                        self.counters["given_up"] += 1
+                        raise QuotaExhausted("The quota of VirusTotal allows no request within {} seconds.".format(max_wait))
+                    else:
+                        self.condition.wait(left)
+            except BaseException:
+                self.waiting.remove(entry)
+                heapq.heapify(self.waiting)
+                raise
+            finally:
+                self.condition.notify_all()
+            waited = time.monotonic() - start
+            self.counters["requests"] += 1
+            self.counters["wait_seconds"] += waited
+            self.counters["max_wait_seconds"] = max(self.counters["max_wait_seconds"], waited)
+            return waited
+
+    def exhausted(self):
+        '''
+        exhausted will empty the bucket after the API refused a request (HTTP 204), so
+            the next request waits for a new token.
+        '''
+        def empty(bucket, now):
+            self.__refill(bucket, now)
+            bucket["tokens"] = min(bucket["tokens"], 0)
+        with self.condition:
+            self.__update(empty)
+            self.counters["exhausted"] += 1
+
+    def stats(self):
+        '''
+        stats will return the usage of the quota.
+        @return a dict with the limits, the used requests of the day, the waiting
+            requests, the requests given up after VT_MAX_WAIT and the waiting times.
+        '''
+        with self.condition:
+            total = self.counters["requests"]
+            return {
+                "per_minute": self.per_minute,
+                "per_day": self.per_day,
+                "tokens": round(self.bucket["tokens"], 2),
+                "used_today": self.bucket["used"],
+                "waiting": len(self.waiting),
+                "requests": total,
+                "exhausted": self.counters["exhausted"],
+                "given_up": self.counters["given_up"],
+                "avg_wait_seconds": round(self.counters["wait_seconds"] / total, 3) if total > 0 else 0.0,
+                "max_wait_seconds": round(self.counters["max_wait_seconds"], 3),
+            }
+
+
+VT_QUOTA = QuotaScheduler(VT_REQUESTS_PER_MINUTE, VT_REQUESTS_PER_DAY, VT_QUOTA_FILE or None)
+# The client of VirusTotal does not retry by itself, every request takes a token.
+VT_CLIENT = HttpClient(retries=0)
+REFUSED_STATUS = (204, 429)
+
+def get_with_quota(url, priority=0, retries=VT_MAX_RETRIES, max_wait=VT_MAX_WAIT):
+    '''
+    get_with_quota will send a request to VirusTotal once the quota allows it. Incase
+        the API refuses the request (HTTP 204 or 429) the bucket is emptied and the
+        request waits in the scheduler again, so every attempt takes a token.
+    @param url will be the url of the request.
+    @param priority will be the priority of the request.
+    @param retries will be the number of retries after a refused request.
+    @param max_wait will be the maximum waiting time in seconds per try, 0 waits
+        until the request may be sent.
+    @return the response.
+    @raise QuotaExhausted incase the request waits longer than max_wait or is still
+        refused after all retries.
+    '''
+    for _ in range(retries + 1):
+        VT_QUOTA.acquire(priority, max_wait or None)
+        if (response := VT_CLIENT.get(url)).status_code not in REFUSED_STATUS:
+            return response
+        VT_QUOTA.exhausted()
+    raise QuotaExhausted("VirusTotal refused the request {} times.".format(retries + 1))
@@ -0,0 +1,132 @@
+'''
+Tests for quota.py
+'''
+
+import os
+import time
+import tempfile
+
+from threading import Thread
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from libs.virustotal.quota import QuotaExhausted
+from libs.virustotal.quota import QuotaScheduler
+from libs.virustotal.quota import get_with_quota
+
+class QuotaSchedulerTests(TestCase):
+    '''
+    Tests for the quota scheduler of VirusTotal.
+    '''
+
+    def test_bucket_limits_requests(self):
+        '''
+        Test to check if a full bucket is used at once and the next request waits
+            for a new token.
+        '''
+        quota = QuotaScheduler(per_minute=600, per_day=0)
+        start = time.monotonic()
+        for _ in range(600):
+            quota.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
+        quota.acquire()
+        self.assertGreater(time.monotonic() - start, 0.05)
+        self.assertEqual(quota.stats()["requests"], 601)
+
+    def test_priority_order(self):
+        '''
+        Test to check if waiting requests are served by their priority.
+        '''
+        quota = QuotaScheduler(per_minute=1200, per_day=0)
+        quota.exhausted()
+        served = []
+        def request(priority):
+            quota.acquire(priority)
+            served.append(priority)
+        threads = [Thread(target=request, args=(priority,)) for priority in [3, 1, 2]]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(served, [1, 2, 3])
+
+    def test_daily_limit_in_shared_file(self):
+        '''
+        Test to check if schedulers with the same lock file share the daily quota, so
+            a request of the other scheduler gives up instead of waiting for the next day.
+        '''
+        with tempfile.TemporaryDirectory() as directory:
+            first = QuotaScheduler(per_minute=60, per_day=2, lock_path=os.path.join(directory, "quota"))
+            second = QuotaScheduler(per_minute=60, per_day=2, lock_path=os.path.join(directory, "quota"))
+            first.acquire()
+            second.acquire()
+            self.assertEqual(second.stats()["used_today"], 2)
+            errors = []
+            def request():
+                try:
+                    first.acquire(max_wait=5)
+                except QuotaExhausted as error:
+                    errors.append(error)
+            waiting = Thread(target=request)
+            waiting.start()
+            waiting.join(2)
+            self.assertFalse(waiting.is_alive())
+            self.assertEqual(len(errors), 1)
+            self.assertEqual(first.stats()["used_today"], 2)
+            self.assertEqual(first.stats()["waiting"], 0)
+            self.assertEqual(first.stats()["given_up"], 1)
+
+    def test_max_wait(self):
+        '''
+        Test to check if a request gives up after max_wait, also behind another waiting
+            request, and leaves the queue of the waiting requests.
+        '''
+        quota = QuotaScheduler(per_minute=1, per_day=0)
+        quota.acquire()
+        errors = []
+        def request():
+            try:
+                quota.acquire(max_wait=0.2)
+            except QuotaExhausted as error:
+                errors.append(error)
+        threads = [Thread(target=request) for _ in range(2)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(2)
+        self.assertLess(time.monotonic() - start, 1.5)
+        self.assertEqual(len(errors), 2)
+        self.assertEqual(quota.stats()["waiting"], 0)
+        self.assertEqual(quota.stats()["given_up"], 2)
+
+    def test_daily_limit_with_max_wait(self):
+        '''
+        Test to check if a request gives up at once when the requests of the day are
+            used up and the next day is further away than max_wait.
+        '''
+        quota = QuotaScheduler(per_minute=60, per_day=1)
+        quota.acquire()
+        start = time.monotonic()
+        with self.assertRaises(QuotaExhausted):
+            quota.acquire(max_wait=60)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(quota.stats()["waiting"], 0)
+
+    def test_every_attempt_takes_a_token(self):
+        '''
+        Test to check if a refused request (HTTP 429) takes a new token for its retry
+            and gives up after all retries.
+        '''
+        quota = QuotaScheduler(per_minute=6000, per_day=0)
+        answers = [SimpleNamespace(status_code=429), SimpleNamespace(status_code=200)]
+        with patch("libs.virustotal.quota.VT_QUOTA", quota), patch("libs.virustotal.quota.VT_CLIENT.get", side_effect=lambda url: answers.pop(0)):
+            self.assertEqual(get_with_quota("https://www.virustotal.com/", retries=3).status_code, 200)
+        self.assertEqual(quota.stats()["requests"], 2)
+        self.assertEqual(quota.stats()["exhausted"], 1)
+        with patch("libs.virustotal.quota.VT_QUOTA", quota), patch("libs.virustotal.quota.VT_CLIENT.get", return_value=SimpleNamespace(status_code=204)):
+            with self.assertRaises(QuotaExhausted):
+                get_with_quota("https://www.virustotal.com/", retries=1)
+        self.assertEqual(quota.stats()["requests"], 4)
@@ -18,13 +18,14 @@ from flask_script import Server
 from kafka.consumer import KafkaConsumer
 
 from libs.kafka.logging import LogMessage
-from libs.kafka.topichandler import create_topic_if_not_exists
+from libs.kafka.topichandler import provision_topics
 from libs.core.environment import envvar
 
 SERVICENAME = envvar("SERVICENAME", "Systemmanagement and monitoring")
 LOGGING_TOPIC_NAME = envvar("LOGGER_TOPIC", "logging")
 KAFKA_SERVER = envvar("KAFKA_SERVER", "0.0.0.0:9092")
 HEALTHTOPIC = envvar("HEALTH_TOPIC", "health")
+KAFKA_GROUP_ID = envvar("KAFKA_GROUP_ID", "sysmon")
 
 app = Flask(SERVICENAME, template_folder='core/templates', static_folder="core/static", static_url_path='/static')
 app.config['TEMPLATES_AUTO_RELOAD'] = True #TODO raus in production
@@ -61,7 +62,7 @@ class Sysmonserver(Server):
         consume_logging_messages will consume the log messages from the kafka topic.
         '''
         try:
-            consumer = KafkaConsumer(LOGGING_TOPIC_NAME, bootstrap_servers=KAFKA_SERVER, client_id='sysmon', api_version=(2, 7, 0),)
+            consumer = KafkaConsumer(LOGGING_TOPIC_NAME, bootstrap_servers=KAFKA_SERVER, client_id='sysmon', group_id="{}_logging".format(KAFKA_GROUP_ID), api_version=(2, 7, 0),)
             for report in consumer:
                 value = report.value.decode("utf-8")
                 value = json.loads(value)
@@ -88,7 +89,7 @@ class Sysmonserver(Server):
         consume_health_messages will consume the health messages from the kafka topic.
         '''
         try:
-            consumer = KafkaConsumer(HEALTHTOPIC, bootstrap_servers=KAFKA_SERVER, client_id='sysmon', api_version=(2, 7, 0),)
+            consumer = KafkaConsumer(HEALTHTOPIC, bootstrap_servers=KAFKA_SERVER, client_id='sysmon', group_id="{}_health".format(KAFKA_GROUP_ID), api_version=(2, 7, 0),)
             for report in consumer:
                 value = report.value.decode("utf-8")
                 value = json.loads(value)
@@ -116,7 +117,7 @@ class Sysmonserver(Server):
         @param self will be Sysmonserver-object. 
         '''
         try:
-            create_topic_if_not_exists(KAFKA_SERVER, LOGGING_TOPIC_NAME)
+            provision_topics(KAFKA_SERVER, [LOGGING_TOPIC_NAME, HEALTHTOPIC])
         except Exception as error:
             LogMessage(str(error), LogMessage.LogTyp.ERROR, SERVICENAME).log()
     